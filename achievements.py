@@ -0,0 +1,63 @@
+"""Set-based achievement awarding, run whenever a user's points change."""
+from datetime import datetime
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db import db
+from models import Achievement, User, UserAchievement
+
+
+def _insert_ignoring_duplicates():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(UserAchievement).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(UserAchievement).on_conflict_do_nothing()
+    return insert(UserAchievement)
+
+
+def award_achievements(user_ids, earned_at=None):
+    """Award every achievement the given users now qualify for, without committing.
+
+    A single INSERT ... SELECT pairs each user with the achievements whose
+    ``points_required`` they meet and that they do not hold yet. Returns the
+    number of achievements awarded.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    earned_at = earned_at or datetime.utcnow()
+    held = (
+        select(UserAchievement.id)
+        .where(UserAchievement.user_id == User.id)
+        .where(UserAchievement.achievement_id == Achievement.id)
+        .exists()
+    )
+    newly_earned = (
+        select(User.id, Achievement.id, literal(earned_at, type_=UserAchievement.earned_at.type))
+        .select_from(User)
+        .join(Achievement, Achievement.points_required <= func.coalesce(User.points, 0))
+        .where(User.id.in_(user_ids))
+        .where(~held)
+    )
+    stmt = _insert_ignoring_duplicates().from_select(
+        ["user_id", "achievement_id", "earned_at"], newly_earned
+    )
+    return db.session.execute(stmt).rowcount
+
+
+def backfill_achievements(chunk_size=1000):
+    """Evaluate every user in ``chunk_size`` batches, committing after each batch."""
+    awarded = 0
+    last_id = 0
+    while True:
+        user_ids = db.session.scalars(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+        ).all()
+        if not user_ids:
+            break
+        awarded += award_achievements(user_ids)
+        db.session.commit()
+        last_id = user_ids[-1]
+    return awarded
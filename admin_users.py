@@ -0,0 +1,66 @@
+"""Admin user listing: keyset pages and an NDJSON stream, both without N+1 loads."""
+import json
+
+from sqlalchemy import select
+
+from db import db
+from models import Leaderboard, User
+from pagination import Keyset
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+KEYSETS = {
+    'id': Keyset(User.id),
+    'points': Keyset(User.points, User.id, descending=True),
+}
+SORT_ORDERS = tuple(KEYSETS)
+
+
+def user_listing_query(role=None):
+    """Users joined to their leaderboard entry, unsorted."""
+    stmt = (
+        select(
+            User.id, User.username, User.email, User.role, User.points, User.date_joined,
+            Leaderboard.id.label('leaderboard_entry_id'),
+        )
+        .outerjoin(Leaderboard, Leaderboard.user_id == User.id)
+    )
+    if role:
+        stmt = stmt.where(User.role == role)
+    return stmt
+
+
+def user_payload(row):
+    return {
+        "id": row.id,
+        "username": row.username,
+        "email": row.email,
+        "role": row.role,
+        "points": row.points,
+        "date_joined": row.date_joined.isoformat() if row.date_joined else None,
+        "leaderboard_entry_id": row.leaderboard_entry_id,
+    }
+
+
+def user_page(role=None, sort='id', cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return ``(payloads, next_cursor)`` for one page of users.
+
+    Raises ``InvalidCursor`` for a malformed cursor.
+    """
+    keyset = KEYSETS[sort]
+    rows, next_cursor = keyset.page(
+        db.session.execute(keyset.page_query(user_listing_query(role), cursor, limit)), limit
+    )
+    return [user_payload(row) for row in rows], next_cursor
+
+
+def stream_users(role=None, sort='id'):
+    """Yield every matching user as NDJSON, fetched through a server-side cursor."""
+    stmt = (
+        user_listing_query(role)
+        .order_by(*KEYSETS[sort].order_by())
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    for partition in db.session.execute(stmt).partitions():
+        yield "".join(json.dumps(user_payload(row)) + "\n" for row in partition)
@@ -1,24 +1,49 @@
 from functools import wraps
-from flask import Flask, request, jsonify, session, make_response, abort
+import click
+from flask import Flask, Response, request, jsonify, session, make_response, abort, stream_with_context
 from flask_login import current_user, login_required, LoginManager, login_user
 from flask_restful import Resource as RestResource, Api 
 from flask_migrate import Migrate
 from flask_cors import CORS
+from sqlalchemy.exc import IntegrityError
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from db import db
-from datetime import datetime
+from engine import init_engine_events, pool_metrics
+from leaderboard import leaderboard_service
+from instrumentation import sql_instrumentation, query_budget
+from serializers import OrjsonProvider, eager_options, orjson
+from passwords import password_hasher, HashingBusy
+from ratelimit import TokenBucketLimiter
+from logging_setup import logging_setup
+from replicas import replica_router
 import logging
 import json
+import math
+import os
 
 
 app = Flask(__name__)
 app.config.from_object(Config)
+if app.config['PROXY_FIX_HOPS']:
+    # Without this, remote_addr is the proxy and every client shares one login IP bucket
+    hops = app.config['PROXY_FIX_HOPS']
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+logging_setup.init_app(app)
 
 db.init_app(app)
+with app.app_context():
+    init_engine_events(db.engine, os.environ)
+replica_router.init_app(app)
 
 CORS(app, supports_credentials=True)
 
 migrate = Migrate(app, db)
+leaderboard_service.init_app(app)
+sql_instrumentation.init_app(app)
+password_hasher.init_app(app)
 api = Api(app)
 
 login_manager = LoginManager()
@@ -26,26 +51,67 @@ login_manager.init_app(app)
 
 login_manager.login_view = 'login'
 
+login_user_limiter = TokenBucketLimiter(app.config['LOGIN_USER_BURST'], app.config['LOGIN_USER_RATE'])
+login_ip_limiter = TokenBucketLimiter(app.config['LOGIN_IP_BURST'], app.config['LOGIN_IP_RATE'])
+
 from models import (
-    User, LearningPath, Module, Resource, Feedback,Comment,
-    Reply, Challenge, Achievement, Leaderboard, ModuleResource,
+    User, LearningPath, Module, Resource, Feedback,
+    Challenge, Achievement, Leaderboard, ModuleResource,
     UserAchievement, UserLearningPath, UserChallenge,
-    QuizContent, QuizSubmission
+    QuizContent, ResourceRating
+)
+from scoring import score_attempt, UnknownQuizError, DuplicateAttemptError
+import outbox
+from catalogue import catalogue_cache
+from achievements import backfill_achievements
+import admin_users
+import authoring
+import ratings
+import progress
+import counters
+from module_bundle import load_module_bundle
+from forum import (
+    load_comment_page, write_comment, write_reply, import_threads, UnknownReferenceError,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
 )
+from identity import identity_cache
+from pagination import InvalidCursor, Keyset, link_headers, page_keys, page_params
+from response_cache import response_cache, bump_versions, path_keys, resource_keys
+
+catalogue_cache.init_app(app)
+identity_cache.init_app(app)
+response_cache.init_app(app)
+
+PATH_ORDER = Keyset(LearningPath.id)
+QUIZ_ORDER = Keyset(QuizContent.id)
+
+@app.errorhandler(InvalidCursor)
+def handle_invalid_cursor(e):
+    return jsonify({"error": str(e)}), 400
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identity_cache.get(int(user_id))
 
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__) 
+logger = logging.getLogger(__name__)
 
 @app.route('/leaderboard', methods=['GET'])
+@response_cache.cached(ttl=5, max_age=5)
 def get_leaderboard():
-    users = User.query.order_by(User.points.desc()).limit(8).all()  
-    result = [{"username": user.username.split()[0], "points": user.points} for user in users]
+    limit = min(request.args.get('limit', 8, type=int), 100)
+    entries = leaderboard_service.top(max(limit, 0))
+    result = [{"username": entry["username"].split()[0], "points": entry["points"]} for entry in entries]
     return jsonify(result)
 
+@app.route('/leaderboard/me', methods=['GET'])
+@login_required
+def get_my_rank():
+    radius = min(request.args.get('radius', 2, type=int), 25)
+    standing = leaderboard_service.around(current_user.id, max(radius, 0))
+    if standing is None:
+        return jsonify({"error": "User not ranked"}), 404
+    return jsonify(standing), 200
+
 @app.route('/users/<username>/points', methods=['GET'])
 def get_user_points(username):
     user = User.query.filter_by(username=username).first()
@@ -68,9 +134,20 @@ def manage_users():
         return jsonify({"error": "Unauthorized"}), 403
 
     if request.method == 'GET':
-        users = User.query.all()
-        user_list = [user.to_dict() for user in users]
-        return jsonify(user_list), 200
+        role = request.args.get('role')
+        sort = request.args.get('sort', 'id')
+        if sort not in admin_users.SORT_ORDERS:
+            return jsonify({"error": f"Invalid sort. Valid sorts are: {', '.join(admin_users.SORT_ORDERS)}"}), 400
+
+        if request.args.get('format') == 'ndjson':
+            return Response(
+                stream_with_context(admin_users.stream_users(role, sort)),
+                mimetype='application/x-ndjson',
+            )
+
+        cursor, limit = page_params(request.args, admin_users.DEFAULT_PAGE_SIZE, admin_users.MAX_PAGE_SIZE)
+        user_list, next_cursor = admin_users.user_page(role, sort, cursor, limit)
+        return jsonify(user_list), 200, link_headers(next_cursor)
 
     if request.method == 'DELETE':
         data = request.get_json()
@@ -86,12 +163,38 @@ def manage_users():
         if user.id == current_user.id:
             return jsonify({"error": "Admins cannot remove themselves"}), 403
 
+        deleted_id = user.id
         db.session.delete(user)
         db.session.commit()
+        identity_cache.evict(deleted_id)
+        leaderboard_service.remove(deleted_id)
 
         return jsonify({"message": f"User with ID {user_id} has been removed"}), 200
 
 
+@app.route('/debug/metrics', methods=['GET'])
+def get_debug_metrics():
+    """Per-endpoint SQL counts, N+1 suspects and cache statistics."""
+    if not (app.debug or app.config.get('DEBUG_METRICS_ENABLED')):
+        abort(404)
+    return jsonify({
+        "sql": sql_instrumentation.snapshot(),
+        "pool": pool_metrics.snapshot(db.engine.pool),
+        "catalogue_cache": catalogue_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "replicas": replica_router.stats(),
+    }), 200
+
+
+@app.route('/admin/catalogue-cache', methods=['GET'])
+@login_required
+def get_catalogue_cache_stats():
+    """Admin route to inspect catalogue cache hit/miss metrics."""
+    if current_user.role != 'Admin':
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(catalogue_cache.stats()), 200
+
+
 @app.route('/admin/users/<int:user_id>/role', methods=['PATCH'])
 @login_required
 def update_user_role(user_id):
@@ -107,14 +210,16 @@ def update_user_role(user_id):
         if new_role not in valid_roles:
             return jsonify({"error": f"Invalid role. Valid roles are: {', '.join(valid_roles)}"}), 400
 
-        user = User.query.get(user_id)
+        user = User.query.options(*eager_options(User)).filter_by(id=user_id).first()
         if not user:
             return jsonify({"error": "User not found"}), 404
 
         user.role = new_role
+        user_data = user.to_dict()
         db.session.commit()
+        identity_cache.evict(user_id)
 
-        return jsonify({"message": "Role updated successfully", "user": user.to_dict()}), 200
+        return jsonify({"message": "Role updated successfully", "user": user_data}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -154,7 +259,6 @@ def signup():
     
 @app.route('/login', methods=['POST'])
 def login():
-    print("Login route accessed")
     try:
         data = request.get_json()
         username = data.get('username')
@@ -163,9 +267,36 @@ def login():
         if not username or not password:
             return jsonify({"error": "Username and password are required"}), 400
 
+        if app.config['LOGIN_RATE_LIMIT_ENABLED']:
+            retry_after = (
+                login_ip_limiter.consume(f"ip:{request.remote_addr}")
+                or login_user_limiter.consume(f"user:{username}")
+            )
+            if retry_after:
+                response = jsonify({"error": "Too many login attempts, try again later"})
+                # A zero refill rate never frees a token, so there is no retry time to give
+                if math.isfinite(retry_after):
+                    response.headers['Retry-After'] = str(math.ceil(retry_after))
+                return response, 429
+
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
+        try:
+            authenticated = user is not None and user.check_password(password)
+        except HashingBusy:
+            response = jsonify({"error": "Server busy, try again shortly"})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+
+        if authenticated:
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except HashingBusy:
+                    # The old hash still works; upgrade it on a later login
+                    pass
+
             login_user(user)
 
             session['role'] = user.role
@@ -187,18 +318,18 @@ def login():
                 secure=True,  
                 samesite="None",
             )
-            print("Cookie set:", response.headers) 
+            logger.info("User %s logged in", user.id)
             return response
         else:
             return jsonify({"error": "Invalid username or password"}), 401
 
     except Exception as e:
+        logger.exception("Login failed")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 @app.route('/authenticate', methods=['GET'])
 @login_required
 def authenticate():
-    print("authenticate route accessed")
     try:
         user = current_user
         if user.is_authenticated:
@@ -214,7 +345,6 @@ def authenticate():
 
 @app.route('/logout', methods=['POST'])
 def logout():
-    print("Logout route accessed")
     session.pop('user', None)
     response = make_response(jsonify({"message": "Logged out"}))
     response.delete_cookie(
@@ -231,101 +361,135 @@ def logout():
     )
     return response
 
+def _catalogue_response(path_ids):
+    page, next_cursor = page_keys(path_ids, *page_params(request.args))
+    return app.response_class(
+        catalogue_cache.render(page), mimetype='application/json', headers=link_headers(next_cursor)
+    )
+
 @app.route('/learning-paths/enrolled', methods=['GET'])
 @login_required
 def get_enrolled_paths():
     user_id = current_user.id
-    logger.debug(f"Fetching enrolled paths for user_id: {user_id}")
-    
-    enrolled_paths = db.session.query(LearningPath).join(
-        UserLearningPath, LearningPath.id == UserLearningPath.learning_path_id
-    ).filter(UserLearningPath.user_id == user_id).all()
-    
-    enrolled_paths_dict = [path.to_dict() for path in enrolled_paths]
-    logger.debug(f"Enrolled paths: {enrolled_paths_dict}")
-    
-    return jsonify(enrolled_paths_dict)
+    enrolled_ids = sorted(catalogue_cache.enrolled_ids(user_id))
+    logger.debug("User %s is enrolled in %d paths", user_id, len(enrolled_ids))
+
+    return _catalogue_response(enrolled_ids)
 
 
 @app.route('/learning-paths', methods=['GET'])
 @login_required
 def get_available_paths():
     user_id = current_user.id
-    logger.debug(f"Fetching available learning paths for user_id: {user_id}")
-    
-    enrolled_paths_ids = db.session.query(UserLearningPath.learning_path_id).filter_by(user_id=user_id).all()
-    enrolled_paths_ids = [path_id for (path_id,) in enrolled_paths_ids]
-    
-    available_paths = LearningPath.query.filter(LearningPath.id.notin_(enrolled_paths_ids)).all()
-    
-    available_paths_dict = [path.to_dict() for path in available_paths]
-    logger.debug(f"Available paths: {available_paths_dict}")
-    
-    return jsonify(available_paths_dict)
+    enrolled_ids = catalogue_cache.enrolled_ids(user_id)
+    available_ids = [path_id for path_id in catalogue_cache.path_ids() if path_id not in enrolled_ids]
+    logger.debug("%d paths available to user %s", len(available_ids), user_id)
+
+    return _catalogue_response(available_ids)
+
+
+@app.route('/learning-paths/progress', methods=['GET'])
+@login_required
+@query_budget(2)
+def get_my_progress():
+    """Progress of every enrollment of the current user, from the stored counters."""
+    return jsonify(progress.enrollment_progress(current_user.id)), 200
 
 
 @app.route('/learning-paths/<int:path_id>/enroll', methods=['POST'])
 @login_required
 def enroll_path(path_id):
     user_id = current_user.id
-    logger.debug(f"User {user_id} attempting to enroll in path {path_id}.")
-    
-    existing_enrollment = UserLearningPath.query.filter_by(user_id=user_id, learning_path_id=path_id).first()
-    if existing_enrollment:
-        logger.warning(f"User {user_id} is already enrolled in path {path_id}.")
-        return jsonify({"error": "Already enrolled"}), 400
-    
+    enrolled_path = LearningPath.query.get_or_404(path_id)
+
     new_enrollment = UserLearningPath(user_id=user_id, learning_path_id=path_id)
     db.session.add(new_enrollment)
-    db.session.commit()
-    logger.info(f"User {user_id} successfully enrolled in path {path_id}.")
-    
-    enrolled_path = LearningPath.query.get(path_id)
-    logger.debug(f"Enrolled path details: {enrolled_path.to_dict()}")
-    
+    try:
+        db.session.flush()
+        progress.initialize_enrollment(new_enrollment)
+        counters.adjust(counters.ENROLLED_COUNT, [path_id])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        logger.warning("User %s is already enrolled in path %s", user_id, path_id)
+        return jsonify({"error": "Already enrolled"}), 400
+    catalogue_cache.invalidate_enrollments(user_id)
+    catalogue_cache.invalidate_path(path_id)
+    logger.info("User %s enrolled in path %s", user_id, path_id)
+
     return jsonify({"learning_path": enrolled_path.to_dict()}), 201
 
 @app.route('/learning-paths/<int:path_id>/modules', methods=['GET'])
 @login_required
+@response_cache.cached(versions=lambda path_id: [f"path:{path_id}"])
 def get_modules_for_learning_path(path_id):
-    logger.debug(f"Fetching modules for learning path with ID: {path_id}")
-    
     modules = Module.query.filter_by(learning_path_id=path_id).all()
-    
-    logger.debug(f"Modules found: {[module.to_dict() for module in modules]}")
-    
+    logger.debug("Found %d modules for learning path %s", len(modules), path_id)
+
     return jsonify([module.to_dict() for module in modules])
 
 
 @app.route('/modules/<int:module_id>', methods=['GET'])
 @login_required
+@response_cache.cached(versions=lambda module_id: [f"module:{module_id}"])
 def get_module_details(module_id):
-    logger.debug(f"Fetching details for module with ID: {module_id}")
-    
     module = Module.query.get_or_404(module_id)
-    
-    logger.debug(f"Module details: {module.to_dict()}")
-    
+
     return jsonify(module.to_dict())
 
+@app.route('/modules/<int:module_id>/complete', methods=['POST'])
+@login_required
+def complete_module(module_id):
+    try:
+        created, enrollment = progress.complete_module(current_user.id, module_id)
+    except LookupError:
+        abort(404)
+    db.session.commit()
+
+    return jsonify({
+        "module_id": module_id,
+        "already_completed": not created,
+        "enrollment": enrollment.to_dict() if enrollment is not None else None,
+    }), 201 if created else 200
+
+@app.route('/modules/<int:module_id>/bundle', methods=['GET'])
+@login_required
+@query_budget(6)
+@response_cache.cached(versions=lambda module_id: [f"module:{module_id}"], ttl=60)
+def get_module_bundle(module_id):
+    """Module, resources, nested quizzes and active challenges in one response."""
+    bundle = load_module_bundle(module_id)
+    if bundle is None:
+        abort(404)
+
+    return jsonify(bundle)
+
 @app.route('/modules/<int:module_id>/resources', methods=['GET'])
 @login_required
+@response_cache.cached(versions=lambda module_id: [f"module:{module_id}"])
 def get_resources_for_module(module_id):
-    logger.debug(f"Fetching resources for module with ID: {module_id}")
-    
-    module_resources = db.session.query(ModuleResource).filter_by(module_id=module_id).all()
+    rows = (
+        db.session.query(Resource, ResourceRating)
+        .join(ModuleResource, ModuleResource.resource_id == Resource.id)
+        .outerjoin(ResourceRating, ResourceRating.resource_id == Resource.id)
+        .filter(ModuleResource.module_id == module_id)
+        .order_by(ModuleResource.id)
+        .all()
+    )
     
     resources = [
         {
-            "id": module_resource.resource.id,
-            "title": module_resource.resource.title,
-            "description": module_resource.resource.description,
-            "url": module_resource.resource.url,
+            "id": resource.id,
+            "title": resource.title,
+            "description": resource.description,
+            "url": resource.url,
+            "feedback_count": resource.feedback_count,
+            "rating": ratings.rating_payload(summary),
         }
-        for module_resource in module_resources
+        for resource, summary in rows
     ]
     
-    logger.debug(f"Resources found for module {module_id}: {resources}")
+    logger.debug("Found %d resources for module %s", len(resources), module_id)
     
     return jsonify(resources)
 
@@ -337,50 +501,24 @@ def create_learning_path():
 
     data = request.get_json()
 
-    new_path = LearningPath(
-        title=data.get("title"),
-        description=data.get("description"),
-        contributor_id=current_user.id,
-    )
-    db.session.add(new_path)
-    db.session.commit()
-
-    if data.get("modules"):
-        for module_data in data.get("modules"):
-            new_module = Module(
-                title=module_data.get("title"),
-                description=module_data.get("description"),
-                learning_path_id=new_path.id
-            )
-            db.session.add(new_module)
-            db.session.commit()
-
-            if module_data.get("resources"):
-                for resource_data in module_data.get("resources"):
-                    new_resource = Resource(
-                        title=resource_data.get("title"),
-                        url=resource_data.get("url"),
-                        type=resource_data.get("type"),
-                        description=resource_data.get("description"),
-                        contributor_id=current_user.id
-                    )
-                    db.session.add(new_resource)
-                    db.session.commit()
-
-                    module_resource = ModuleResource(
-                        module_id=new_module.id,
-                        resource_id=new_resource.id
-                    )
-                    db.session.add(module_resource)
+    try:
+        new_path = authoring.create_learning_path(data, current_user.id)
+        bump_versions(path_keys(new_path.id))
+        db.session.commit()
+        catalogue_cache.invalidate_path_ids()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Invalid module or resource reference"}), 400
 
-    db.session.commit()
     return jsonify(new_path.to_dict()), 201
 
 @app.route('/created-learning-paths', methods=['GET'])
 @login_required
 def get_learning_paths():
-    learning_paths = LearningPath.query.filter_by(contributor_id=current_user.id).all()
-    return jsonify([path.to_dict() for path in learning_paths])
+    query = LearningPath.query.filter_by(contributor_id=current_user.id)
+    cursor, limit = page_params(request.args)
+    learning_paths, next_cursor = PATH_ORDER.page(PATH_ORDER.page_query(query, cursor, limit).all(), limit)
+    return jsonify([path.to_dict() for path in learning_paths]), 200, link_headers(next_cursor)
 
 @app.route('/update-learning-path/<int:path_id>', methods=['GET', 'PUT'])
 @login_required
@@ -401,39 +539,22 @@ def update_learning_path(path_id):
     if request.method == 'PUT':
         data = request.get_json()
 
-        learning_path.title = data.get("title", learning_path.title)
-        learning_path.description = data.get("description", learning_path.description)
-
-        if data.get("modules"):
-            for module in learning_path.modules:
-                db.session.delete(module)
-
-            for module_data in data.get("modules"):
-                new_module = Module(
-                    title=module_data.get("title"),
-                    description=module_data.get("description"),
-                    learning_path_id=learning_path.id
-                )
-                db.session.add(new_module)
-
-                if module_data.get("resources"):
-                    for resource_data in module_data.get("resources"):
-                        new_resource = Resource(
-                            title=resource_data.get("title"),
-                            url=resource_data.get("url"),
-                            type=resource_data.get("type"),
-                            description=resource_data.get("description"),
-                            contributor_id=current_user.id
-                        )
-                        db.session.add(new_resource)
-
-                        module_resource = ModuleResource(
-                            module_id=new_module.id,
-                            resource_id=new_resource.id
-                        )
-                        db.session.add(module_resource)
+        try:
+            stale_keys = path_keys(path_id)
+            authoring.update_learning_path(learning_path, data, current_user.id)
+            edited_resource_ids = [
+                resource["id"]
+                for module in data.get("modules") or []
+                for resource in module.get("resources") or []
+                if resource.get("id")
+            ]
+            bump_versions(stale_keys + path_keys(path_id) + resource_keys(edited_resource_ids))
+            db.session.commit()
+            catalogue_cache.invalidate_path(path_id)
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": "Modules with quizzes or challenges cannot be removed, and linked resources must exist"}), 409
 
-        db.session.commit()
         return jsonify(learning_path.to_dict()), 200
     
 @app.route('/modules/<int:module_id>/quizzes', methods=['POST'])
@@ -443,178 +564,154 @@ def create_quiz_for_module(module_id):
         return jsonify({"error": "Unauthorized"}), 403
 
     data = request.get_json()
-    logger.debug(f"Creating quiz for module {module_id} by user {current_user.id}. Data: {data}")
+    points = data.get("points", app.config['QUIZ_DEFAULT_POINTS'])
+    if type(points) is not int or points < 0:
+        return jsonify({"error": "points must be a non-negative integer"}), 400
 
+    module = Module.query.get_or_404(module_id)
     new_quiz = QuizContent(
         module_id=module_id,
         question=data.get("question"),
         options=json.dumps(data.get("options")),
         correct_option=data.get("correct_option"),
+        points=points,
     )
     db.session.add(new_quiz)
+    db.session.flush()
+    progress.refresh_path_totals([module.learning_path_id])
+    bump_versions([f"module:{module_id}"])
     db.session.commit()
-    logger.info(f"Quiz created for module {module_id}: {new_quiz.to_dict()}")
+    if module.learning_path_id is not None:
+        catalogue_cache.invalidate_path(module.learning_path_id)
+    logger.info("Quiz %s created for module %s by user %s", new_quiz.id, module_id, current_user.id)
 
     return jsonify(new_quiz.to_dict()), 201
 
 
 @app.route('/modules/<int:module_id>/quizzes', methods=['GET'])
 @login_required
+@response_cache.cached(versions=lambda module_id: [f"module:{module_id}"])
 def get_quizzes_for_module(module_id):
-    logger.debug(f"Fetching quizzes for module {module_id}")
-
-    quizzes = QuizContent.query.filter_by(module_id=module_id).all()
+    query = QuizContent.query.filter_by(module_id=module_id)
+    cursor, limit = page_params(request.args)
+    quizzes, next_cursor = QUIZ_ORDER.page(QUIZ_ORDER.page_query(query, cursor, limit).all(), limit)
     quizzes_dict = [quiz.to_dict() for quiz in quizzes]
-    logger.debug(f"Quizzes found for module {module_id}: {quizzes_dict}")
+    logger.debug("Found %d quizzes for module %s", len(quizzes_dict), module_id)
 
-    return jsonify(quizzes_dict)
+    return jsonify(quizzes_dict), 200, link_headers(next_cursor)
 
 
 @app.route('/quizzes/<int:quiz_id>/submit', methods=['POST'])
 @login_required
 def submit_quiz(quiz_id):
-    data = request.get_json()
-    logger.debug(f"Submitting quiz {quiz_id} for user {current_user.id}. Data: {data}")
-
-    quiz = QuizContent.query.get_or_404(quiz_id)
-
-    selected_option = data.get("selected_option")
-
-    score = quiz.points if selected_option == quiz.correct_option else 0
-
-    submission = QuizSubmission(
-        user_id=current_user.id,
-        quiz_id=quiz_id,
-        selected_option=selected_option,
-        score=score,
-    )
-
-    db.session.add(submission)
-    db.session.commit()
+    data = request.get_json() or {}
+    if not isinstance(data.get("selected_option"), str):
+        return jsonify({"error": "selected_option must be a string"}), 400
 
-    submission.update_user_points()
+    try:
+        result = score_attempt(current_user.id, [
+            {"quiz_id": quiz_id, "selected_option": data.get("selected_option")}
+        ], idempotency_key=request.headers.get('Idempotency-Key'))
+    except UnknownQuizError:
+        abort(404)
+    except DuplicateAttemptError:
+        return jsonify({"message": "Quiz already submitted"}), 200
 
-    logger.info(f"Quiz {quiz_id} submitted by user {current_user.id}: {submission.to_dict()}")
+    score = result["total_score"]
+    logger.info("Quiz %s submitted by user %s: score %s", quiz_id, current_user.id, score)
 
     return jsonify({"message": "Quiz submitted", "score": score}), 200
 
 
-@app.route('/comments', methods=['POST'])
-def create_comment():
-    data = request.get_json()
-    user_id = data.get('user_id')
-    content = data.get('content')
-
-    user = User.query.get(user_id)
-    if not user:
-        abort(404, description="User not found")
+def _valid_answer(answer):
+    return (
+        isinstance(answer, dict)
+        and type(answer.get("quiz_id")) is int
+        and isinstance(answer.get("selected_option"), str)
+    )
 
-    comment = Comment(user_id=user_id, content=content)
-    db.session.add(comment)
-    db.session.commit()
 
-    return jsonify(comment.to_dict()), 201
+@app.route('/quizzes/submit', methods=['POST'])
+@login_required
+def submit_quiz_attempt():
+    """Score a whole quiz attempt (many answers) in one transaction."""
+    data = request.get_json() or {}
+    answers = data.get("answers")
 
-@app.route('/replies', methods=['POST'])
-def create_reply():
-    data = request.get_json()
-    user_id = data.get('user_id')
-    comment_id = data.get('comment_id')
-    content = data.get('content')
+    if not isinstance(answers, list) or not answers:
+        return jsonify({"error": "answers must be a non-empty list"}), 400
+    if not all(_valid_answer(answer) for answer in answers):
+        return jsonify({"error": "Each answer requires an integer quiz_id and a string selected_option"}), 400
 
-    user = User.query.get(user_id)
-    if not user:
-        abort(404, description="User not found")
+    try:
+        result = score_attempt(current_user.id, answers, idempotency_key=request.headers.get('Idempotency-Key'))
+    except UnknownQuizError as e:
+        return jsonify({"error": str(e)}), 404
+    except DuplicateAttemptError:
+        return jsonify({"message": "Quiz attempt already submitted"}), 200
+
+    logger.info(
+        "Quiz attempt of %d answers submitted by user %s: score %s",
+        len(answers), current_user.id, result['total_score'],
+    )
 
-    comment = Comment.query.get(comment_id)
-    if not comment:
-        abort(404, description="Comment not found")
+    return jsonify({"message": "Quiz attempt submitted", **result}), 200
 
-    reply = Reply(user_id=user_id, comment_id=comment_id, content=content)
-    db.session.add(reply)
-    db.session.commit()
 
-    return jsonify(reply.to_dict()), 201
+def _forum_write(write):
+    try:
+        payload, created = write(request.get_json() or {}, idempotency_key=request.headers.get('Idempotency-Key'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except UnknownReferenceError as e:
+        abort(404, description=str(e))
+    return jsonify(payload), 201 if created else 200
 
 @app.route('/comments', methods=['POST'])
-def post_comment():
-    data = request.get_json()
-    user_id = data.get('user_id')
-    content = data.get('content')
-
-    user = User.query.get(user_id)
-    if not user:
-        abort(404, description="User not found")
-
-    comment = Comment(user_id=user_id, content=content)
-    db.session.add(comment)
-    db.session.commit()
-
-    return jsonify({
-        **comment.to_dict(),
-        "username": user.username,
-        "created_at": comment.created_at.strftime('%Y-%m-%d %H:%M:%S')
-    }), 201
+def create_comment():
+    return _forum_write(write_comment)
 
 @app.route('/replies', methods=['POST'])
-def post_reply():
-    data = request.get_json()
-    user_id = data.get('user_id')
-    comment_id = data.get('comment_id')
-    content = data.get('content')
-
-    user = User.query.get(user_id)
-    if not user:
-        abort(404, description="User not found")
-
-    comment = Comment.query.get(comment_id)
-    if not comment:
-        abort(404, description="Comment not found")
-
-    reply = Reply(user_id=user_id, comment_id=comment_id, content=content)
-    db.session.add(reply)
-    db.session.commit()
+def create_reply():
+    return _forum_write(write_reply)
 
-    return jsonify({
-        **reply.to_dict(),
-        "username": user.username,
-        "created_at": reply.created_at.strftime('%Y-%m-%d %H:%M:%S')
-    }), 201
+@app.route('/comments/import', methods=['POST'])
+@login_required
+def import_comment_threads():
+    """Bulk-load forum threads (comments with nested replies) in one transaction."""
+    if current_user.role != 'Admin':
+        return jsonify({"error": "Unauthorized"}), 403
+    data = request.get_json() or {}
+    try:
+        threads, created = import_threads(data.get("threads"), idempotency_key=request.headers.get('Idempotency-Key'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except UnknownReferenceError as e:
+        abort(404, description=str(e))
+    logger.info("Imported %d threads (%d new rows) by user %s", len(threads), created, current_user.id)
+
+    return jsonify({"threads": threads, "created": created}), 201 if created else 200
+
+def _comment_page_args():
+    cursor, limit = page_params(request.args, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    replies_limit = request.args.get('replies', type=int)
+    return {
+        "cursor": cursor,
+        "limit": limit,
+        "replies_limit": max(replies_limit, 0) if replies_limit is not None else None,
+    }
 
 @app.route('/comments', methods=['GET'])
+@query_budget(2)
 def get_comments():
-    comments = Comment.query.all()
-    comments_data = []
-
-    for comment in comments:
-        replies = Reply.query.filter_by(comment_id=comment.id).all()
-        replies_data = [reply.to_dict() for reply in replies]
-        comment_data = comment.to_dict()
-        comment_data["replies"] = replies_data
-        comment_data["replies_count"] = len(replies_data)
-        comment_data["username"] = comment.user.username
-        comment_data["created_at"] = comment.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        comments_data.append(comment_data)
-    
-    return jsonify(comments_data), 200
+    comments_data, next_cursor = load_comment_page(**_comment_page_args())
+    return jsonify(comments_data), 200, link_headers(next_cursor)
 
 @app.route('/comments/user/<int:user_id>/replies', methods=['GET'])
+@query_budget(2)
 def get_user_comments_and_replies(user_id):
-    comments = Comment.query.filter_by(user_id=user_id).all()
-    comments_data = []
-
-    for comment in comments:
-        replies = Reply.query.filter_by(comment_id=comment.id).all()
-        replies_data = [reply.to_dict() for reply in replies]
-        
-        comment_data = comment.to_dict()
-        comment_data["replies"] = replies_data
-        comment_data["replies_count"] = len(replies_data)
-        comment_data["username"] = comment.user.username
-        comment_data["created_at"] = comment.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        comments_data.append(comment_data)
-
-    return jsonify({"comments": comments_data}), 200
+    comments_data, next_cursor = load_comment_page(user_id=user_id, **_comment_page_args())
+    return jsonify({"comments": comments_data}), 200, link_headers(next_cursor)
 
 @app.route('/feedbacks', methods=['POST'])
 def submit_feedback():
@@ -625,7 +722,10 @@ def submit_feedback():
 
     resource_id = data.get('resource_id')
     comment = data.get('content')
-    rating = data.get('rating')
+    try:
+        rating = ratings.validate_rating(data.get('rating'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     resource = Resource.query.get(resource_id)
     if not resource:
@@ -639,7 +739,12 @@ def submit_feedback():
     )
 
     db.session.add(feedback)
+    counters.adjust(counters.FEEDBACK_COUNT, [resource.id])
+    path_ids = ratings.record_rating(resource_id, rating) if rating is not None else []
+    bump_versions(resource_keys([resource.id]))
     db.session.commit()
+    for path_id in path_ids:
+        catalogue_cache.invalidate_path(path_id)
 
     return jsonify({
         "feedback_id": feedback.id,
@@ -650,25 +755,26 @@ def submit_feedback():
     }), 201
 
 @app.route('/resources/<int:resource_id>/feedbacks', methods=['GET'])
+@response_cache.cached(versions=lambda resource_id: [f"resource:{resource_id}"])
 def get_feedbacks_for_resource(resource_id):
-    """Fetch all feedbacks for a given resource."""
+    """Fetch a page of feedback for a resource, newest first."""
     resource = Resource.query.get(resource_id)
     if not resource:
         return jsonify({"error": "Resource not found"}), 404
 
-    feedbacks = Feedback.query.filter_by(resource_id=resource_id).all()
-    feedback_list = [
-        {
-            "feedback_id": feedback.id,
-            "user_id": feedback.user_id,
-            "comment": feedback.comment,
-            "rating": feedback.rating,
-            "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
-        }
-        for feedback in feedbacks
-    ]
+    cursor, limit = page_params(request.args, ratings.DEFAULT_PAGE_SIZE, ratings.MAX_PAGE_SIZE)
+    feedback_list, next_cursor = ratings.feedback_page(resource_id, cursor, limit)
+    headers = {"X-Total-Count": str(resource.feedback_count), **link_headers(next_cursor)}
+    return jsonify(feedback_list), 200, headers
 
-    return jsonify(feedback_list), 200
+@app.route('/resources/<int:resource_id>/rating', methods=['GET'])
+def get_resource_rating(resource_id):
+    """Average, count and histogram of a resource's ratings."""
+    resource = Resource.query.get(resource_id)
+    if not resource:
+        return jsonify({"error": "Resource not found"}), 404
+    summary = db.session.get(ResourceRating, resource_id)
+    return jsonify({"resource_id": resource_id, **ratings.rating_payload(summary)}), 200
 
 
 @app.route('/users/<username>/achievements', methods=['GET'])
@@ -677,44 +783,94 @@ def get_user_achievements(username):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    achievements = Achievement.query.all()
-    user_achievements = UserAchievement.query.filter_by(user_id=user.id).all()
-
-    new_achievements = []
-    for achievement in achievements:
-        if user.points >= achievement.points_required:
-            if not any(ua.achievement_id == achievement.id for ua in user_achievements):
-                user_achievement = UserAchievement(
-                    user_id=user.id,
-                    achievement_id=achievement.id,
-                    earned_at=datetime.utcnow()
-                )
-                db.session.add(user_achievement)
-                db.session.commit()
-                new_achievements.append(achievement)
+    user_achievements = (
+        db.session.query(Achievement, UserAchievement.earned_at)
+        .join(UserAchievement, UserAchievement.achievement_id == Achievement.id)
+        .filter(UserAchievement.user_id == user.id)
+        .order_by(UserAchievement.earned_at)
+        .all()
+    )
 
     current_achievements = [
-        {
-            "id": ua.achievement.id,
-            "name": ua.achievement.name,
-            "description": ua.achievement.description,
-            "icon_url": ua.achievement.icon_url,
-            "earned_at": ua.earned_at.isoformat()
-        }
-        for ua in user_achievements
-    ]
-
-    current_achievements.extend([
         {
             "id": achievement.id,
             "name": achievement.name,
             "description": achievement.description,
             "icon_url": achievement.icon_url,
-            "earned_at": datetime.utcnow().isoformat()
+            "earned_at": earned_at.isoformat()
         }
-        for achievement in new_achievements
-    ])
+        for achievement, earned_at in user_achievements
+    ]
 
     return jsonify(current_achievements)
+
+
+@app.cli.command('backfill-achievements')
+@click.option('--chunk-size', default=1000, show_default=True, help='Users evaluated per transaction.')
+def backfill_achievements_command(chunk_size):
+    """Award achievements to every user who already qualifies."""
+    awarded = backfill_achievements(chunk_size)
+    click.echo(f"Awarded {awarded} achievements.")
+
+
+def _outbox_worker(batch_size, poll_interval, once):
+    # Forked workers must not reuse the parent's pooled connections
+    with app.app_context():
+        db.engine.dispose(close=False)
+        return outbox.run_worker(batch_size, poll_interval, once)
+
+
+@app.cli.command('rebuild-ratings')
+def rebuild_ratings_command():
+    """Recompute resource and learning path rating aggregates from feedback."""
+    ratings.rebuild_ratings()
+    bump_versions(f"module:{module_id}" for module_id in db.session.scalars(db.select(Module.id)))
+    db.session.commit()
+    catalogue_cache.local.clear()
+    click.echo("Rating aggregates rebuilt.")
+
+
+@app.cli.command('rebuild-progress')
+def rebuild_progress_command():
+    """Recompute path totals and enrollment progress from completions."""
+    progress.rebuild_progress()
+    catalogue_cache.local.clear()
+    click.echo("Learner progress rebuilt.")
+
+
+@app.cli.command('reconcile-counters')
+@click.option('--batch-size', default=counters.RECONCILE_BATCH_SIZE, show_default=True,
+              help='Parent IDs repaired per transaction.')
+def reconcile_counters_command(batch_size):
+    """Repair reply, enrollment and feedback counters that drifted from their rows."""
+    fixed = counters.reconcile_all(batch_size)
+    # /resources/<id>/feedbacks and the module pages show feedback counts
+    resource_ids = fixed[counters.FEEDBACK_COUNT.name]
+    if resource_ids:
+        bump_versions(resource_keys(resource_ids))
+        db.session.commit()
+    catalogue_cache.local.clear()
+    for name, ids in fixed.items():
+        click.echo(f"{name}: {len(ids)} rows repaired.")
+
+
+@app.cli.command('outbox-worker')
+@click.option('--processes', default=1, show_default=True, help='Worker processes to run.')
+@click.option('--batch-size', default=100, show_default=True, help='Events claimed per transaction.')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to sleep when the queue is empty.')
+@click.option('--once', is_flag=True, help='Exit once the queue is drained.')
+def outbox_worker_command(processes, batch_size, poll_interval, once):
+    """Apply queued points, leaderboard and achievement updates."""
+    if processes <= 1:
+        processed = outbox.run_worker(batch_size, poll_interval, once)
+        click.echo(f"Processed {processed} outbox events.")
+        return
+
+    import multiprocessing
+
+    with multiprocessing.get_context('fork').Pool(processes) as pool:
+        counts = pool.starmap(_outbox_worker, [(batch_size, poll_interval, once)] * processes)
+    click.echo(f"Processed {sum(counts)} outbox events.")
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5555)
@@ -0,0 +1,434 @@
+"""ASGI serving mode: the read-heavy routes on an async SQLAlchemy engine.
+
+    uvicorn asgi:app --workers 4 --host 0.0.0.0 --port 8000
+
+The GET routes below (leaderboard, learning path catalogue, modules, comments,
+feedback listing) return the same JSON as their Flask views. They run on an
+``AsyncSession``, so a slow query parks a coroutine instead of tying up a
+whole worker. Every other request (writes, login, admin) is passed through to
+the Flask app, which runs in a thread pool. That makes ``asgi:app`` a drop-in
+replacement for ``app:app``.
+
+Auth is shared with Flask. The session cookie is verified with the Flask
+app's signing serializer. The user comes from the same ``identity_cache``
+snapshots, so ``login_required`` behaves the same, including the redirect to
+the login view.
+
+``DATABASE_URL`` is mapped to an async driver: psycopg for PostgreSQL and
+aiosqlite for SQLite. Set ``ASYNC_DATABASE_URL`` to override the mapping.
+Pool sizing comes from the same ``DB_*`` variables. These routes read the
+database directly. They bypass ``response_cache`` and the in-memory
+leaderboard ranks.
+"""
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import wraps
+from urllib.parse import urlencode
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from sqlalchemy import func, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.pool import QueuePool
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import RedirectResponse, Response
+from starlette.routing import Match, Route
+from werkzeug.exceptions import NotFound
+
+from app import PATH_ORDER, QUIZ_ORDER, app as flask_app
+from engine import engine_options_from_env, init_engine_events
+from forum import COMMENT_ORDER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, comment_payload
+from identity import UserIdentity, identity_cache
+from models import (
+    Challenge, Comment, Feedback, LearningPath, Module, ModuleResource, QuizContent, Reply,
+    Resource, ResourceRating, User, UserLearningPath,
+)
+from module_bundle import quiz_tree
+from pagination import InvalidCursor, page_params
+import ratings
+
+
+def async_database_url(uri):
+    """``uri`` with its driver swapped for an asyncio one."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend == 'postgresql':
+        return url.set(drivername='postgresql+psycopg')
+    if backend == 'sqlite':
+        return url.set(drivername='sqlite+aiosqlite')
+    return url
+
+
+def _engine_options(uri):
+    options = engine_options_from_env(uri, os.environ)
+    # The instrumented QueuePool is sync-only; async engines default to AsyncAdaptedQueuePool
+    if isinstance(options.get('poolclass'), type) and issubclass(options['poolclass'], QueuePool):
+        del options['poolclass']
+    return options
+
+
+_database_uri = flask_app.config['SQLALCHEMY_DATABASE_URI']
+engine = create_async_engine(
+    os.environ.get('ASYNC_DATABASE_URL') or async_database_url(_database_uri),
+    **_engine_options(_database_uri),
+)
+init_engine_events(engine.sync_engine, os.environ)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+_session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+
+
+def json_response(data, status_code=200, headers=None):
+    """Response encoded with the Flask app's JSON provider, so bodies match byte for byte."""
+    return Response(flask_app.json.dumps(data) + "\n", status_code, headers, media_type='application/json')
+
+
+def not_found(description=None):
+    """The 404 the Flask route gives: its JSON error when it has one, otherwise ``abort(404)``'s HTML page."""
+    if description:
+        return json_response({"error": description}, 404)
+    return Response(NotFound().get_body(), 404, media_type='text/html')
+
+
+def _int_arg(request, name, default=None):
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def page_headers(request, next_cursor):
+    """Twin of ``pagination.link_headers`` for a Starlette request."""
+    if next_cursor is None:
+        return {}
+    query = urlencode({**request.query_params, "cursor": next_cursor})
+    return {"X-Next-Cursor": next_cursor, "Link": f'<{request.url.replace(query=query)}>; rel="next"'}
+
+
+async def invalid_cursor(request, exc):
+    return json_response({"error": str(exc)}, 400)
+
+
+# -- auth -------------------------------------------------------------
+
+
+async def load_identity(request, session):
+    """The ``UserIdentity`` of the Flask session cookie, or ``None``."""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return None
+    try:
+        data = _session_serializer.loads(
+            cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds())
+        )
+    except BadSignature:
+        return None
+    try:
+        user_id = int(data['_user_id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    identity = identity_cache.cache.get(user_id)
+    if identity is None:
+        row = (await session.execute(
+            select(User.id, User.username, User.email, User.role).where(User.id == user_id)
+        )).first()
+        if row is None:
+            return None
+        identity = UserIdentity(*row)
+        identity_cache.cache.set(user_id, identity)
+    return identity
+
+
+def endpoint(login=False):
+    """Run ``fn(request, session[, identity])`` with a session, enforcing login like ``login_required``."""
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(request):
+            async with Session() as session:
+                if not login:
+                    return await fn(request, session)
+                identity = await load_identity(request, session)
+                if identity is None:
+                    return RedirectResponse(
+                        f"/{flask_app.login_manager.login_view}?{urlencode({'next': str(request.url)})}",
+                        status_code=302,
+                    )
+                return await fn(request, session, identity)
+        return wrapper
+    return decorator
+
+
+# -- leaderboard ------------------------------------------------------
+
+
+@endpoint()
+async def get_leaderboard(request, session):
+    limit = max(min(_int_arg(request, 'limit', 8), 100), 0)
+    rows = await session.execute(
+        select(User.username, User.points).order_by(User.points.desc(), User.id).limit(limit)
+    )
+    return json_response([
+        {"username": username.split()[0], "points": points or 0} for username, points in rows
+    ])
+
+
+# -- catalogue --------------------------------------------------------
+
+
+async def _catalogue_response(request, session, query):
+    cursor, limit = page_params(request.query_params)
+    paths, next_cursor = PATH_ORDER.page(await session.scalars(PATH_ORDER.page_query(query, cursor, limit)), limit)
+    # Same encoding as catalogue_cache.render, which stitches per-path blobs from the app's JSON provider
+    body = b"[" + b",".join(flask_app.json.dumps(path.to_dict()).encode() for path in paths) + b"]"
+    return Response(body, headers=page_headers(request, next_cursor), media_type='application/json')
+
+
+@endpoint(login=True)
+async def get_available_paths(request, session, identity):
+    enrolled = select(UserLearningPath.learning_path_id).where(UserLearningPath.user_id == identity.id)
+    return await _catalogue_response(request, session, select(LearningPath).where(LearningPath.id.not_in(enrolled)))
+
+
+@endpoint(login=True)
+async def get_enrolled_paths(request, session, identity):
+    enrolled = select(UserLearningPath.learning_path_id).where(UserLearningPath.user_id == identity.id)
+    return await _catalogue_response(request, session, select(LearningPath).where(LearningPath.id.in_(enrolled)))
+
+
+@endpoint(login=True)
+async def get_modules_for_learning_path(request, session, identity):
+    modules = await session.scalars(
+        select(Module).where(Module.learning_path_id == request.path_params['path_id']).order_by(Module.id)
+    )
+    return json_response([module.to_dict() for module in modules])
+
+
+@endpoint(login=True)
+async def get_module_details(request, session, identity):
+    module = await session.get(Module, request.path_params['module_id'])
+    if module is None:
+        return not_found()
+    return json_response(module.to_dict())
+
+
+async def _module_resources(session, module_id):
+    rows = await session.execute(
+        select(Resource, ResourceRating)
+        .join(ModuleResource, ModuleResource.resource_id == Resource.id)
+        .outerjoin(ResourceRating, ResourceRating.resource_id == Resource.id)
+        .where(ModuleResource.module_id == module_id)
+        .order_by(ModuleResource.id)
+    )
+    return rows.all()
+
+
+@endpoint(login=True)
+async def get_resources_for_module(request, session, identity):
+    rows = await _module_resources(session, request.path_params['module_id'])
+    return json_response([
+        {
+            "id": resource.id,
+            "title": resource.title,
+            "description": resource.description,
+            "url": resource.url,
+            "feedback_count": resource.feedback_count,
+            "rating": ratings.rating_payload(summary),
+        }
+        for resource, summary in rows
+    ])
+
+
+@endpoint(login=True)
+async def get_quizzes_for_module(request, session, identity):
+    query = select(QuizContent).where(QuizContent.module_id == request.path_params['module_id'])
+    cursor, limit = page_params(request.query_params)
+    quizzes, next_cursor = QUIZ_ORDER.page(await session.scalars(QUIZ_ORDER.page_query(query, cursor, limit)), limit)
+    return json_response([quiz.to_dict() for quiz in quizzes], headers=page_headers(request, next_cursor))
+
+
+@endpoint(login=True)
+async def get_module_bundle(request, session, identity):
+    """Async twin of ``module_bundle.load_module_bundle``: the same four queries."""
+    module_id = request.path_params['module_id']
+    module = await session.get(Module, module_id)
+    if module is None:
+        return not_found()
+    now = datetime.utcnow()
+
+    resources = await _module_resources(session, module_id)
+    quizzes = (await session.scalars(
+        select(QuizContent).where(QuizContent.module_id == module_id).order_by(QuizContent.id)
+    )).all()
+    challenges = await session.scalars(
+        select(Challenge)
+        .where(Challenge.module_id == module_id)
+        .where(or_(Challenge.start_date.is_(None), Challenge.start_date <= now))
+        .where(or_(Challenge.end_date.is_(None), Challenge.end_date >= now))
+        .order_by(Challenge.id)
+    )
+    return json_response({
+        "module": module.to_dict(),
+        "resources": [
+            {**resource.to_dict(), "rating": ratings.rating_payload(summary)}
+            for resource, summary in resources
+        ],
+        "quizzes": quiz_tree(quizzes),
+        "challenges": [
+            {
+                "id": challenge.id,
+                "title": challenge.title,
+                "description": challenge.description,
+                "points_reward": challenge.points_reward,
+                "start_date": challenge.start_date.isoformat() if challenge.start_date else None,
+                "end_date": challenge.end_date.isoformat() if challenge.end_date else None,
+                "module_id": challenge.module_id,
+            }
+            for challenge in challenges
+        ],
+    })
+
+
+# -- comments and feedback --------------------------------------------
+
+
+def _comment_page_args(request):
+    cursor, limit = page_params(request.query_params, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    replies_limit = _int_arg(request, 'replies')
+    return {
+        "cursor": cursor,
+        "limit": limit,
+        "replies_limit": max(replies_limit, 0) if replies_limit is not None else None,
+    }
+
+
+async def load_comment_page(session, user_id=None, cursor=None, limit=DEFAULT_PAGE_SIZE, replies_limit=None):
+    """Async twin of ``forum.load_comment_page``, with the same queries and payloads."""
+    query = select(Comment).options(joinedload(Comment.user))
+    if user_id is not None:
+        query = query.where(Comment.user_id == user_id)
+    comments, next_cursor = COMMENT_ORDER.page(
+        await session.scalars(COMMENT_ORDER.page_query(query, cursor, limit)), limit
+    )
+
+    comment_ids = [comment.id for comment in comments]
+    if not comment_ids:
+        return [], None
+    replies_by_comment = {comment_id: [] for comment_id in comment_ids}
+
+    if replies_limit is None:
+        replies = await session.scalars(
+            select(Reply).options(joinedload(Reply.user))
+            .where(Reply.comment_id.in_(comment_ids))
+            .order_by(Reply.comment_id, Reply.id)
+        )
+        for reply in replies:
+            replies_by_comment[reply.comment_id].append(reply)
+    elif replies_limit > 0:
+        ranked = (
+            select(
+                Reply.id.label("id"),
+                func.row_number().over(partition_by=Reply.comment_id, order_by=Reply.id).label("position"),
+            )
+            .where(Reply.comment_id.in_(comment_ids))
+            .subquery()
+        )
+        ranked_reply = aliased(Reply)
+        replies = await session.scalars(
+            select(ranked_reply)
+            .join(ranked, ranked.c.id == ranked_reply.id)
+            .where(ranked.c.position <= replies_limit)
+            .options(joinedload(ranked_reply.user))
+            .order_by(ranked_reply.comment_id, ranked_reply.id)
+        )
+        for reply in replies:
+            replies_by_comment[reply.comment_id].append(reply)
+
+    payloads = [comment_payload(comment, replies_by_comment[comment.id]) for comment in comments]
+    return payloads, next_cursor
+
+
+@endpoint()
+async def get_comments(request, session):
+    comments_data, next_cursor = await load_comment_page(session, **_comment_page_args(request))
+    return json_response(comments_data, headers=page_headers(request, next_cursor))
+
+
+@endpoint()
+async def get_user_comments_and_replies(request, session):
+    comments_data, next_cursor = await load_comment_page(
+        session, user_id=request.path_params['user_id'], **_comment_page_args(request)
+    )
+    return json_response({"comments": comments_data}, headers=page_headers(request, next_cursor))
+
+
+@endpoint()
+async def get_feedbacks_for_resource(request, session):
+    resource_id = request.path_params['resource_id']
+    resource = await session.get(Resource, resource_id)
+    if resource is None:
+        return not_found("Resource not found")
+
+    cursor, limit = page_params(request.query_params, ratings.DEFAULT_PAGE_SIZE, ratings.MAX_PAGE_SIZE)
+    query = select(Feedback).where(Feedback.resource_id == resource_id)
+    order = ratings.FEEDBACK_ORDER
+    feedbacks, next_cursor = order.page(await session.scalars(order.page_query(query, cursor, limit)), limit)
+    return json_response(
+        [ratings.feedback_payload(feedback) for feedback in feedbacks],
+        headers={"X-Total-Count": str(resource.feedback_count), **page_headers(request, next_cursor)},
+    )
+
+
+@endpoint()
+async def get_resource_rating(request, session):
+    resource_id = request.path_params['resource_id']
+    if await session.get(Resource, resource_id) is None:
+        return not_found("Resource not found")
+    summary = await session.get(ResourceRating, resource_id)
+    return json_response({"resource_id": resource_id, **ratings.rating_payload(summary)})
+
+
+routes = [
+    Route('/leaderboard', get_leaderboard, methods=['GET']),
+    Route('/learning-paths', get_available_paths, methods=['GET']),
+    Route('/learning-paths/enrolled', get_enrolled_paths, methods=['GET']),
+    Route('/learning-paths/{path_id:int}/modules', get_modules_for_learning_path, methods=['GET']),
+    Route('/modules/{module_id:int}', get_module_details, methods=['GET']),
+    Route('/modules/{module_id:int}/resources', get_resources_for_module, methods=['GET']),
+    Route('/modules/{module_id:int}/quizzes', get_quizzes_for_module, methods=['GET']),
+    Route('/modules/{module_id:int}/bundle', get_module_bundle, methods=['GET']),
+    Route('/comments', get_comments, methods=['GET']),
+    Route('/comments/user/{user_id:int}/replies', get_user_comments_and_replies, methods=['GET']),
+    Route('/resources/{resource_id:int}/feedbacks', get_feedbacks_for_resource, methods=['GET']),
+    Route('/resources/{resource_id:int}/rating', get_resource_rating, methods=['GET']),
+]
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    yield
+    await engine.dispose()
+
+
+# Mirrors CORS(app, supports_credentials=True) on the Flask side
+read_app = Starlette(
+    routes=routes,
+    lifespan=_lifespan,
+    middleware=[Middleware(CORSMiddleware, allow_origin_regex='.*', allow_credentials=True)],
+    exception_handlers={InvalidCursor: invalid_cursor},
+)
+flask_fallback = WSGIMiddleware(flask_app)
+
+
+async def app(scope, receive, send):
+    """Dispatch GETs matching ``routes`` to the async app and everything else to Flask."""
+    if scope['type'] == 'http' and any(route.matches(scope)[0] == Match.FULL for route in routes):
+        await read_app(scope, receive, send)
+    elif scope['type'] == 'http':
+        await flask_fallback(scope, receive, send)
+    else:
+        await read_app(scope, receive, send)
@@ -0,0 +1,151 @@
+"""Learning path authoring: build the whole module/resource graph with bulk inserts.
+
+Both entry points leave the transaction open; callers commit once. Module and
+quiz totals used for learner progress are refreshed when the module set changes,
+and the path's rating is rolled up again when its resource links change.
+"""
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import selectinload
+
+from db import db
+from models import LearningPath, Module, ModuleResource, Resource
+from progress import forget_modules, recount_enrollments, refresh_path_totals
+from ratings import rollup_learning_paths
+
+MODULE_FIELDS = ("title", "description")
+RESOURCE_FIELDS = ("title", "url", "type", "description")
+
+
+def _insert_returning_ids(model, rows):
+    """Bulk insert ``rows`` and return their new IDs in the same order."""
+    if not rows:
+        return []
+    return db.session.scalars(
+        insert(model).returning(model.id, sort_by_parameter_order=True), rows
+    ).all()
+
+
+def _insert_modules(path_id, modules_data, contributor_id):
+    """Bulk insert new modules plus their resources and links."""
+    module_ids = _insert_returning_ids(Module, [
+        {"learning_path_id": path_id, **{field: module_data.get(field) for field in MODULE_FIELDS}}
+        for module_data in modules_data
+    ])
+    links = []
+    new_resources = []
+    for module_id, module_data in zip(module_ids, modules_data):
+        for resource_data in module_data.get("resources") or []:
+            if resource_data.get("id"):
+                links.append({"module_id": module_id, "resource_id": resource_data["id"]})
+            else:
+                new_resources.append((module_id, resource_data))
+    _insert_resources(new_resources, links, contributor_id)
+    return module_ids
+
+
+def _insert_resources(new_resources, links, contributor_id):
+    """Bulk insert ``(module_id, resource_data)`` pairs and every pending link."""
+    resource_ids = _insert_returning_ids(Resource, [
+        {"contributor_id": contributor_id, **{field: data.get(field) for field in RESOURCE_FIELDS}}
+        for _, data in new_resources
+    ])
+    links.extend(
+        {"module_id": module_id, "resource_id": resource_id}
+        for (module_id, _), resource_id in zip(new_resources, resource_ids)
+    )
+    if links:
+        db.session.execute(insert(ModuleResource), links)
+
+
+def create_learning_path(data, contributor_id):
+    """Insert a learning path with all of its modules and resources."""
+    path_id = db.session.scalar(
+        insert(LearningPath)
+        .values(title=data.get("title"), description=data.get("description"), contributor_id=contributor_id)
+        .returning(LearningPath.id)
+    )
+    _insert_modules(path_id, data.get("modules") or [], contributor_id)
+    refresh_path_totals([path_id])
+    # Modules may link existing, already rated resources
+    rollup_learning_paths([path_id])
+    return db.session.get(LearningPath, path_id)
+
+
+def _apply_changes(obj, data, fields):
+    for field in fields:
+        if field in data and getattr(obj, field) != data[field]:
+            setattr(obj, field, data[field])
+
+
+def update_learning_path(learning_path, data, contributor_id):
+    """Apply ``data`` to ``learning_path``, touching only what changed.
+
+    Modules and resources that carry an ``id`` are matched against the
+    existing graph and updated in place; ones without an ``id`` are created.
+    Existing modules missing from ``data["modules"]`` are deleted and
+    resources missing from a module are unlinked (the Resource row is kept,
+    since other modules may share it).
+    """
+    _apply_changes(learning_path, data, ("title", "description"))
+
+    modules_data = data.get("modules")
+    if not modules_data:
+        return learning_path
+
+    existing = {
+        module.id: module
+        for module in Module.query.options(
+            selectinload(Module.resources).selectinload(ModuleResource.resource)
+        ).filter(Module.learning_path_id == learning_path.id)
+    }
+
+    new_modules = []
+    new_resources = []
+    links = []
+    stale_links = []
+    kept_module_ids = set()
+    for module_data in modules_data:
+        module = existing.get(module_data.get("id"))
+        if module is None:
+            new_modules.append(module_data)
+            continue
+        kept_module_ids.add(module.id)
+        _apply_changes(module, module_data, MODULE_FIELDS)
+
+        if "resources" not in module_data:
+            continue
+        linked = {link.resource_id: link for link in module.resources}
+        wanted = set()
+        for resource_data in module_data["resources"] or []:
+            resource_id = resource_data.get("id")
+            if not resource_id:
+                new_resources.append((module.id, resource_data))
+                continue
+            wanted.add(resource_id)
+            link = linked.get(resource_id)
+            if link is None:
+                links.append({"module_id": module.id, "resource_id": resource_id})
+            elif link.resource.contributor_id == contributor_id:
+                _apply_changes(link.resource, resource_data, RESOURCE_FIELDS)
+        stale_links.extend(link.id for resource_id, link in linked.items() if resource_id not in wanted)
+
+    removed_module_ids = [module_id for module_id in existing if module_id not in kept_module_ids]
+    db.session.flush()
+    if stale_links:
+        db.session.execute(delete(ModuleResource).where(ModuleResource.id.in_(stale_links)))
+    if removed_module_ids:
+        forget_modules(removed_module_ids)
+        db.session.execute(delete(ModuleResource).where(ModuleResource.module_id.in_(removed_module_ids)))
+        db.session.execute(delete(Module).where(Module.id.in_(removed_module_ids)))
+
+    links_changed = bool(links or new_resources or stale_links or removed_module_ids or new_modules)
+    _insert_resources(new_resources, links, contributor_id)
+    _insert_modules(learning_path.id, new_modules, contributor_id)
+    if links_changed:
+        rollup_learning_paths([learning_path.id])
+    if removed_module_ids:
+        refresh_path_totals([learning_path.id])
+        recount_enrollments([learning_path.id])
+    elif new_modules:
+        refresh_path_totals([learning_path.id])
+    return learning_path
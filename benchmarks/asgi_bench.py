@@ -0,0 +1,174 @@
+"""Read-route throughput of the sync (gunicorn) and async (uvicorn) serving modes.
+
+Usage:
+    python benchmarks/datagen.py --reset              # once, against the same DATABASE_URL
+    python benchmarks/asgi_bench.py --workers 4 --concurrency 8 64 256
+
+For each mode a server is started on a local port with ``--workers``
+processes: ``app:app`` under gunicorn sync workers, or ``asgi:app`` under
+uvicorn, both loaded through this module's ``sync_app``/``async_app``.
+The read-only route mix from ``workload.py`` is then replayed over HTTP at
+each ``--concurrency`` level, one client thread per open connection. Results
+are printed side by side and written to
+``benchmarks/results/<git sha>-asgi[-<label>].json``.
+
+On PostgreSQL, ``--db-latency-ms`` adds ``pg_sleep`` at the start of every
+transaction in both servers: the entry points install an engine listener when
+``DB_BENCH_LATENCY_MS`` is set. This simulates a remote or busy database,
+where a sync worker sits idle while it waits.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from argparse import Namespace
+from datetime import datetime, timezone
+
+from sqlalchemy import event, text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import workload  # noqa: E402
+from workload import app, db  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READ_MIX = "leaderboard=30,bundle=30,comments=25,catalogue=15"
+SERVERS = {
+    "sync": lambda port, workers: [
+        sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}",
+        "benchmarks.asgi_bench:sync_app()",
+    ],
+    "async": lambda port, workers: [
+        sys.executable, "-m", "uvicorn", "benchmarks.asgi_bench:async_app", "--factory",
+        "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port), "--no-access-log",
+    ],
+}
+
+
+def install_db_latency(engine, latency_ms):
+    """``pg_sleep`` at the start of every transaction on ``engine``; PostgreSQL only, a no-op elsewhere."""
+    if engine.dialect.name != 'postgresql':
+        return
+
+    @event.listens_for(engine, 'begin')
+    def simulate_latency(connection):
+        connection.execute(text('SELECT pg_sleep(:seconds)'), {"seconds": latency_ms / 1000})
+
+
+def _install_flask_latency():
+    latency_ms = int(os.environ.get("DB_BENCH_LATENCY_MS", 0))
+    if latency_ms:
+        with app.app_context():
+            install_db_latency(db.engine, latency_ms)
+    return latency_ms
+
+
+def sync_app():
+    """gunicorn entry point: the Flask app with ``--db-latency-ms`` applied."""
+    _install_flask_latency()
+    return app
+
+
+def async_app():
+    """uvicorn factory: ``asgi:app`` with ``--db-latency-ms`` applied to its engine and the Flask fallback's."""
+    import asgi
+
+    latency_ms = _install_flask_latency()
+    if latency_ms:
+        install_db_latency(asgi.engine.sync_engine, latency_ms)
+    return asgi.app
+
+
+def start_server(mode, port, workers, db_latency_ms):
+    env = {
+        **os.environ,
+        "LOGIN_RATE_LIMIT_ENABLED": "false",
+        "LOG_REQUESTS": "false",
+        "DB_BENCH_LATENCY_MS": str(db_latency_ms),
+    }
+    process = subprocess.Popen(SERVERS[mode](port, workers), cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{mode} server exited with {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/leaderboard?limit=1", timeout=1):
+                return process
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"{mode} server did not come up on port {port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 64, 256])
+    parser.add_argument("--requests", type=int, default=4000, help="Requests per mode and concurrency level.")
+    parser.add_argument("--mix", default=READ_MIX)
+    parser.add_argument("--modes", nargs="+", choices=sorted(SERVERS), default=["sync", "async"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db-latency-ms", type=int, default=0)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--label")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        dataset = workload.Dataset()
+        dialect = db.engine.dialect.name
+    if args.db_latency_ms and dialect != 'postgresql':
+        parser.error("--db-latency-ms needs PostgreSQL")
+
+    results = {}
+    for offset, mode in enumerate(args.modes):
+        port = args.port + offset
+        process = start_server(mode, port, args.workers, args.db_latency_ms)
+        try:
+            for concurrency in args.concurrency:
+                report, wall = workload.run(Namespace(
+                    url=f"http://127.0.0.1:{port}", mix=args.mix, requests=args.requests,
+                    concurrency=concurrency, random_seed=args.random_seed,
+                ), dataset)
+                results.setdefault(str(concurrency), {})[mode] = report
+                total = report["_total"]
+                print(f"{mode:<6} c={concurrency:<4} {total['rps']:>8.1f} req/s  "
+                      f"p50 {total['p50_ms']:>8.2f}ms  p99 {total['p99_ms']:>8.2f}ms  errors {total['errors']}")
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f"\n{'conc':>5} {'route':<12} " + " ".join(f"{mode + ' req/s':>12} {mode + ' p99':>10}" for mode in args.modes))
+    for concurrency, by_mode in results.items():
+        for route in by_mode[args.modes[0]]:
+            cells = " ".join(
+                f"{by_mode[mode][route]['rps']:>12.1f} {by_mode[mode][route]['p99_ms']:>10.2f}"
+                for mode in args.modes if route in by_mode.get(mode, {})
+            )
+            print(f"{concurrency:>5} {route:<12} {cells}")
+
+    if not args.no_save:
+        sha, dirty = workload.git_revision()
+        os.makedirs(workload.RESULTS_DIR, exist_ok=True)
+        path = os.path.join(workload.RESULTS_DIR, f"{sha}-asgi{'-' + args.label if args.label else ''}.json")
+        with open(path, "w") as f:
+            json.dump({
+                "commit": sha,
+                "dirty": dirty,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "dialect": dialect,
+                "params": {
+                    "workers": args.workers, "requests": args.requests, "mix": args.mix,
+                    "db_latency_ms": args.db_latency_ms, "random_seed": args.random_seed,
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Generate a large synthetic dataset for load tests and query-plan checks.
+
+Usage:
+    python benchmarks/datagen.py --reset --users 1000000 --paths 10000 --submissions 50000000
+
+Rows are generated deterministically (``--random-seed``) with explicit IDs, so
+foreign keys are computed instead of looked up, and streamed in chunks: with
+PostgreSQL they are loaded with ``COPY ... FROM STDIN`` (psycopg or psycopg2),
+otherwise with chunked executemany INSERTs (the SQLite stand-in). Afterwards
+user points, leaderboard rows, quiz completions, path totals, enrollment
+progress and rating aggregates are derived from the generated submissions and
+feedback, and PostgreSQL sequences are moved past the generated IDs.
+
+Every user is ``bench_<id>`` with password ``benchmark-password``.
+Uses DATABASE_URL; the target tables must be empty unless ``--reset`` is given.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select, text, update  # noqa: E402
+
+from app import app  # noqa: E402
+from counters import reconcile_all  # noqa: E402
+from db import db  # noqa: E402
+from models import (  # noqa: E402
+    Comment, Feedback, Leaderboard, LearningPath, Module, ModuleResource, QuizCompletion, QuizContent,
+    QuizSubmission, Reply, Resource, User, UserLearningPath,
+)
+from passwords import password_hasher  # noqa: E402
+from progress import rebuild_progress  # noqa: E402
+from ratings import rebuild_ratings  # noqa: E402
+
+BENCH_PASSWORD = "benchmark-password"
+OPTIONS = ["A", "B", "C", "D"]
+RESOURCE_TYPES = ["Video", "Article", "Tutorial"]
+
+
+class BulkWriter:
+    """Load row tuples into a table, by COPY on PostgreSQL or chunked INSERTs elsewhere."""
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        engine = db.engine
+        self.copy = engine.dialect.name == 'postgresql' and engine.dialect.driver in ('psycopg', 'psycopg2')
+        self.driver = engine.dialect.driver
+
+    def write(self, model, columns, rows):
+        table = model.__table__
+        started = time.perf_counter()
+        total = 0
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            if self.copy:
+                self._copy(table.name, columns, chunk)
+            else:
+                db.session.execute(table.insert(), [dict(zip(columns, row)) for row in chunk])
+            db.session.commit()
+            total += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"{table.name:<22} {total:>12,} rows  {elapsed:8.1f}s  {total / elapsed if elapsed else 0:>10,.0f} rows/s")
+        return total
+
+    def _copy(self, table_name, columns, chunk):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in chunk:
+            writer.writerow(
+                json.dumps(value) if isinstance(value, (list, dict))
+                else value.isoformat() if isinstance(value, datetime)
+                else value
+                for value in row
+            )
+        sql = f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        cursor = db.session.connection().connection.dbapi_connection.cursor()
+        try:
+            if self.driver == 'psycopg2':
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+            else:
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+
+def generate(args):
+    rng = random.Random(args.random_seed)
+    now = datetime.utcnow()
+    writer = BulkWriter(args.chunk_size)
+
+    def recent(days=365):
+        return now - timedelta(seconds=rng.randrange(days * 86400))
+
+    password_hasher.workers = 0
+    pwhash = password_hasher.hash(BENCH_PASSWORD)
+    users = args.users
+    writer.write(User, ["id", "username", "email", "password_hash", "role", "points", "date_joined"], (
+        (i, f"bench_{i}", f"bench_{i}@example.com", pwhash,
+         "Contributor" if i % 100 == 0 else "Learner", 0, recent())
+        for i in range(1, users + 1)
+    ))
+
+    paths = args.paths
+    writer.write(LearningPath, ["id", "title", "description", "contributor_id", "rating_count"], (
+        (i, f"Path {i}", f"Synthetic learning path {i}", rng.randint(1, users), 0)
+        for i in range(1, paths + 1)
+    ))
+
+    modules = paths * args.modules_per_path
+    writer.write(Module, ["id", "title", "description", "learning_path_id"], (
+        (i, f"Module {i}", f"Synthetic module {i}", (i - 1) // args.modules_per_path + 1)
+        for i in range(1, modules + 1)
+    ))
+
+    resources = modules * args.resources_per_module
+    writer.write(Resource, ["id", "title", "url", "type", "description", "contributor_id"], (
+        (i, f"Resource {i}", f"https://example.com/resources/{i}", rng.choice(RESOURCE_TYPES),
+         f"Synthetic resource {i}", rng.randint(1, users))
+        for i in range(1, resources + 1)
+    ))
+    writer.write(ModuleResource, ["id", "module_id", "resource_id", "added_at"], (
+        (i, (i - 1) // args.resources_per_module + 1, i, recent())
+        for i in range(1, resources + 1)
+    ))
+
+    quizzes = modules * args.quizzes_per_module
+    answers = [rng.choice(OPTIONS) for _ in range(quizzes)]
+    quiz_points = [rng.choice((5, 10, 20)) for _ in range(quizzes)]
+    writer.write(QuizContent, ["id", "module_id", "question", "options", "correct_option", "points"], (
+        (i, (i - 1) // args.quizzes_per_module + 1, f"Question {i}?", OPTIONS, answers[i - 1], quiz_points[i - 1])
+        for i in range(1, quizzes + 1)
+    ))
+
+    def submissions():
+        for i in range(1, args.submissions + 1):
+            quiz_id = rng.randint(1, quizzes)
+            selected = answers[quiz_id - 1] if rng.random() < 0.6 else rng.choice(OPTIONS)
+            score = quiz_points[quiz_id - 1] if selected == answers[quiz_id - 1] else 0
+            yield i, rng.randint(1, users), quiz_id, selected, score, recent(90)
+
+    writer.write(QuizSubmission, ["id", "user_id", "quiz_id", "selected_option", "score", "submitted_at"], submissions())
+
+    def enrollments():
+        next_id = 1
+        for user_id in range(1, users + 1):
+            for path_id in sorted(rng.sample(range(1, paths + 1), min(args.enrollments_per_user, paths))):
+                yield next_id, user_id, path_id, rng.randint(0, 100), recent(30), recent()
+                next_id += 1
+
+    writer.write(UserLearningPath, [
+        "id", "user_id", "learning_path_id", "progress_percentage", "last_accessed", "started_at",
+    ], enrollments())
+
+    writer.write(Comment, ["id", "user_id", "content", "created_at"], (
+        (i, rng.randint(1, users), f"Synthetic comment {i}", recent())
+        for i in range(1, args.comments + 1)
+    ))
+    replies = args.comments * args.replies_per_comment
+    writer.write(Reply, ["id", "user_id", "comment_id", "content", "created_at"], (
+        (i, rng.randint(1, users), (i - 1) // args.replies_per_comment + 1, f"Synthetic reply {i}", recent())
+        for i in range(1, replies + 1)
+    ))
+    writer.write(Feedback, ["id", "user_id", "resource_id", "comment", "rating", "created_at"], (
+        (i, rng.randint(1, users), rng.randint(1, resources), f"Synthetic feedback {i}", rng.randint(1, 5), recent())
+        for i in range(1, args.feedback + 1)
+    ))
+
+
+def derive():
+    """Recompute denormalized columns from the generated rows."""
+    started = time.perf_counter()
+    earned = (
+        select(QuizSubmission.user_id, func.sum(QuizSubmission.score).label("points"))
+        .group_by(QuizSubmission.user_id)
+        .subquery()
+    )
+    db.session.execute(
+        update(User).where(User.id == earned.c.user_id).values(points=earned.c.points),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.execute(insert(Leaderboard).from_select(["user_id", "score"], select(User.id, User.points)))
+    # First correct answer per user and quiz, as scoring records it
+    db.session.execute(insert(QuizCompletion).from_select(
+        ["user_id", "quiz_id", "learning_path_id", "completed_at"],
+        select(QuizSubmission.user_id, QuizSubmission.quiz_id, Module.learning_path_id,
+               func.min(QuizSubmission.submitted_at))
+        .join(QuizContent, QuizContent.id == QuizSubmission.quiz_id)
+        .join(Module, Module.id == QuizContent.module_id)
+        .where(QuizSubmission.selected_option == QuizContent.correct_option)
+        .group_by(QuizSubmission.user_id, QuizSubmission.quiz_id, Module.learning_path_id),
+    ))
+    db.session.commit()
+    # Path totals and enrollment progress; generated progress_percentage values are replaced
+    rebuild_progress()
+    rebuild_ratings()
+    reconcile_all(batch_size=50_000)
+    if db.engine.dialect.name == 'postgresql':
+        for model in (User, Leaderboard, LearningPath, Module, Resource, ModuleResource, QuizContent,
+                      QuizSubmission, QuizCompletion, UserLearningPath, Comment, Reply, Feedback):
+            table = model.__tablename__
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+            ))
+        db.session.commit()
+        db.session.execute(text("ANALYZE"))
+    print(f"{'derived columns':<22} {'':>12}       {time.perf_counter() - started:8.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--paths", type=int, default=100)
+    parser.add_argument("--modules-per-path", type=int, default=5)
+    parser.add_argument("--resources-per-module", type=int, default=3)
+    parser.add_argument("--quizzes-per-module", type=int, default=5)
+    parser.add_argument("--submissions", type=int, default=100000)
+    parser.add_argument("--enrollments-per-user", type=int, default=2)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--replies-per-comment", type=int, default=3)
+    parser.add_argument("--feedback", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first.")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+            db.create_all()
+        elif db.session.scalar(select(func.count()).select_from(User)):
+            parser.error("users table is not empty; pass --reset to start from scratch")
+
+        print(f"{db.engine.url.render_as_string(hide_password=True)} ({db.engine.dialect.driver})")
+        started = time.perf_counter()
+        generate(args)
+        derive()
+        print(f"total {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
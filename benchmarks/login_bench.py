@@ -0,0 +1,97 @@
+"""Login latency under concurrent load, with and without the hashing pool.
+
+Usage:
+    python benchmarks/login_bench.py [--users 50] [--concurrency 16] [--hash-workers 0 2 4]
+
+For each pool size, ``--concurrency`` threads log in as distinct users while
+one extra thread polls GET /leaderboard, so the report shows both login p50/p99
+and how much the hash work slows an unrelated route. Rate limiting is turned
+off for the run. Uses an in-memory SQLite database unless DATABASE_URL is set.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ["LOGIN_RATE_LIMIT_ENABLED"] = "false"
+
+from app import app  # noqa: E402
+from db import db  # noqa: E402
+from models import User  # noqa: E402
+from passwords import password_hasher  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)] * 1000
+
+
+def populate(count):
+    password_hasher.workers = 0
+    pwhash = password_hasher.hash("benchmark-password")
+    db.session.add_all(
+        User(username=f"login_bench_{i}", email=f"login_bench_{i}@example.com", password_hash=pwhash, role="Learner")
+        for i in range(count)
+    )
+    db.session.commit()
+
+
+def run(users, concurrency, hash_workers):
+    password_hasher.workers = hash_workers
+    password_hasher._executor = None
+    login_times = []
+    other_times = []
+    done = threading.Event()
+
+    def login(i):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post("/login", json={"username": f"login_bench_{i % users}", "password": "benchmark-password"})
+        assert response.status_code == 200, response.status_code
+        login_times.append(time.perf_counter() - started)
+
+    def poll_other_route():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get("/leaderboard")
+            other_times.append(time.perf_counter() - started)
+
+    poller = threading.Thread(target=poll_other_route)
+    poller.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(login, range(users)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    poller.join()
+
+    print(
+        f"hash workers={hash_workers:<2} logins/s={users / elapsed:7.1f}  "
+        f"login p50={percentile(login_times, 50):7.1f}ms p99={percentile(login_times, 99):7.1f}ms  "
+        f"/leaderboard p50={percentile(other_times, 50):6.1f}ms p99={percentile(other_times, 99):6.1f}ms"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--hash-workers", type=int, nargs="+", default=[0, 2, 4])
+    args = parser.parse_args(argv)
+
+    app.config["SESSION_COOKIE_SECURE"] = False
+    with app.app_context():
+        db.create_all()
+        populate(args.users)
+    print(f"method={password_hasher.method} users={args.users} concurrency={args.concurrency}")
+    for hash_workers in args.hash_workers:
+        run(args.users, args.concurrency, hash_workers)
+
+
+if __name__ == "__main__":
+    main()
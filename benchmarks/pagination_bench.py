@@ -0,0 +1,99 @@
+"""Deep-page latency: keyset cursors vs. LIMIT/OFFSET.
+
+Usage:
+    python benchmarks/pagination_bench.py [--rows 200000] [--limit 50] [--repeat 5]
+
+Fills the comments and users tables, then fetches one page at increasing
+depths from the /comments order (``id``) and the /admin/users?sort=points
+order (``points DESC, id DESC``). Each page is fetched with OFFSET and with
+the keyset query the endpoints use. OFFSET time grows with depth; keyset time
+stays flat. Uses an in-memory SQLite database unless DATABASE_URL is set.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import app  # noqa: E402
+from admin_users import KEYSETS  # noqa: E402
+from db import db  # noqa: E402
+from forum import COMMENT_ORDER  # noqa: E402
+from models import Comment, User  # noqa: E402
+from pagination import encode_cursor  # noqa: E402
+
+CHUNK_SIZE = 5000
+DEPTHS = (0, 0.1, 0.5, 0.9, 0.99)
+
+
+def populate(rows):
+    now = datetime.utcnow()
+    first_user = (db.session.scalar(select(db.func.max(User.id))) or 0) + 1
+    users = [
+        {"id": first_user + i, "username": f"page_bench_{first_user + i}",
+         "email": f"page_bench_{first_user + i}@example.com", "password_hash": "!",
+         "role": "Learner", "points": random.randint(0, 10000), "date_joined": now}
+        for i in range(rows)
+    ]
+    comments = [
+        {"user_id": users[i % len(users)]["id"], "content": f"comment {i}", "created_at": now}
+        for i in range(rows)
+    ]
+    for model, batch in ((User, users), (Comment, comments)):
+        for start in range(0, len(batch), CHUNK_SIZE):
+            db.session.execute(insert(model), batch[start:start + CHUNK_SIZE])
+    db.session.commit()
+
+
+def best_of(repeat, fetch):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fetch()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def compare(name, stmt, keyset, key_columns, limit, repeat):
+    ordered = stmt.order_by(*keyset.order_by())
+    total = db.session.scalar(select(db.func.count()).select_from(stmt.subquery()))
+    print(f"{name} ({total} rows, limit {limit})")
+    print(f"  {'depth':>8} {'offset ms':>10} {'keyset ms':>10}")
+    for depth in DEPTHS:
+        offset = int(total * depth)
+        cursor = None
+        if offset:
+            last = db.session.execute(
+                select(*key_columns).order_by(*keyset.order_by()).offset(offset - 1).limit(1)
+            ).one()
+            cursor = encode_cursor(last)
+        offset_ms = best_of(repeat, lambda: db.session.execute(ordered.offset(offset).limit(limit)).all())
+        keyset_ms = best_of(repeat, lambda: db.session.execute(keyset.page_query(stmt, cursor, limit)).all())
+        print(f"  {offset:>8} {offset_ms:10.2f} {keyset_ms:10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        db.create_all()
+        populate(args.rows)
+        comments = select(Comment.id, Comment.user_id, Comment.content, Comment.created_at)
+        compare("GET /comments", comments, COMMENT_ORDER, [Comment.id], args.limit, args.repeat)
+        users = select(User.id, User.username, User.points)
+        compare("GET /admin/users?sort=points", users, KEYSETS["points"], [User.points, User.id],
+                args.limit, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Replay a weighted route mix and report throughput, latency and queries per request.
+
+Usage:
+    python benchmarks/datagen.py --reset              # once, against the same DATABASE_URL
+    python benchmarks/workload.py --requests 5000 --concurrency 8
+    python benchmarks/workload.py --url http://127.0.0.1:8000 --concurrency 32
+
+By default requests go through the Flask test client in this process. With
+``--url`` they are sent over HTTP to a running server, e.g.
+``LOGIN_RATE_LIMIT_ENABLED=false gunicorn -w 4 -b 127.0.0.1:8000 app:app``
+pointed at the same database. Each worker thread logs in as its own
+``bench_<id>`` user before the timed run.
+
+Queries per request are read from the ``Server-Timing`` header, so they are
+reported in both modes. Results are written to
+``benchmarks/results/<git sha>[-<label>].json`` together with the parameters
+and database dialect; ``--compare`` prints the per-route change against an
+earlier result file. The route sequence is fixed by ``--random-seed``, so runs
+with the same parameters replay the same requests.
+"""
+import argparse
+import http.cookies
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LOGIN_RATE_LIMIT_ENABLED"] = "false"
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import app  # noqa: E402
+from db import db  # noqa: E402
+from models import Module, QuizContent, User  # noqa: E402
+
+BENCH_PASSWORD = "benchmark-password"
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_MIX = "leaderboard=30,bundle=25,quiz_submit=15,comments=15,comment_post=5,rank=10"
+SERVER_TIMING = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)] * 1000
+
+
+class Dataset:
+    """ID ranges of the generated data, read once before the run."""
+
+    def __init__(self):
+        self.max_user = db.session.scalar(select(func.max(User.id))) or 0
+        self.module_ids = list(db.session.scalars(select(Module.id).order_by(Module.id)))
+        self.quizzes = [tuple(row) for row in db.session.execute(
+            select(QuizContent.id, QuizContent.correct_option).order_by(QuizContent.id)
+        )]
+        if not (self.max_user and self.module_ids and self.quizzes):
+            raise SystemExit("No data found; run benchmarks/datagen.py first.")
+
+
+def build_routes(dataset):
+    """Route name -> ``fn(rng, user_id)`` returning ``(method, path, json_body)``."""
+    def quiz_submit(rng, user_id):
+        quiz_id, correct = rng.choice(dataset.quizzes)
+        return "POST", f"/quizzes/{quiz_id}/submit", {"selected_option": correct if rng.random() < 0.6 else "A"}
+
+    return {
+        "leaderboard": lambda rng, user_id: ("GET", "/leaderboard?limit=20", None),
+        "rank": lambda rng, user_id: ("GET", "/leaderboard/me", None),
+        "catalogue": lambda rng, user_id: ("GET", "/learning-paths", None),
+        "bundle": lambda rng, user_id: ("GET", f"/modules/{rng.choice(dataset.module_ids)}/bundle", None),
+        "quiz_submit": quiz_submit,
+        "comments": lambda rng, user_id: ("GET", "/comments?limit=20&replies=3", None),
+        "comment_post": lambda rng, user_id: (
+            "POST", "/comments", {"user_id": user_id, "content": f"workload comment {rng.random():.6f}"}
+        ),
+    }
+
+
+def parse_mix(spec, routes):
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name not in routes:
+            raise SystemExit(f"Unknown route {name!r}; choose from {', '.join(routes)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class TestClientSession:
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, response.headers.get("Server-Timing", "")
+
+
+class HTTPSession:
+    """Minimal cookie-carrying HTTP client; the session cookie is Secure, so it is sent by hand."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = {}
+
+    def request(self, method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        if self.cookies:
+            req.add_header("Cookie", "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            status, headers = e.code, e.headers
+        for header in headers.get_all("Set-Cookie") or []:
+            cookie = http.cookies.SimpleCookie(header)
+            self.cookies.update({name: morsel.value for name, morsel in cookie.items()})
+        return status, headers.get("Server-Timing", "")
+
+
+def run(args, dataset):
+    routes = build_routes(dataset)
+    mix = parse_mix(args.mix, routes)
+    names, weights = list(mix), list(mix.values())
+    plan_rng = random.Random(args.random_seed)
+    plan = plan_rng.choices(names, weights, k=args.requests)
+
+    def new_session():
+        return HTTPSession(args.url) if args.url else TestClientSession()
+
+    sessions = []
+    for worker in range(args.concurrency):
+        session = new_session()
+        user_id = worker % dataset.max_user + 1
+        status, _ = session.request("POST", "/login", {"username": f"bench_{user_id}", "password": BENCH_PASSWORD})
+        if status != 200:
+            raise SystemExit(f"Login as bench_{user_id} failed with {status}")
+        sessions.append((session, user_id, random.Random(args.random_seed + worker)))
+
+    samples = defaultdict(list)
+    queries = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def worker(index):
+        session, user_id, rng = sessions[index]
+        for name in plan[index::args.concurrency]:
+            method, path, body = routes[name](rng, user_id)
+            started = time.perf_counter()
+            status, timing = session.request(method, path, body)
+            elapsed = time.perf_counter() - started
+            match = SERVER_TIMING.search(timing)
+            with lock:
+                samples[name].append(elapsed)
+                if match:
+                    queries[name].append(int(match.group(1)))
+                if status >= 400:
+                    errors[name] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    report = {}
+    for name in names:
+        times = samples.get(name)
+        if not times:
+            continue
+        report[name] = {
+            "requests": len(times),
+            "errors": errors[name],
+            "rps": round(len(times) / wall, 1),
+            "p50_ms": round(percentile(times, 50), 2),
+            "p99_ms": round(percentile(times, 99), 2),
+            "mean_ms": round(statistics.fmean(times) * 1000, 2),
+            "queries_per_request": round(statistics.fmean(queries[name]), 2) if queries[name] else None,
+        }
+    all_times = [t for times in samples.values() for t in times]
+    report["_total"] = {
+        "requests": len(all_times),
+        "errors": sum(errors.values()),
+        "rps": round(len(all_times) / wall, 1),
+        "p50_ms": round(percentile(all_times, 50), 2),
+        "p99_ms": round(percentile(all_times, 99), 2),
+        "mean_ms": round(statistics.fmean(all_times) * 1000, 2),
+        "queries_per_request": None,
+    }
+    return report, wall
+
+
+def print_report(report, baseline=None):
+    print(f"{'route':<14} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'q/req':>6}")
+    for name, row in report.items():
+        line = (
+            f"{name:<14} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+            f"{row['queries_per_request'] if row['queries_per_request'] is not None else '-':>6}"
+        )
+        previous = (baseline or {}).get(name)
+        if previous:
+            line += (
+                f"   p50 {row['p50_ms'] - previous['p50_ms']:+.2f}ms"
+                f"  p99 {row['p99_ms'] - previous['p99_ms']:+.2f}ms"
+                f"  req/s {row['rps'] - previous['rps']:+.1f}"
+            )
+        print(line)
+
+
+def git_revision():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=root, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return sha, dirty
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma-separated route=weight pairs.")
+    parser.add_argument("--url", help="Base URL of a running server; default is the in-process test client.")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--label", help="Suffix for the result file name.")
+    parser.add_argument("--compare", help="Earlier result JSON to diff against.")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    app.config["SESSION_COOKIE_SECURE"] = False
+    with app.app_context():
+        dataset = Dataset()
+        dialect = db.engine.dialect.name
+
+    report, wall = run(args, dataset)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["routes"]
+    sha, dirty = git_revision()
+    print(f"commit={sha}{'+dirty' if dirty else ''} dialect={dialect} mode={'http' if args.url else 'test-client'} "
+          f"requests={args.requests} concurrency={args.concurrency} wall={wall:.1f}s")
+    print_report(report, baseline)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{sha}{'-' + args.label if args.label else ''}.json")
+        with open(path, "w") as f:
+            json.dump({
+                "commit": sha,
+                "dirty": dirty,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "dialect": dialect,
+                "mode": "http" if args.url else "test-client",
+                "params": {
+                    "requests": args.requests, "concurrency": args.concurrency,
+                    "mix": args.mix, "random_seed": args.random_seed,
+                    "users": dataset.max_user, "modules": len(dataset.module_ids), "quizzes": len(dataset.quizzes),
+                },
+                "routes": report,
+            }, f, indent=2)
+        print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
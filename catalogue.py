@@ -0,0 +1,189 @@
+"""Learning path catalogue cache.
+
+Each learning path is cached as an immutable, pre-serialized JSON blob
+stamped with the path's invalidation version from when its load started,
+and each user's enrollments are cached as a frozenset of path IDs. The catalogue endpoints stitch blobs
+together instead of re-querying and re-serializing every path.
+
+Entries live in a per-worker LRU with a short TTL and, optionally, in a
+shared cachelib backend (``CATALOGUE_CACHE_REDIS_URL`` or
+``CATALOGUE_CACHE_DIR``) so workers warm each other. Writes invalidate both
+tiers; sibling workers' local copies expire within ``CATALOGUE_CACHE_TTL``.
+Misses are loaded from the primary, never from a read replica.
+
+Every ``invalidate_path`` bumps the path's invalidation version, locally and
+in the shared tier. A blob whose path was invalidated while it was being
+loaded is dropped instead of cached, so a slow load cannot put back data
+that a write has already replaced.
+"""
+import threading
+
+from flask import current_app
+
+from cache import LRUCache
+from db import db
+from models import LearningPath, UserLearningPath
+from replicas import use_primary
+
+IDS_KEY = 'catalogue:ids'
+
+
+def _path_key(path_id):
+    return f'catalogue:path:{path_id}'
+
+
+def _version_key(path_id):
+    return f'catalogue:version:{path_id}'
+
+
+def _enrolled_key(user_id):
+    return f'catalogue:enrolled:{user_id}'
+
+
+class CatalogueCache:
+
+    def __init__(self):
+        self.local = LRUCache(maxsize=4096, ttl=30)
+        self.shared = None
+        self.shared_ttl = 300
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self._versions = {}
+        self._versions_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.local = LRUCache(
+            maxsize=app.config.get('CATALOGUE_CACHE_SIZE', 4096),
+            ttl=app.config.get('CATALOGUE_CACHE_TTL', 30),
+        )
+        self.shared_ttl = app.config.get('CATALOGUE_CACHE_SHARED_TTL', 300)
+        redis_url = app.config.get('CATALOGUE_CACHE_REDIS_URL')
+        cache_dir = app.config.get('CATALOGUE_CACHE_DIR')
+        if redis_url:
+            import redis
+            from cachelib import RedisCache
+
+            self.shared = RedisCache(redis.Redis.from_url(redis_url), default_timeout=self.shared_ttl)
+        elif cache_dir:
+            from cachelib import FileSystemCache
+
+            self.shared = FileSystemCache(cache_dir, default_timeout=self.shared_ttl)
+        app.extensions['catalogue_cache'] = self
+
+    # -- tiered get/set -------------------------------------------------
+
+    def _get(self, key):
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        value = self.shared.get(key)
+        if value is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        self.local.set(key, value)
+        return value
+
+    def _set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def _delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    # -- catalogue lookups ----------------------------------------------
+
+    def path_ids(self):
+        """Sorted tuple of every learning path ID."""
+        ids = self._get(IDS_KEY)
+        if ids is None:
+            with use_primary():
+                ids = tuple(db.session.scalars(db.select(LearningPath.id).order_by(LearningPath.id)))
+            self._set(IDS_KEY, ids)
+        return ids
+
+    def enrolled_ids(self, user_id):
+        """Frozenset of learning path IDs ``user_id`` is enrolled in."""
+        ids = self._get(_enrolled_key(user_id))
+        if ids is None:
+            with use_primary():
+                ids = frozenset(db.session.scalars(
+                    db.select(UserLearningPath.learning_path_id).where(UserLearningPath.user_id == user_id)
+                ))
+            self._set(_enrolled_key(user_id), ids)
+        return ids
+
+    def path_blobs(self, path_ids):
+        """Serialized blobs for ``path_ids``; misses are loaded in one query."""
+        blobs = {}
+        missing = []
+        for path_id in path_ids:
+            entry = self._get(_path_key(path_id))
+            if entry is None:
+                missing.append(path_id)
+            else:
+                blobs[path_id] = entry[1]
+
+        if missing:
+            started = self._path_versions(missing)
+            with use_primary():
+                paths = LearningPath.query.filter(LearningPath.id.in_(missing)).populate_existing().all()
+            # The app's JSON provider, so blob bytes match every other route
+            dumps = current_app.json.dumps
+            for path in paths:
+                blobs[path.id] = dumps(path.to_dict()).encode()
+            loaded = [path_id for path_id in missing if path_id in blobs]
+            for path_id in loaded:
+                self._set(_path_key(path_id), (started[path_id], blobs[path_id]))
+            # Checked after the set, so an invalidation racing it still wins
+            current = self._path_versions(loaded)
+            for path_id in loaded:
+                if current[path_id] != started[path_id]:
+                    self._delete(_path_key(path_id))
+
+        return [blobs[path_id] for path_id in path_ids if path_id in blobs]
+
+    def render(self, path_ids):
+        """JSON array bytes for ``path_ids``, built from cached blobs."""
+        return b"[" + b",".join(self.path_blobs(path_ids)) + b"]"
+
+    # -- invalidation ---------------------------------------------------
+
+    def _path_versions(self, path_ids):
+        """``{path_id: (local version, shared version)}``; a path never invalidated is at 0."""
+        shared = [None] * len(path_ids)
+        if self.shared is not None and path_ids:
+            shared = self.shared.get_many(*[_version_key(path_id) for path_id in path_ids])
+        return {
+            path_id: (self._versions.get(path_id, 0), shared_version or 0)
+            for path_id, shared_version in zip(path_ids, shared)
+        }
+
+    def invalidate_path(self, path_id):
+        with self._versions_lock:
+            self._versions[path_id] = self._versions.get(path_id, 0) + 1
+        if self.shared is not None:
+            self.shared.inc(_version_key(path_id))
+        self._delete(_path_key(path_id))
+
+    def invalidate_path_ids(self):
+        self._delete(IDS_KEY)
+
+    def invalidate_enrollments(self, user_id):
+        self._delete(_enrolled_key(user_id))
+
+    def stats(self):
+        return {
+            "local": self.local.stats(),
+            "shared": None if self.shared is None else {
+                "backend": type(self.shared).__name__,
+                "hits": self.shared_hits,
+                "misses": self.shared_misses,
+            },
+        }
+
+
+catalogue_cache = CatalogueCache()
@@ -1,15 +1,81 @@
 import os
 
+from engine import engine_options_from_env
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     if not SQLALCHEMY_DATABASE_URI:
         raise RuntimeError("DATABASE_URL environment variable is not set.")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool sizing, pre-ping, recycle, statement timeout and PgBouncer mode (see engine.py)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options_from_env(SQLALCHEMY_DATABASE_URI, os.environ)
 
     # Secure session cookie settings
     SESSION_COOKIE_SAMESITE = "None"  # Required for cross-origin cookies
     SESSION_COOKIE_SECURE = True     # Ensures cookies are sent over HTTPS
 
+    # Leaderboard rank cache; set a Redis URL to share ranks between workers
+    LEADERBOARD_REDIS_URL = os.environ.get('LEADERBOARD_REDIS_URL')
+    LEADERBOARD_REFRESH_SECONDS = int(os.environ.get('LEADERBOARD_REFRESH_SECONDS', 30))
+
+    # Learning path catalogue cache: per-worker LRU plus an optional shared tier
+    CATALOGUE_CACHE_SIZE = int(os.environ.get('CATALOGUE_CACHE_SIZE', 4096))
+    CATALOGUE_CACHE_TTL = int(os.environ.get('CATALOGUE_CACHE_TTL', 30))
+    CATALOGUE_CACHE_SHARED_TTL = int(os.environ.get('CATALOGUE_CACHE_SHARED_TTL', 300))
+    CATALOGUE_CACHE_REDIS_URL = os.environ.get('CATALOGUE_CACHE_REDIS_URL')
+    CATALOGUE_CACHE_DIR = os.environ.get('CATALOGUE_CACHE_DIR')
+
+    # SQL instrumentation (Server-Timing headers, N+1 detection, /debug/metrics)
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', 'true').lower() == 'true'
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 3))
+    SQL_QUERY_BUDGET = int(os.environ['SQL_QUERY_BUDGET']) if os.environ.get('SQL_QUERY_BUDGET') else None
+    SQL_QUERY_BUDGET_STRICT = os.environ.get('SQL_QUERY_BUDGET_STRICT', 'false').lower() == 'true'
+    DEBUG_METRICS_ENABLED = os.environ.get('DEBUG_METRICS_ENABLED', 'false').lower() == 'true'
+
+    # Password hashing runs on a bounded process pool (0 workers hashes inline)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Per-worker cache of Flask-Login identities
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+
+    # Login token buckets: burst size and refill rate (tokens/second), per worker
+    LOGIN_RATE_LIMIT_ENABLED = os.environ.get('LOGIN_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    LOGIN_USER_BURST = int(os.environ.get('LOGIN_USER_BURST', 5))
+    LOGIN_USER_RATE = float(os.environ.get('LOGIN_USER_RATE', 0.1))
+    LOGIN_IP_BURST = int(os.environ.get('LOGIN_IP_BURST', 20))
+    LOGIN_IP_RATE = float(os.environ.get('LOGIN_IP_RATE', 1))
+    # Reverse proxies in front of the app; their X-Forwarded-For/-Proto are trusted (0 trusts none)
+    PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS', 0))
+
+    # Points for a quiz created without an explicit "points" value
+    QUIZ_DEFAULT_POINTS = int(os.environ.get('QUIZ_DEFAULT_POINTS', 10))
+
+    # Defer points/leaderboard/achievement/progress updates to `flask outbox-worker`.
+    # Only enable with at least one outbox-worker process running; without one they are never applied.
+    POINTS_WRITE_BEHIND = os.environ.get('POINTS_WRITE_BEHIND', 'false').lower() == 'true'
+
+    # Logging: level, text/json format, share of requests that keep DEBUG records
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 1.0))
+    LOG_REQUESTS = os.environ.get('LOG_REQUESTS', 'true').lower() == 'true'
+    LOG_QUEUE = os.environ.get('LOG_QUEUE', 'true').lower() == 'true'
+
+    # Read replicas for GET requests (comma-separated URLs) and routing policy
+    SQLALCHEMY_REPLICA_URLS = os.environ.get('DATABASE_REPLICA_URLS', '')
+    REPLICA_READ_YOUR_WRITES_SECONDS = float(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS', 5))
+    REPLICA_HEALTH_INTERVAL = float(os.environ.get('REPLICA_HEALTH_INTERVAL', 5))
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 0))
+
+    # Per-worker cache of rendered catalogue responses, keyed by content version
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 2048))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+
     # STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'frontend', 'build', 'static')
     # TEMPLATES_AUTO_RELOAD = True
\ No newline at end of file
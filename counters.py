@@ -0,0 +1,92 @@
+"""Denormalized child-row counters.
+
+    Comment.reply_count          replies of the comment
+    LearningPath.enrolled_count  enrollments in the path
+    Resource.feedback_count      feedback on the resource
+
+Every write that inserts or deletes a counted row calls ``adjust`` in the
+same transaction. ``adjust`` runs ``UPDATE ... SET n = n + :delta`` for each
+parent it touches in one executemany, so the counter commits or rolls back
+with the row it counts.
+Listing endpoints read the columns instead of counting child rows.
+
+Rows written without ``adjust`` (bulk loads, manual SQL) make a counter
+drift. ``reconcile`` repairs drift in ID-range batches, one transaction per
+batch. Each batch is a single ``UPDATE`` that only touches rows whose stored
+count is wrong, and returns the IDs it repaired so callers can invalidate
+what was cached for them.
+"""
+from collections import Counter
+
+from sqlalchemy import bindparam, func, select, update
+
+from db import db
+from models import Comment, Feedback, LearningPath, Reply, Resource, UserLearningPath
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+class CounterColumn:
+    """``column`` on the parent model, counting child rows whose ``foreign_key`` points at it."""
+
+    def __init__(self, column, foreign_key):
+        self.column = column
+        self.foreign_key = foreign_key
+        self.parent = column.class_
+        self.name = f"{self.parent.__tablename__}.{column.key}"
+
+
+REPLY_COUNT = CounterColumn(Comment.reply_count, Reply.comment_id)
+ENROLLED_COUNT = CounterColumn(LearningPath.enrolled_count, UserLearningPath.learning_path_id)
+FEEDBACK_COUNT = CounterColumn(Resource.feedback_count, Feedback.resource_id)
+COUNTERS = (REPLY_COUNT, ENROLLED_COUNT, FEEDBACK_COUNT)
+
+
+def adjust(counter, parent_ids, delta=1):
+    """Add ``delta`` to ``counter`` once per occurrence of each ID in ``parent_ids``, without committing.
+
+    ``None`` IDs (rows without a parent) are ignored.
+    """
+    deltas = Counter(parent_id for parent_id in parent_ids if parent_id is not None)
+    if not deltas:
+        return
+    table = counter.parent.__table__
+    column = table.c[counter.column.key]
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam('parent_id'))
+        .values({column: column + bindparam('delta')})
+    )
+    db.session.execute(stmt, [
+        {"parent_id": parent_id, "delta": count * delta} for parent_id, count in sorted(deltas.items())
+    ])
+
+
+def reconcile(counter, batch_size=RECONCILE_BATCH_SIZE):
+    """Repair ``counter`` from the child rows, committing each ID batch; returns the parent IDs fixed."""
+    parent_id = counter.parent.id
+    actual = (
+        select(func.count())
+        .where(counter.foreign_key == parent_id)
+        .correlate(counter.parent)
+        .scalar_subquery()
+    )
+    first, last = db.session.execute(select(func.min(parent_id), func.max(parent_id))).one()
+    fixed = []
+    if first is None:
+        return fixed
+    for start in range(first, last + 1, batch_size):
+        fixed += db.session.scalars(
+            update(counter.parent)
+            .where(parent_id.between(start, start + batch_size - 1), counter.column != actual)
+            .values({counter.column: actual})
+            .returning(parent_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+    return fixed
+
+
+def reconcile_all(batch_size=RECONCILE_BATCH_SIZE):
+    """``reconcile`` every counter; returns ``{counter name: parent IDs fixed}``."""
+    return {counter.name: reconcile(counter, batch_size) for counter in COUNTERS}
@@ -0,0 +1,138 @@
+"""SQLAlchemy engine tuning read from the environment, plus pool metrics.
+
+``engine_options_from_env`` builds ``SQLALCHEMY_ENGINE_OPTIONS``:
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
+        QueuePool sizing (seconds for timeout/recycle)
+    DB_POOL_PRE_PING
+        test connections on checkout so stale ones are replaced (default true)
+    DB_STATEMENT_TIMEOUT_MS
+        PostgreSQL statement_timeout, 0 to disable
+    DB_PGBOUNCER
+        PgBouncer transaction-pooling mode: no client-side pool (NullPool),
+        server-side prepared statements off, statement_timeout applied with
+        SET LOCAL per transaction instead of as a startup parameter
+"""
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+def _flag(environ, name, default):
+    return environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def engine_options_from_env(uri, environ):
+    """Engine keyword arguments for ``uri`` configured from ``environ``."""
+    if not uri or uri.startswith('sqlite'):
+        return {}
+
+    options = {'pool_pre_ping': _flag(environ, 'DB_POOL_PRE_PING', True)}
+    connect_args = {}
+    statement_timeout = int(environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+
+    if _flag(environ, 'DB_PGBOUNCER', False):
+        options['poolclass'] = NullPool
+        if '+psycopg' in uri and '+psycopg2' not in uri:
+            connect_args['prepare_threshold'] = None
+    else:
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=int(environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(environ.get('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=float(environ.get('DB_POOL_TIMEOUT', 30)),
+            pool_recycle=int(environ.get('DB_POOL_RECYCLE', 1800)),
+        )
+        if statement_timeout and uri.startswith('postgres'):
+            connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+class PoolMetrics:
+    """Process-wide connection pool counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, pool=None):
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": round(self.checkout_wait_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+            }
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=pool.overflow(),
+            )
+        elif pool is not None:
+            data["pool"] = pool.status()
+        return data
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.increment('timeouts')
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def init_engine_events(engine, environ):
+    """Attach connect/invalidate counters, SQLite foreign keys and PgBouncer-safe statement timeouts."""
+    event.listen(engine, 'connect', lambda *args: pool_metrics.increment('connects'))
+    event.listen(engine, 'invalidate', lambda *args: pool_metrics.increment('invalidations'))
+
+    if engine.dialect.name == 'sqlite':
+        # Match PostgreSQL, where writes rely on foreign keys to reject dangling references
+        @event.listens_for(engine, 'connect')
+        def enable_foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA foreign_keys=ON')
+            cursor.close()
+
+    statement_timeout = int(environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if statement_timeout and _flag(environ, 'DB_PGBOUNCER', False) and engine.dialect.name == 'postgresql':
+        @event.listens_for(engine, 'begin')
+        def set_local_statement_timeout(connection):
+            connection.execute(text(f'SET LOCAL statement_timeout = {statement_timeout}'))
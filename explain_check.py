@@ -0,0 +1,165 @@
+"""Run EXPLAIN against the queries behind each hot route and fail on full table scans.
+
+Usage:
+    python explain_check.py                  # check the current DATABASE_URL
+    python explain_check.py --seed 100000    # bulk insert synthetic rows first
+
+The planner only prefers an index once a table is big enough, so run it
+against a large dataset (``--seed``) rather than the tiny seed.py data.
+Exits non-zero if any query plan contains a sequential scan.
+"""
+import argparse
+import random
+import sys
+from datetime import datetime
+
+from sqlalchemy import insert, select, text, tuple_
+
+from app import app
+from db import db
+from models import (
+    User, LearningPath, Module, Resource, Feedback, Comment, Reply,
+    Achievement, ModuleResource, UserAchievement, UserLearningPath, QuizContent,
+)
+
+CHUNK_SIZE = 5000
+
+
+def route_queries():
+    """Representative statement for each route filter, keyed by route."""
+    return {
+        "GET /leaderboard": select(User.id, User.username, User.points).order_by(User.points.desc()).limit(8),
+        "POST /learning-paths/<id>/enroll": select(UserLearningPath.id).where(
+            UserLearningPath.user_id == 1, UserLearningPath.learning_path_id == 1
+        ),
+        "GET /learning-paths/<id>/modules": select(Module).where(Module.learning_path_id == 1),
+        "GET /modules/<id>/resources": select(ModuleResource).where(ModuleResource.module_id == 1),
+        "GET /modules/<id>/quizzes": select(QuizContent).where(QuizContent.module_id == 1).order_by(QuizContent.id).limit(51),
+        "GET /created-learning-paths": select(LearningPath).where(LearningPath.contributor_id == 1).order_by(LearningPath.id).limit(51),
+        "GET /comments (replies)": select(Reply).where(Reply.comment_id.in_([1, 2, 3])).order_by(Reply.comment_id, Reply.id),
+        "GET /comments/user/<id>/replies": select(Comment).where(Comment.user_id == 1).order_by(Comment.id),
+        "GET /resources/<id>/feedbacks": select(Feedback).where(Feedback.resource_id == 1).order_by(Feedback.id.desc()).limit(51),
+        "GET /admin/users?sort=points": select(User.id, User.points).where(
+            tuple_(User.points, User.id) < tuple_(5000, 1)
+        ).order_by(User.points.desc(), User.id.desc()).limit(101),
+        "GET /users/<username>/achievements": select(UserAchievement).where(UserAchievement.user_id == 1),
+    }
+
+
+def _bulk_insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def seed(num_users):
+    """Bulk insert a synthetic dataset scaled off ``num_users``."""
+    now = datetime.utcnow()
+    first_user = (db.session.scalar(select(db.func.max(User.id))) or 0) + 1
+    user_ids = list(range(first_user, first_user + num_users))
+    _bulk_insert(User, [
+        {"id": i, "username": f"bench_user_{i}", "email": f"bench_{i}@example.com",
+         "password_hash": "!", "role": "Learner", "points": random.randint(0, 10000), "date_joined": now}
+        for i in user_ids
+    ])
+
+    def next_id(model):
+        return (db.session.scalar(select(db.func.max(model.id))) or 0) + 1
+
+    first_path = next_id(LearningPath)
+    path_ids = list(range(first_path, first_path + max(num_users // 100, 1)))
+    _bulk_insert(LearningPath, [
+        {"id": i, "title": f"Path {i}", "contributor_id": random.choice(user_ids)} for i in path_ids
+    ])
+
+    first_module = next_id(Module)
+    module_ids = list(range(first_module, first_module + len(path_ids) * 5))
+    _bulk_insert(Module, [
+        {"id": i, "title": f"Module {i}", "learning_path_id": path_ids[n // 5]} for n, i in enumerate(module_ids)
+    ])
+
+    first_resource = next_id(Resource)
+    resource_ids = list(range(first_resource, first_resource + len(module_ids) * 3))
+    _bulk_insert(Resource, [
+        {"id": i, "title": f"Resource {i}", "type": "Article", "contributor_id": random.choice(user_ids)}
+        for i in resource_ids
+    ])
+    _bulk_insert(ModuleResource, [
+        {"module_id": module_ids[n // 3], "resource_id": i, "added_at": now} for n, i in enumerate(resource_ids)
+    ])
+    _bulk_insert(QuizContent, [
+        {"module_id": module_id, "question": "?", "options": ["a", "b"], "correct_option": "a", "points": 5}
+        for module_id in module_ids for _ in range(2)
+    ])
+
+    first_comment = next_id(Comment)
+    comment_ids = list(range(first_comment, first_comment + max(num_users // 2, 1)))
+    _bulk_insert(Comment, [
+        {"id": i, "user_id": random.choice(user_ids), "content": "...", "created_at": now} for i in comment_ids
+    ])
+    _bulk_insert(Reply, [
+        {"user_id": random.choice(user_ids), "comment_id": random.choice(comment_ids), "content": "...", "created_at": now}
+        for _ in range(num_users)
+    ])
+    _bulk_insert(Feedback, [
+        {"user_id": random.choice(user_ids), "resource_id": random.choice(resource_ids), "rating": random.randint(1, 5)}
+        for _ in range(num_users)
+    ])
+    _bulk_insert(UserLearningPath, [
+        {"user_id": user_id, "learning_path_id": random.choice(path_ids), "progress_percentage": 0}
+        for user_id in user_ids
+    ])
+
+    achievement_ids = [row.id for row in db.session.query(Achievement.id)]
+    if achievement_ids:
+        _bulk_insert(UserAchievement, [
+            {"user_id": user_id, "achievement_id": random.choice(achievement_ids), "earned_at": now}
+            for user_id in user_ids[::2]
+        ])
+    db.session.commit()
+
+
+def analyze():
+    with db.engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+
+def sequential_scans(statement):
+    """Return the plan lines of ``statement`` that indicate a full table scan."""
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    with db.engine.connect() as connection:
+        if dialect.name == 'sqlite':
+            details = [row[3] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            return [d for d in details if d.startswith("SCAN ") and " USING " not in d]
+        lines = [row[0] for row in connection.execute(text(f"EXPLAIN {sql}"))]
+        return [line.strip() for line in lines if "Seq Scan" in line]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0, metavar="USERS",
+                        help="bulk insert a synthetic dataset with this many users first")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        if args.seed:
+            seed(args.seed)
+        analyze()
+
+        failures = 0
+        for route, statement in route_queries().items():
+            scans = sequential_scans(statement)
+            status = "FAIL" if scans else "ok"
+            print(f"{status:4}  {route}")
+            for line in scans:
+                print(f"      {line}")
+            failures += bool(scans)
+
+    if failures:
+        print(f"{failures} route(s) fall back to a sequential scan")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
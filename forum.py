@@ -0,0 +1,338 @@
+"""Comment threads: page reads in a fixed number of queries, and the comment/reply write pipeline.
+
+Writes check nothing up front. A missing user or comment is reported by the
+foreign key constraints when the row is inserted. An ``Idempotency-Key``
+makes a write safe to retry: a replay returns the row the first request
+created instead of inserting another. Usernames in write responses come from
+``identity_cache``, so a warm cache adds no queries.
+"""
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, joinedload
+
+import counters
+from db import db
+from identity import identity_cache
+from models import Comment, Reply
+from pagination import Keyset
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+COMMENT_ORDER = Keyset(Comment.id)
+MAX_IDEMPOTENCY_KEY_LENGTH = 64
+MAX_IMPORT_ROWS = 5000
+
+
+class UnknownReferenceError(LookupError):
+    """A comment or reply referenced a user or comment that does not exist."""
+
+
+def reply_payload(reply):
+    return {
+        "id": reply.id,
+        "user_id": reply.user_id,
+        "comment_id": reply.comment_id,
+        "content": reply.content,
+        "created_at": reply.created_at.isoformat(),
+        "username": reply.user.username if reply.user else None,
+    }
+
+
+def comment_payload(comment, replies):
+    return {
+        "id": comment.id,
+        "user_id": comment.user_id,
+        "content": comment.content,
+        "created_at": comment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        "username": comment.user.username if comment.user else None,
+        "replies": [reply_payload(reply) for reply in replies],
+        "replies_count": comment.reply_count,
+    }
+
+
+def _first_replies(comment_ids, replies_limit):
+    """The first ``replies_limit`` replies of each comment, in one query."""
+    ranked = (
+        db.session.query(
+            Reply.id.label("id"),
+            func.row_number().over(
+                partition_by=Reply.comment_id, order_by=Reply.id
+            ).label("position"),
+        )
+        .filter(Reply.comment_id.in_(comment_ids))
+        .subquery()
+    )
+    ranked_reply = aliased(Reply)
+    return (
+        db.session.query(ranked_reply)
+        .join(ranked, ranked.c.id == ranked_reply.id)
+        .filter(ranked.c.position <= replies_limit)
+        .options(joinedload(ranked_reply.user))
+        .order_by(ranked_reply.comment_id, ranked_reply.id)
+        .all()
+    )
+
+
+def load_comment_page(user_id=None, cursor=None, limit=DEFAULT_PAGE_SIZE, replies_limit=None):
+    """Return ``(payloads, next_cursor)`` for one page of comments.
+
+    Comments are keyset-paginated on ``id`` (``COMMENT_ORDER``). Without
+    ``replies_limit`` every reply is returned; with it only the first
+    ``replies_limit`` are loaded. Either way it is two queries, since
+    ``replies_count`` is the stored ``reply_count``. Raises
+    ``InvalidCursor`` for a malformed cursor.
+    """
+    query = Comment.query.options(joinedload(Comment.user))
+    if user_id is not None:
+        query = query.filter(Comment.user_id == user_id)
+    comments, next_cursor = COMMENT_ORDER.page(COMMENT_ORDER.page_query(query, cursor, limit).all(), limit)
+
+    comment_ids = [comment.id for comment in comments]
+    replies_by_comment = {comment_id: [] for comment_id in comment_ids}
+    if not comment_ids:
+        return [], None
+
+    if replies_limit is None:
+        replies = (
+            Reply.query.options(joinedload(Reply.user))
+            .filter(Reply.comment_id.in_(comment_ids))
+            .order_by(Reply.comment_id, Reply.id)
+            .all()
+        )
+        for reply in replies:
+            replies_by_comment[reply.comment_id].append(reply)
+    elif replies_limit > 0:
+        for reply in _first_replies(comment_ids, replies_limit):
+            replies_by_comment[reply.comment_id].append(reply)
+
+    payloads = [comment_payload(comment, replies_by_comment[comment.id]) for comment in comments]
+    return payloads, next_cursor
+
+
+# -- writes -----------------------------------------------------------
+
+
+def written_payload(row, username):
+    """Response payload for a comment or reply row that was just written."""
+    payload = {
+        "id": row["id"],
+        "user_id": row["user_id"],
+        "content": row["content"],
+        "created_at": row["created_at"].strftime('%Y-%m-%d %H:%M:%S'),
+        "username": username,
+    }
+    if "comment_id" in row:
+        payload["comment_id"] = row["comment_id"]
+    return payload
+
+
+def _check_key(idempotency_key):
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError(f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters")
+    return idempotency_key
+
+
+def _timestamp(value):
+    """``created_at`` of an imported row: naive UTC, or now if it is missing."""
+    if value is None:
+        return datetime.utcnow()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError("created_at must be an ISO 8601 timestamp") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _integer(data, field):
+    value = data.get(field)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"{field} must be an integer")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{field} must be an integer") from None
+
+
+def _row(data, idempotency_key, created_at=None, **extra):
+    user_id = _integer(data, "user_id")
+    content = data.get("content")
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("content must be a non-empty string")
+    return {
+        "user_id": user_id,
+        "content": content,
+        "created_at": created_at or datetime.utcnow(),
+        "idempotency_key": idempotency_key,
+        **extra,
+    }
+
+
+def _write_rows(model, rows):
+    """Insert ``rows`` and return ``[(row, created)]`` in order, without committing.
+
+    Rows whose ``idempotency_key`` already exists are returned as stored
+    instead of being inserted again.
+    """
+    table = model.__table__
+    keys = [row["idempotency_key"] for row in rows if row["idempotency_key"] is not None]
+    existing = {}
+    if keys:
+        existing = {
+            stored["idempotency_key"]: dict(stored)
+            for stored in db.session.execute(select(table).where(table.c.idempotency_key.in_(keys))).mappings()
+        }
+    new_rows = [row for row in rows if row["idempotency_key"] not in existing]
+    ids = iter(db.session.scalars(
+        insert(model).returning(model.id, sort_by_parameter_order=True), new_rows
+    ).all() if new_rows else [])
+    return [
+        (existing[row["idempotency_key"]], False) if row["idempotency_key"] in existing
+        else ({**row, "id": next(ids)}, True)
+        for row in rows
+    ]
+
+
+def _write_replies(rows):
+    """``_write_rows`` for replies, adding the new ones to their comments' ``reply_count``."""
+    written = _write_rows(Reply, rows)
+    counters.adjust(counters.REPLY_COUNT, [row["comment_id"] for row, created in written if created])
+    return written
+
+
+_REFERENCED_TABLES = {"users": "User not found", "comments": "Comment not found"}
+
+
+def _is_foreign_key_error(error):
+    # psycopg2 exposes pgcode, psycopg 3 sqlstate; 23503 is foreign_key_violation
+    code = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    if code:
+        return code == "23503"
+    return "FOREIGN KEY constraint failed" in str(error.orig)
+
+
+def _missing_reference(error, references):
+    """Which of ``references`` (referenced table names) a foreign key violation was about."""
+    if len(references) == 1:
+        return _REFERENCED_TABLES[references[0]]
+    diag = getattr(error.orig, "diag", None)
+    constraint = getattr(diag, "constraint_name", None) or ""
+    if constraint.endswith("_user_id_fkey"):
+        return _REFERENCED_TABLES["users"]
+    if constraint.endswith("_comment_id_fkey"):
+        return _REFERENCED_TABLES["comments"]
+    # PostgreSQL: 'Key (user_id)=(5) is not present in table "users".'
+    match = re.search(r'not present in table "(\w+)"', str(error.orig))
+    if match and match.group(1) in _REFERENCED_TABLES:
+        return _REFERENCED_TABLES[match.group(1)]
+    # SQLite does not say which constraint failed
+    return "User or comment not found"
+
+
+def _commit(write, references):
+    """Run ``write()`` and commit; a lost race on an idempotency key is replayed once.
+
+    A foreign key violation becomes ``UnknownReferenceError`` naming one of
+    ``references``; any other integrity error propagates.
+    """
+    for attempt in range(2):
+        try:
+            result = write()
+            db.session.commit()
+            return result
+        except IntegrityError as e:
+            db.session.rollback()
+            if 'idempotency_key' not in str(e.orig):
+                if _is_foreign_key_error(e):
+                    raise UnknownReferenceError(_missing_reference(e, references)) from e
+                raise
+            if attempt:
+                raise
+
+
+def _payloads(written):
+    usernames = identity_cache.get_many(row["user_id"] for row, _ in written)
+    return [
+        written_payload(row, usernames[row["user_id"]].username if row["user_id"] in usernames else None)
+        for row, _ in written
+    ]
+
+
+def write_comment(data, idempotency_key=None):
+    """Insert a comment from ``data`` (user_id, content) and commit.
+
+    Returns ``(payload, created)``. Raises ``ValueError`` for invalid input
+    and ``UnknownReferenceError`` if the user does not exist.
+    """
+    key = _check_key(idempotency_key)
+    row = _row(data, None)
+    row["idempotency_key"] = f"comment:{row['user_id']}:{key}" if key else None
+    written = _commit(lambda: _write_rows(Comment, [row]), ("users",))
+    return _payloads(written)[0], written[0][1]
+
+
+def write_reply(data, idempotency_key=None):
+    """Insert a reply from ``data`` (user_id, comment_id, content) and commit; see ``write_comment``."""
+    key = _check_key(idempotency_key)
+    comment_id = _integer(data, "comment_id")
+    row = _row(data, None, comment_id=comment_id)
+    row["idempotency_key"] = f"reply:{row['user_id']}:{key}" if key else None
+    written = _commit(lambda: _write_replies([row]), ("users", "comments"))
+    return _payloads(written)[0], written[0][1]
+
+
+def import_threads(threads, idempotency_key=None):
+    """Insert comment threads with their replies in one transaction.
+
+    ``threads`` is a list of ``{"user_id", "content", "created_at"?, "replies": [...]}``.
+    Each reply has the same fields. With an ``idempotency_key`` every row gets a
+    key derived from its position, so replaying the same import returns the
+    rows it created instead of duplicating them. Returns
+    ``(payloads, created_count)``.
+    """
+    key = _check_key(idempotency_key)
+    if not isinstance(threads, list) or not threads:
+        raise ValueError("threads must be a non-empty list")
+    if any(not isinstance(thread, dict) for thread in threads):
+        raise ValueError("Each thread must be an object")
+    replies_data = [thread.get("replies") or [] for thread in threads]
+    if any(not isinstance(replies, list) or not all(isinstance(reply, dict) for reply in replies)
+           for replies in replies_data):
+        raise ValueError("replies must be a list of objects")
+    if len(threads) + sum(map(len, replies_data)) > MAX_IMPORT_ROWS:
+        raise ValueError(f"An import is limited to {MAX_IMPORT_ROWS} comments and replies")
+
+    comment_rows = [
+        _row(thread, f"import:{key}:{index}" if key else None, _timestamp(thread.get("created_at")))
+        for index, thread in enumerate(threads)
+    ]
+    reply_data = [
+        (index, position, reply)
+        for index, replies in enumerate(replies_data)
+        for position, reply in enumerate(replies)
+    ]
+    reply_rows = [
+        _row(reply, f"import:{key}:{index}:{position}" if key else None, _timestamp(reply.get("created_at")),
+             comment_id=None)
+        for index, position, reply in reply_data
+    ]
+
+    def write():
+        comments = _write_rows(Comment, comment_rows)
+        for row, (index, _, _) in zip(reply_rows, reply_data):
+            row["comment_id"] = comments[index][0]["id"]
+        return comments, _write_replies(reply_rows) if reply_rows else []
+
+    # Replies point at comments created in the same write, so only users can be missing
+    comments, replies = _commit(write, ("users",))
+    comment_payloads = _payloads(comments)
+    for payload in comment_payloads:
+        payload["replies"] = []
+    for payload, (index, _, _) in zip(_payloads(replies), reply_data):
+        comment_payloads[index]["replies"].append(payload)
+    created = sum(created for _, created in comments) + sum(created for _, created in replies)
+    return comment_payloads, created
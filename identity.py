@@ -0,0 +1,90 @@
+"""Cached Flask-Login identities.
+
+``load_user`` runs on nearly every request, so instead of loading the ORM
+``User`` it returns an immutable ``UserIdentity`` snapshot (id, username,
+email, role) kept in a small per-worker LRU with a short TTL. Handlers that
+need to change the user call ``identity.load()`` to get the full ORM row.
+Writes that change a snapshot field must call ``identity_cache.evict``;
+other workers pick the change up when their entry expires. Misses are
+loaded from the primary so a lagging replica cannot re-cache an old role.
+"""
+from flask_login import UserMixin
+
+from cache import LRUCache
+from db import db
+from models import User
+from replicas import use_primary
+
+
+class UserIdentity(UserMixin):
+    __slots__ = ('id', 'username', 'email', 'role')
+
+    def __init__(self, id, username, email, role):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'username', username)
+        object.__setattr__(self, 'email', email)
+        object.__setattr__(self, 'role', role)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only; use load() to modify the user")
+
+    def load(self):
+        """The full ORM ``User`` for this identity."""
+        return db.session.get(User, self.id)
+
+    def __repr__(self):
+        return f"<UserIdentity(id={self.id}, username={self.username}, role={self.role})>"
+
+
+class IdentityCache:
+
+    def __init__(self):
+        self.cache = LRUCache(maxsize=10_000, ttl=60)
+
+    def init_app(self, app):
+        self.cache = LRUCache(
+            maxsize=app.config.get('IDENTITY_CACHE_SIZE', 10_000),
+            ttl=app.config.get('IDENTITY_CACHE_TTL', 60),
+        )
+        app.extensions['identity_cache'] = self
+
+    def get(self, user_id):
+        """Snapshot for ``user_id``, or ``None`` if the user does not exist."""
+        identity = self.cache.get(user_id)
+        if identity is None:
+            with use_primary():
+                row = db.session.execute(
+                    db.select(User.id, User.username, User.email, User.role).where(User.id == user_id)
+                ).first()
+            if row is None:
+                return None
+            identity = UserIdentity(*row)
+            self.cache.set(user_id, identity)
+        return identity
+
+    def get_many(self, user_ids):
+        """``{user_id: snapshot}`` for the users that exist; cache misses are loaded in one query."""
+        found = {}
+        missing = []
+        for user_id in set(user_ids):
+            identity = self.cache.get(user_id)
+            if identity is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = identity
+        if missing:
+            with use_primary():
+                rows = db.session.execute(
+                    db.select(User.id, User.username, User.email, User.role).where(User.id.in_(missing))
+                ).all()
+            for row in rows:
+                identity = UserIdentity(*row)
+                self.cache.set(identity.id, identity)
+                found[identity.id] = identity
+        return found
+
+    def evict(self, user_id):
+        self.cache.delete(user_id)
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,198 @@
+"""Per-request SQL instrumentation.
+
+Hooks SQLAlchemy's cursor events to count statements and DB time for each
+Flask request, flags statements repeated within one request as likely N+1
+lazy loads, reports the totals in a ``Server-Timing`` header and keeps
+per-endpoint aggregates for ``/debug/metrics``.
+
+Routes can declare a query budget with ``@query_budget(n)`` (or globally via
+``SQL_QUERY_BUDGET``). With ``SQL_QUERY_BUDGET_STRICT`` enabled an over-budget
+request raises ``QueryBudgetExceeded``, which fails tests run with
+``app.testing = True``; otherwise it is only logged.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request runs more SQL statements than its budget allows."""
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL statements a view may run."""
+    def decorator(view):
+        # functools.wraps copies __dict__, so outer decorators keep the budget
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+
+class SQLInstrumentation:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(lambda: {
+            "requests": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0,
+            "n_plus_one_requests": 0, "budget_exceeded": 0,
+        })
+        self._n_plus_one = Counter()
+        self._listening = False
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_INSTRUMENTATION', True)
+        app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 3)
+        app.config.setdefault('SQL_QUERY_BUDGET', None)
+        app.config.setdefault('SQL_QUERY_BUDGET_STRICT', False)
+        app.extensions['sql_instrumentation'] = self
+        if not app.config['SQL_INSTRUMENTATION']:
+            return
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+            self._listening = True
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    # -- engine events --------------------------------------------------
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_start_time')
+        if not starts:
+            return
+        started = starts.pop()
+        if not has_request_context():
+            return
+        stats = g.get('sql_stats')
+        if stats is None:
+            return
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+        stats.statements[statement] += 1
+
+    @staticmethod
+    def _handle_error(exception_context):
+        # after_cursor_execute does not fire for a failed statement; drop its start time
+        if exception_context.connection is not None:
+            exception_context.connection.info.pop('query_start_time', None)
+
+    # -- request lifecycle ----------------------------------------------
+
+    @staticmethod
+    def _start_request():
+        g.sql_stats = RequestStats()
+
+    def _finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        config = current_app.config
+        db_ms = stats.db_time * 1000
+        response.headers.add(
+            'Server-Timing', f'db;dur={db_ms:.2f};desc="{stats.queries} queries"'
+        )
+
+        endpoint = request.endpoint or request.path
+        repeated = stats.repeated(config['SQL_N_PLUS_ONE_THRESHOLD'])
+        if repeated:
+            logger.warning(
+                "Possible N+1 in %s: %s", endpoint,
+                "; ".join(f"{count}x {statement[:120]}" for statement, count in repeated.items()),
+            )
+
+        budget = self._budget_for(endpoint)
+        over_budget = budget is not None and stats.queries > budget
+
+        with self._lock:
+            totals = self._endpoints[endpoint]
+            totals["requests"] += 1
+            totals["queries"] += stats.queries
+            totals["db_ms"] += db_ms
+            totals["max_queries"] = max(totals["max_queries"], stats.queries)
+            totals["n_plus_one_requests"] += bool(repeated)
+            totals["budget_exceeded"] += over_budget
+            for statement in repeated:
+                self._n_plus_one[(endpoint, statement)] += 1
+
+        if over_budget:
+            message = f"{endpoint} ran {stats.queries} queries (budget {budget})"
+            if config['SQL_QUERY_BUDGET_STRICT']:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    @staticmethod
+    def _budget_for(endpoint):
+        view = current_app.view_functions.get(endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is None:
+            budget = current_app.config['SQL_QUERY_BUDGET']
+        return budget
+
+    # -- reporting ------------------------------------------------------
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    **totals,
+                    "db_ms": round(totals["db_ms"], 3),
+                    "avg_queries": round(totals["queries"] / totals["requests"], 2),
+                }
+                for endpoint, totals in self._endpoints.items()
+            }
+            n_plus_one = [
+                {"endpoint": endpoint, "statement": statement, "requests": count}
+                for (endpoint, statement), count in self._n_plus_one.most_common(50)
+            ]
+        return {"endpoints": endpoints, "n_plus_one": n_plus_one}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._n_plus_one.clear()
+
+
+@contextmanager
+def count_queries():
+    """Count statements run inside the block, e.g. ``with count_queries() as stats:``."""
+    stats = RequestStats()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        stats.queries += 1
+        stats.statements[statement] += 1
+
+    event.listen(Engine, 'after_cursor_execute', after)
+    try:
+        yield stats
+    finally:
+        event.remove(Engine, 'after_cursor_execute', after)
+
+
+sql_instrumentation = SQLInstrumentation()
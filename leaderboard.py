@@ -0,0 +1,282 @@
+"""In-memory ranked leaderboard kept in sync with ``users.points``.
+
+The rank structure is fed incrementally by ``utils.update_leaderboard`` and is
+rebuilt from the database the first time it is used in a worker. With the
+default local backend every gunicorn worker holds its own copy, so each copy
+is also re-read from the database every ``LEADERBOARD_REFRESH_SECONDS`` to pick
+up writes made by sibling workers. That re-read runs on a background thread;
+requests keep reading the current copy meanwhile, and updates that arrive
+while it runs are replayed on top of the reloaded rows. Setting
+``LEADERBOARD_REDIS_URL`` switches to a Redis sorted set that all workers share.
+
+Both backends rank by points, highest first, and break ties by user ID,
+lowest first.
+"""
+import logging
+import threading
+import time
+
+from sortedcontainers import SortedList
+
+logger = logging.getLogger(__name__)
+
+
+class LocalRankBackend:
+    """``SortedList`` of ``(-points, user_id)`` keys guarded by a lock.
+
+    Score changes and rank lookups are logarithmic, so a points update does
+    not shift the whole ranking while holding the lock.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = SortedList()
+        self._entries = {}
+
+    def replace_all(self, rows):
+        entries = {user_id: (points or 0, username) for user_id, username, points in rows}
+        keys = SortedList((-points, user_id) for user_id, (points, _) in entries.items())
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+
+    def update(self, user_id, points, username=None):
+        points = points or 0
+        with self._lock:
+            current = self._entries.get(user_id)
+            if current is not None:
+                if username is None:
+                    username = current[1]
+                self._keys.discard((-current[0], user_id))
+            self._keys.add((-points, user_id))
+            self._entries[user_id] = (points, username)
+
+    def remove(self, user_id):
+        with self._lock:
+            current = self._entries.pop(user_id, None)
+            if current is not None:
+                self._keys.discard((-current[0], user_id))
+
+    def __contains__(self, user_id):
+        return user_id in self._entries
+
+    def __len__(self):
+        return len(self._keys)
+
+    def rank(self, user_id):
+        """Zero-based rank of ``user_id`` or ``None`` if it is not ranked."""
+        with self._lock:
+            current = self._entries.get(user_id)
+            if current is None:
+                return None
+            return self._keys.bisect_left((-current[0], user_id))
+
+    def slice(self, start, stop):
+        """Entries ranked ``start`` (inclusive) to ``stop`` (exclusive)."""
+        with self._lock:
+            keys = self._keys.islice(max(start, 0), stop)
+            return [
+                (user_id, self._entries[user_id][1], -neg_points)
+                for neg_points, user_id in keys
+            ]
+
+
+def _member(user_id):
+    # Zero-padded so Redis' byte order among equal scores is numeric order
+    return f"{user_id:020d}"
+
+
+class RedisRankBackend:
+    """Redis sorted set shared by every worker.
+
+    Members are scored with ``-points`` and read in ascending order. Redis
+    orders equal scores by member, so ties rank by user ID, lowest first,
+    exactly like ``LocalRankBackend``.
+    """
+
+    shared = True
+
+    def __init__(self, url, key='leaderboard'):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._scores_key = f'{key}:ranks'
+        self._names_key = f'{key}:usernames'
+
+    def replace_all(self, rows):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._scores_key, self._names_key)
+        for user_id, username, points in rows:
+            pipe.zadd(self._scores_key, {_member(user_id): -(points or 0)})
+            if username is not None:
+                pipe.hset(self._names_key, user_id, username)
+        pipe.execute()
+
+    def update(self, user_id, points, username=None):
+        pipe = self._redis.pipeline()
+        pipe.zadd(self._scores_key, {_member(user_id): -(points or 0)})
+        if username is not None:
+            pipe.hset(self._names_key, user_id, username)
+        pipe.execute()
+
+    def remove(self, user_id):
+        pipe = self._redis.pipeline()
+        pipe.zrem(self._scores_key, _member(user_id))
+        pipe.hdel(self._names_key, user_id)
+        pipe.execute()
+
+    def __contains__(self, user_id):
+        return self._redis.zscore(self._scores_key, _member(user_id)) is not None
+
+    def __len__(self):
+        return self._redis.zcard(self._scores_key)
+
+    def rank(self, user_id):
+        return self._redis.zrank(self._scores_key, _member(user_id))
+
+    def slice(self, start, stop):
+        if stop <= start:
+            return []
+        members = self._redis.zrange(self._scores_key, max(start, 0), stop - 1, withscores=True)
+        if not members:
+            return []
+        user_ids = [int(member) for member, _ in members]
+        usernames = self._redis.hmget(self._names_key, user_ids)
+        return [
+            (user_id, username, -int(score))
+            for user_id, (_, score), username in zip(user_ids, members, usernames)
+        ]
+
+
+class LeaderboardService:
+    """Top-N and rank queries answered from a rank backend instead of SQL."""
+
+    def __init__(self):
+        self.backend = LocalRankBackend()
+        self.refresh_seconds = 30
+        self._app = None
+        self._loaded_at = None
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        # Updates seen while a rebuild reads the database, replayed after it
+        self._pending = None
+        self._pending_lock = threading.Lock()
+
+    def init_app(self, app):
+        redis_url = app.config.get('LEADERBOARD_REDIS_URL')
+        if redis_url:
+            self.backend = RedisRankBackend(redis_url)
+        self.refresh_seconds = app.config.get('LEADERBOARD_REFRESH_SECONDS', 30)
+        self._app = app
+        self._loaded_at = None
+        app.extensions['leaderboard'] = self
+
+    def rebuild(self):
+        """Reload every user's points from the database."""
+        from db import db
+        from models import User
+        from replicas import use_primary
+
+        with self._pending_lock:
+            self._pending = {}
+        try:
+            with use_primary():
+                rows = db.session.query(User.id, User.username, User.points).all()
+        except Exception:
+            with self._pending_lock:
+                self._pending = None
+            raise
+        with self._pending_lock:
+            pending, self._pending = self._pending, None
+            self.backend.replace_all(rows)
+            for user_id, change in pending.items():
+                if change is None:
+                    self.backend.remove(user_id)
+                else:
+                    self.backend.update(user_id, *change)
+        self._loaded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self.rebuild()
+            return
+        if self.backend.shared or not self.refresh_seconds:
+            return
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        with self._load_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name='leaderboard-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            with self._app.app_context():
+                self.rebuild()
+        except Exception:
+            logger.exception("Leaderboard refresh failed")
+        finally:
+            self._refreshing = False
+
+    def update(self, user_id, points, username=None):
+        """Write-through hook called after a user's points are committed."""
+        with self._pending_lock:
+            if self._pending is not None:
+                self._pending[user_id] = (points, username)
+            if self._loaded_at is None and not self.backend.shared:
+                # Nothing to keep in sync yet; the first read rebuilds from the DB.
+                return
+            self.backend.update(user_id, points, username)
+
+    def remove(self, user_id):
+        with self._pending_lock:
+            if self._pending is not None:
+                self._pending[user_id] = None
+            self.backend.remove(user_id)
+
+    def top(self, limit):
+        self._ensure_fresh()
+        return [self._entry(rank, row) for rank, row in enumerate(self.backend.slice(0, limit))]
+
+    def around(self, user_id, radius):
+        """Rank of ``user_id`` plus ``radius`` neighbours on either side."""
+        self._ensure_fresh()
+        rank = self.backend.rank(user_id)
+        if rank is None:
+            rank = self._load_user(user_id)
+            if rank is None:
+                return None
+        start = max(rank - radius, 0)
+        rows = self.backend.slice(start, rank + radius + 1)
+        return {
+            "rank": rank + 1,
+            "total": len(self.backend),
+            "neighbours": [self._entry(start + offset, row) for offset, row in enumerate(rows)],
+        }
+
+    def _load_user(self, user_id):
+        # Users created since the last rebuild (e.g. fresh signups) are not
+        # ranked yet; pull just that row rather than rebuilding everything.
+        from db import db
+        from models import User
+        from replicas import use_primary
+
+        with use_primary():
+            row = db.session.query(User.id, User.username, User.points).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        self.backend.update(row.id, row.points, row.username)
+        return self.backend.rank(user_id)
+
+    @staticmethod
+    def _entry(rank, row):
+        user_id, username, points = row
+        return {"rank": rank + 1, "user_id": user_id, "username": username, "points": points}
+
+
+leaderboard_service = LeaderboardService()
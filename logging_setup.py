@@ -0,0 +1,184 @@
+"""Application logging: env-configured levels, JSON output, request IDs, off-thread I/O.
+
+``logging_setup.init_app(app)`` replaces ad-hoc ``basicConfig`` with:
+
+    LOG_LEVEL               root level (default INFO)
+    LOG_FORMAT              ``text`` or ``json`` (one object per line)
+    LOG_DEBUG_SAMPLE_RATE   fraction of requests whose DEBUG records are kept
+    LOG_REQUESTS            emit one access record per request with its duration
+    LOG_QUEUE               hand records to a QueueListener thread (default true)
+
+Every record carries the current ``request_id`` (taken from an incoming
+``X-Request-ID`` header of up to 128 letters, digits, ``.``, ``_`` or ``-``,
+otherwise generated, and echoed on the response). Records
+are queued from the request thread and formatted and written by the
+listener thread, so slow log sinks never block a request. Log calls should
+use %-style arguments so nothing is formatted for records below the level.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+_REQUEST_ID = re.compile(r'[A-Za-z0-9._-]{1,128}')
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the request ID and drop unsampled DEBUG records."""
+
+    def __init__(self, debug_sample_rate=1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record):
+        in_request = has_request_context()
+        record.request_id = g.get('request_id', '-') if in_request else '-'
+        if record.levelno > logging.DEBUG or self.debug_sample_rate >= 1:
+            return True
+        if in_request:
+            return g.get('log_debug_sampled', True)
+        return random.random() < self.debug_sample_rate
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record; ``extra=`` fields become top-level keys."""
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, 'request_id', '-'),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        if orjson is not None:
+            return orjson.dumps(data, default=str).decode()
+        return json.dumps(data, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """QueueHandler that merges args but leaves formatting to the listener."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LoggingSetup:
+
+    TEXT_FORMAT = '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+
+    def __init__(self):
+        self.listener = None
+        self.handler = None
+        self._sink = None
+        self._fork_hook = False
+
+    def init_app(self, app):
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault('LOG_FORMAT', 'text')
+        app.config.setdefault('LOG_DEBUG_SAMPLE_RATE', 1.0)
+        app.config.setdefault('LOG_REQUESTS', True)
+        app.config.setdefault('LOG_QUEUE', True)
+        self.debug_sample_rate = app.config['LOG_DEBUG_SAMPLE_RATE']
+        self.log_requests = app.config['LOG_REQUESTS']
+
+        self._sink = logging.StreamHandler(sys.stderr)
+        if app.config['LOG_FORMAT'] == 'json':
+            self._sink.setFormatter(JSONFormatter())
+        else:
+            self._sink.setFormatter(logging.Formatter(self.TEXT_FORMAT))
+
+        root = logging.getLogger()
+        if self.handler is not None:
+            root.removeHandler(self.handler)
+            self.stop()
+        if app.config['LOG_QUEUE']:
+            self.handler = _QueueHandler(queue.SimpleQueue())
+            self._start_listener()
+            if not self._fork_hook:
+                # Fork hooks cannot be unregistered; one per process is enough
+                os.register_at_fork(after_in_child=self._start_listener)
+                atexit.register(self.stop)
+                self._fork_hook = True
+        else:
+            self.handler = self._sink
+        self.handler.addFilter(RequestContextFilter(self.debug_sample_rate))
+        root.addHandler(self.handler)
+        root.setLevel(app.config['LOG_LEVEL'].upper())
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['logging_setup'] = self
+
+    def _start_listener(self):
+        # A forked child inherits the queue but not the listener thread
+        if not isinstance(self.handler, QueueHandler):
+            return
+        self.listener = QueueListener(self.handler.queue, self._sink, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            listener, self.listener = self.listener, None
+            listener.stop()
+
+    # -- request lifecycle ----------------------------------------------
+
+    def _start_request(self):
+        request_id = request.headers.get('X-Request-ID', '')
+        # Client-supplied, so only trusted when it cannot forge or flood log lines
+        g.request_id = request_id if _REQUEST_ID.fullmatch(request_id) else uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+        if self.debug_sample_rate < 1:
+            g.log_debug_sampled = random.random() < self.debug_sample_rate
+
+    def _finish_request(self, response):
+        request_id = g.get('request_id')
+        if request_id is None:
+            return response
+        response.headers['X-Request-ID'] = request_id
+        if self.log_requests:
+            duration_ms = round((time.perf_counter() - g.request_started) * 1000, 2)
+            # The text format drops ``extra``, so the message carries the duration too
+            logging.getLogger('access').info(
+                "%s %s %s %.2fms", request.method, request.path, response.status_code, duration_ms,
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration_ms": duration_ms,
+                },
+            )
+        return response
+
+
+logging_setup = LoggingSetup()
@@ -0,0 +1,28 @@
+"""Add idempotency keys to comments and replies
+
+Revision ID: a2d7e5c9f346
+Revises: f1c6d4a8b235
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2d7e5c9f346'
+down_revision = 'f1c6d4a8b235'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('comments', 'replies'):
+        op.add_column(table, sa.Column('idempotency_key', sa.String(length=120), nullable=True))
+        op.create_unique_constraint(f'uq_{table}_idempotency_key', table, ['idempotency_key'])
+
+
+def downgrade():
+    for table in ('replies', 'comments'):
+        op.drop_constraint(f'uq_{table}_idempotency_key', table, type_='unique')
+        op.drop_column(table, 'idempotency_key')
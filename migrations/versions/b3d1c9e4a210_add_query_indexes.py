@@ -0,0 +1,61 @@
+"""Add indexes and unique constraints for hot query paths
+
+Revision ID: b3d1c9e4a210
+Revises: 6af08819f70d
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d1c9e4a210'
+down_revision = '6af08819f70d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate rows so the unique constraints below can be created
+    op.execute(
+        "DELETE FROM user_learning_paths WHERE id NOT IN ("
+        "SELECT MIN(id) FROM user_learning_paths GROUP BY user_id, learning_path_id)"
+    )
+    op.execute(
+        "DELETE FROM user_achievements WHERE id NOT IN ("
+        "SELECT MIN(id) FROM user_achievements GROUP BY user_id, achievement_id)"
+    )
+
+    op.create_index('ix_users_points', 'users', ['points'])
+    op.create_index('ix_modules_learning_path_id', 'modules', ['learning_path_id'])
+    op.create_index('ix_module_resources_module_id_resource_id', 'module_resources', ['module_id', 'resource_id'])
+    op.create_index('ix_quiz_content_module_id', 'quiz_content', ['module_id'])
+    op.create_index('ix_replies_comment_id_id', 'replies', ['comment_id', 'id'])
+    op.create_index('ix_comments_user_id_id', 'comments', ['user_id', 'id'])
+    op.create_index('ix_feedback_resource_id_id', 'feedback', ['resource_id', 'id'])
+
+    with op.batch_alter_table('user_learning_paths', schema=None) as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_user_learning_paths_user_id_learning_path_id', ['user_id', 'learning_path_id']
+        )
+
+    with op.batch_alter_table('user_achievements', schema=None) as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_user_achievements_user_id_achievement_id', ['user_id', 'achievement_id']
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('user_achievements', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_user_achievements_user_id_achievement_id', type_='unique')
+
+    with op.batch_alter_table('user_learning_paths', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_user_learning_paths_user_id_learning_path_id', type_='unique')
+
+    op.drop_index('ix_feedback_resource_id_id', table_name='feedback')
+    op.drop_index('ix_comments_user_id_id', table_name='comments')
+    op.drop_index('ix_replies_comment_id_id', table_name='replies')
+    op.drop_index('ix_quiz_content_module_id', table_name='quiz_content')
+    op.drop_index('ix_module_resources_module_id_resource_id', table_name='module_resources')
+    op.drop_index('ix_modules_learning_path_id', table_name='modules')
+    op.drop_index('ix_users_points', table_name='users')
@@ -0,0 +1,40 @@
+"""Add composite indexes matching the keyset pagination orders
+
+Revision ID: b4e8f2a6c357
+Revises: a2d7e5c9f346
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8f2a6c357'
+down_revision = 'a2d7e5c9f346'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset comparisons never match NULL, so users without points would drop out of ?sort=points pages
+    op.execute("UPDATE users SET points = 0 WHERE points IS NULL")
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('points', existing_type=sa.Integer(), nullable=False, server_default='0')
+
+    # The (x, id) indexes serve every query the single-column ones did
+    op.create_index('ix_users_points_id', 'users', ['points', 'id'])
+    op.drop_index('ix_users_points', table_name='users')
+    op.create_index('ix_quiz_content_module_id_id', 'quiz_content', ['module_id', 'id'])
+    op.drop_index('ix_quiz_content_module_id', table_name='quiz_content')
+    op.create_index('ix_learning_paths_contributor_id_id', 'learning_paths', ['contributor_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_learning_paths_contributor_id_id', table_name='learning_paths')
+    op.create_index('ix_quiz_content_module_id', 'quiz_content', ['module_id'])
+    op.drop_index('ix_quiz_content_module_id_id', table_name='quiz_content')
+    op.create_index('ix_users_points', 'users', ['points'])
+    op.drop_index('ix_users_points_id', table_name='users')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('points', existing_type=sa.Integer(), nullable=True, server_default=None)
@@ -0,0 +1,38 @@
+"""Add reply, enrollment and feedback counter columns
+
+Revision ID: c5f9a3b7d468
+Revises: b4e8f2a6c357
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f9a3b7d468'
+down_revision = 'b4e8f2a6c357'
+branch_labels = None
+depends_on = None
+
+COUNTERS = (
+    ('comments', 'reply_count', 'replies', 'comment_id'),
+    ('learning_paths', 'enrolled_count', 'user_learning_paths', 'learning_path_id'),
+    ('resources', 'feedback_count', 'feedback', 'resource_id'),
+)
+
+
+def upgrade():
+    for table, column, child, foreign_key in COUNTERS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+        op.execute(
+            f"UPDATE {table} SET {column} = "
+            f"(SELECT COUNT(*) FROM {child} WHERE {child}.{foreign_key} = {table}.id)"
+        )
+
+
+def downgrade():
+    for table, column, _, _ in reversed(COUNTERS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column(column)
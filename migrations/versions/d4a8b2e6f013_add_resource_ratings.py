@@ -0,0 +1,79 @@
+"""Add resource_ratings aggregates and learning path rating rollup
+
+Revision ID: d4a8b2e6f013
+Revises: c7e2f4a91b35
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a8b2e6f013'
+down_revision = 'c7e2f4a91b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resource_ratings',
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('rating_1', sa.Integer(), nullable=False),
+    sa.Column('rating_2', sa.Integer(), nullable=False),
+    sa.Column('rating_3', sa.Integer(), nullable=False),
+    sa.Column('rating_4', sa.Integer(), nullable=False),
+    sa.Column('rating_5', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ),
+    sa.PrimaryKeyConstraint('resource_id')
+    )
+    with op.batch_alter_table('feedback', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+    with op.batch_alter_table('learning_paths', schema=None) as batch_op:
+        batch_op.alter_column('rating', existing_type=sa.Integer(), type_=sa.Float())
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from existing feedback
+    op.execute("""
+        INSERT INTO resource_ratings (resource_id, rating_count, rating_sum,
+            rating_1, rating_2, rating_3, rating_4, rating_5, updated_at)
+        SELECT resource_id, COUNT(*), SUM(rating),
+            SUM(CASE WHEN rating = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 2 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 3 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 4 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 5 THEN 1 ELSE 0 END),
+            CURRENT_TIMESTAMP
+        FROM feedback
+        WHERE resource_id IS NOT NULL AND rating BETWEEN 1 AND 5
+        GROUP BY resource_id
+    """)
+    op.execute("""
+        UPDATE learning_paths SET
+            rating_count = COALESCE((
+                SELECT SUM(rr.rating_count)
+                FROM (SELECT DISTINCT m.learning_path_id, mr.resource_id
+                      FROM modules m JOIN module_resources mr ON mr.module_id = m.id) pr
+                JOIN resource_ratings rr ON rr.resource_id = pr.resource_id
+                WHERE pr.learning_path_id = learning_paths.id
+            ), 0),
+            rating = (
+                SELECT ROUND(SUM(rr.rating_sum) * 1.0 / SUM(rr.rating_count), 2)
+                FROM (SELECT DISTINCT m.learning_path_id, mr.resource_id
+                      FROM modules m JOIN module_resources mr ON mr.module_id = m.id) pr
+                JOIN resource_ratings rr ON rr.resource_id = pr.resource_id
+                WHERE pr.learning_path_id = learning_paths.id
+            )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('learning_paths', schema=None) as batch_op:
+        batch_op.drop_column('rating_count')
+        batch_op.alter_column('rating', existing_type=sa.Float(), type_=sa.Integer())
+    with op.batch_alter_table('feedback', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
+    op.drop_table('resource_ratings')
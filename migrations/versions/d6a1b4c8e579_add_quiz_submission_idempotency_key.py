@@ -0,0 +1,26 @@
+"""Add idempotency keys to quiz submissions
+
+Revision ID: d6a1b4c8e579
+Revises: c5f9a3b7d468
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6a1b4c8e579'
+down_revision = 'c5f9a3b7d468'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('quiz_submissions', sa.Column('idempotency_key', sa.String(length=200), nullable=True))
+    op.create_unique_constraint('uq_quiz_submissions_idempotency_key', 'quiz_submissions', ['idempotency_key'])
+
+
+def downgrade():
+    op.drop_constraint('uq_quiz_submissions_idempotency_key', 'quiz_submissions', type_='unique')
+    op.drop_column('quiz_submissions', 'idempotency_key')
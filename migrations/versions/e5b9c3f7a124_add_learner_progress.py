@@ -0,0 +1,110 @@
+"""Add module/quiz completions and learner progress counters
+
+Revision ID: e5b9c3f7a124
+Revises: d4a8b2e6f013
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9c3f7a124'
+down_revision = 'd4a8b2e6f013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('module_completions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('module_id', sa.Integer(), nullable=False),
+    sa.Column('learning_path_id', sa.Integer(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['learning_path_id'], ['learning_paths.id'], ),
+    sa.ForeignKeyConstraint(['module_id'], ['modules.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'module_id', name='uq_module_completions_user_id_module_id')
+    )
+    op.create_index('ix_module_completions_user_id_learning_path_id', 'module_completions', ['user_id', 'learning_path_id'])
+    op.create_table('quiz_completions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('learning_path_id', sa.Integer(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['learning_path_id'], ['learning_paths.id'], ),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz_content.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'quiz_id', name='uq_quiz_completions_user_id_quiz_id')
+    )
+    op.create_index('ix_quiz_completions_user_id_learning_path_id', 'quiz_completions', ['user_id', 'learning_path_id'])
+
+    with op.batch_alter_table('learning_paths', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('module_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('quiz_count', sa.Integer(), nullable=False, server_default='0'))
+    with op.batch_alter_table('user_learning_paths', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_modules', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('completed_quizzes', sa.Integer(), nullable=False, server_default='0'))
+
+    # Quizzes already answered correctly count as completed
+    op.execute("""
+        INSERT INTO quiz_completions (user_id, quiz_id, learning_path_id, completed_at)
+        SELECT qs.user_id, qs.quiz_id, m.learning_path_id, MIN(qs.submitted_at)
+        FROM quiz_submissions qs
+        JOIN quiz_content qc ON qc.id = qs.quiz_id
+        JOIN modules m ON m.id = qc.module_id
+        WHERE qs.selected_option = qc.correct_option AND qs.user_id IS NOT NULL
+        GROUP BY qs.user_id, qs.quiz_id, m.learning_path_id
+    """)
+    op.execute("""
+        UPDATE learning_paths SET
+            module_count = (SELECT COUNT(*) FROM modules m WHERE m.learning_path_id = learning_paths.id),
+            quiz_count = (
+                SELECT COUNT(*) FROM quiz_content qc JOIN modules m ON m.id = qc.module_id
+                WHERE m.learning_path_id = learning_paths.id
+            )
+    """)
+    op.execute("""
+        UPDATE user_learning_paths SET completed_quizzes = (
+            SELECT COUNT(*) FROM quiz_completions qc
+            WHERE qc.user_id = user_learning_paths.user_id
+              AND qc.learning_path_id = user_learning_paths.learning_path_id
+        )
+    """)
+    # progress_percentage was never maintained; derive it from the counters
+    op.execute("""
+        UPDATE user_learning_paths SET progress_percentage = COALESCE((
+            SELECT CASE
+                WHEN lp.module_count + lp.quiz_count = 0 THEN 0
+                WHEN user_learning_paths.completed_quizzes >= lp.module_count + lp.quiz_count THEN 100
+                ELSE user_learning_paths.completed_quizzes * 100 / (lp.module_count + lp.quiz_count)
+            END
+            FROM learning_paths lp WHERE lp.id = user_learning_paths.learning_path_id
+        ), 0)
+    """)
+    op.execute("""
+        UPDATE user_learning_paths SET completed_at = COALESCE((
+            SELECT MAX(qc.completed_at) FROM quiz_completions qc
+            WHERE qc.user_id = user_learning_paths.user_id
+              AND qc.learning_path_id = user_learning_paths.learning_path_id
+        ), CURRENT_TIMESTAMP)
+        WHERE progress_percentage >= 100 AND completed_at IS NULL
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('user_learning_paths', schema=None) as batch_op:
+        batch_op.drop_column('completed_quizzes')
+        batch_op.drop_column('completed_modules')
+    with op.batch_alter_table('learning_paths', schema=None) as batch_op:
+        batch_op.drop_column('quiz_count')
+        batch_op.drop_column('module_count')
+    op.drop_index('ix_quiz_completions_user_id_learning_path_id', table_name='quiz_completions')
+    op.drop_table('quiz_completions')
+    op.drop_index('ix_module_completions_user_id_learning_path_id', table_name='module_completions')
+    op.drop_table('module_completions')
@@ -0,0 +1,28 @@
+"""Add entity version counters for response cache ETags
+
+Revision ID: f1c6d4a8b235
+Revises: e5b9c3f7a124
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6d4a8b235'
+down_revision = 'e5b9c3f7a124'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('entity_versions',
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('entity_versions')
@@ -1,19 +1,23 @@
 from db import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from sqlalchemy_serializer import SerializerMixin
+from passwords import password_hasher
+from serializers import compile_serializer
 from utils import update_leaderboard 
 
 class User(db.Model, UserMixin, SerializerMixin):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_points_id', 'points', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(50), nullable=False)
-    points = db.Column(db.Integer, default=0)
+    points = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     date_joined = db.Column(db.DateTime, default=datetime.utcnow)
 
     leaderboard_entry = db.relationship('Leaderboard', back_populates='user', uselist=False)
@@ -29,28 +33,31 @@ class User(db.Model, UserMixin, SerializerMixin):
 
     def set_password(self, password):
         """Hash and store the user's password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         """Check the provided password against the stored hash."""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True when the stored hash predates the configured hashing parameters."""
+        return password_hasher.needs_rehash(self.password_hash)
 
     def add_points(self, points):
-        """Add points to the user's score and update the leaderboard."""
+        """Add points to the user's score, award achievements and update the leaderboard."""
+        from achievements import award_achievements
+
         self.points += points
+        db.session.flush()
+        award_achievements([self.id])
         db.session.commit()
-        update_leaderboard(db, Leaderboard, self.id, self.points)
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "username": self.username,
-            "email": self.email,
-            "role": self.role,
-            "points": self.points,
-            "date_joined": self.date_joined.isoformat(),
-            "leaderboard_entry_id": self.leaderboard_entry.id if self.leaderboard_entry else None
-        }
+        update_leaderboard(db, Leaderboard, self.id, self.points, self.username)
+
+    to_dict = compile_serializer(
+        "id", "username", "email", "role", "points",
+        dates=("date_joined",),
+        includes={"leaderboard_entry_id": "leaderboard_entry.id"},
+    )
 
     def __repr__(self):
         return f"<User(id={self.id}, username={self.username}, role={self.role})>"
@@ -58,25 +65,28 @@ class User(db.Model, UserMixin, SerializerMixin):
 
 class LearningPath(db.Model, SerializerMixin):
     __tablename__ = 'learning_paths'
+    __table_args__ = (
+        db.Index('ix_learning_paths_contributor_id_id', 'contributor_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     contributor_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    rating = db.Column(db.Integer)
+    rating = db.Column(db.Float)
+    rating_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    module_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    quiz_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    enrolled_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     modules = db.relationship('Module', back_populates='learning_path')
     enrolled_users = db.relationship('UserLearningPath', back_populates='learning_path')
     contributor = db.relationship('User', back_populates='contributed_paths')
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "contributor_id": self.contributor_id,
-            "rating": self.rating
-        }
+    to_dict = compile_serializer(
+        "id", "title", "description", "contributor_id", "rating", "rating_count",
+        "module_count", "quiz_count", "enrolled_count",
+    )
 
     def __repr__(self):
         return f"<LearningPath(id={self.id}, title={self.title})>"
@@ -84,6 +94,9 @@ class LearningPath(db.Model, SerializerMixin):
 
 class Module(db.Model, SerializerMixin):
     __tablename__ = 'modules'
+    __table_args__ = (
+        db.Index('ix_modules_learning_path_id', 'learning_path_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100))
@@ -95,13 +108,7 @@ class Module(db.Model, SerializerMixin):
     challenges = db.relationship('Challenge', back_populates='module')
     quiz_content = db.relationship('QuizContent', back_populates='module')
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "learning_path_id": self.learning_path_id
-        }
+    to_dict = compile_serializer("id", "title", "description", "learning_path_id")
 
     def __repr__(self):
         return f"<Module(id={self.id}, title={self.title})>"
@@ -116,19 +123,15 @@ class Resource(db.Model, SerializerMixin):
     type = db.Column(db.Enum('Video', 'Article', 'Tutorial', name='resource_type'))
     description = db.Column(db.Text)
     contributor_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    feedback_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     feedbacks = db.relationship('Feedback', back_populates='resource')
     modules = db.relationship('ModuleResource', back_populates='resource')
+    rating_summary = db.relationship('ResourceRating', back_populates='resource', uselist=False)
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "url": self.url,
-            "type": self.type,
-            "description": self.description,
-            "contributor_id": self.contributor_id
-        }
+    to_dict = compile_serializer(
+        "id", "title", "url", "type", "description", "contributor_id", "feedback_count"
+    )
 
     def __repr__(self):
         return f"<Resource(id={self.id}, title={self.title})>"
@@ -136,47 +139,69 @@ class Resource(db.Model, SerializerMixin):
 
 class Feedback(db.Model, SerializerMixin):
     __tablename__ = 'feedback'
+    __table_args__ = (
+        db.Index('ix_feedback_resource_id_id', 'resource_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     resource_id = db.Column(db.Integer, db.ForeignKey('resources.id'))
     comment = db.Column(db.Text)
     rating = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     user = db.relationship("User", back_populates="feedback")
     resource = db.relationship("Resource", back_populates="feedbacks")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user.id,
-            "resource_id": self.resource.id,
-            "comment": self.comment,
-            "rating": self.rating
-        }
+    to_dict = compile_serializer("id", "user_id", "resource_id", "comment", "rating", dates=("created_at",))
 
     def __repr__(self):
         return f"<Feedback(id={self.id}, user_id={self.user_id}, rating={self.rating})>"
 
 
+class ResourceRating(db.Model, SerializerMixin):
+    """Running rating aggregate for one resource, maintained by ``ratings.record_rating``."""
+    __tablename__ = 'resource_ratings'
+
+    resource_id = db.Column(db.Integer, db.ForeignKey('resources.id'), primary_key=True)
+    rating_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    rating_1 = db.Column(db.Integer, default=0, nullable=False)
+    rating_2 = db.Column(db.Integer, default=0, nullable=False)
+    rating_3 = db.Column(db.Integer, default=0, nullable=False)
+    rating_4 = db.Column(db.Integer, default=0, nullable=False)
+    rating_5 = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    resource = db.relationship("Resource", back_populates="rating_summary")
+
+    to_dict = compile_serializer(
+        "resource_id", "rating_count", "rating_sum",
+        "rating_1", "rating_2", "rating_3", "rating_4", "rating_5",
+        dates=("updated_at",),
+    )
+
+    def __repr__(self):
+        return f"<ResourceRating(resource_id={self.resource_id}, count={self.rating_count})>"
+
+
 class Comment(db.Model, SerializerMixin):
     __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_user_id_id', 'user_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     content = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    idempotency_key = db.Column(db.String(120), unique=True)
+    reply_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     user = db.relationship("User", back_populates="comments")
     replies = db.relationship("Reply", back_populates="comment")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user.id,
-            "content": self.content,
-            "created_at": self.created_at.isoformat()
-        }
+    to_dict = compile_serializer("id", "user_id", "content", dates=("created_at",))
 
     def __repr__(self):
         return f"<Comment(id={self.id}, content='{self.content[:20]}...')>"
@@ -184,24 +209,21 @@ class Comment(db.Model, SerializerMixin):
 
 class Reply(db.Model, SerializerMixin):
     __tablename__ = 'replies'
+    __table_args__ = (
+        db.Index('ix_replies_comment_id_id', 'comment_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'))
     content = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    idempotency_key = db.Column(db.String(120), unique=True)
 
     user = db.relationship("User", back_populates="replies")
     comment = db.relationship("Comment", back_populates="replies")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user.id,
-            "comment_id": self.comment.id,
-            "content": self.content,
-            "created_at": self.created_at.isoformat()
-        }
+    to_dict = compile_serializer("id", "user_id", "comment_id", "content", dates=("created_at",))
 
     def __repr__(self):
         return f"<Reply(id={self.id}, content='{self.content[:20]}...')>"
@@ -221,16 +243,10 @@ class Challenge(db.Model, SerializerMixin):
     module = db.relationship("Module", back_populates="challenges")
     users = db.relationship("UserChallenge", back_populates="challenge")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "points_reward": self.points_reward,
-            "start_date": self.start_date.isoformat(),
-            "end_date": self.end_date.isoformat(),
-            "module_id": self.module_id
-        }
+    to_dict = compile_serializer(
+        "id", "title", "description", "points_reward", "module_id",
+        dates=("start_date", "end_date"),
+    )
 
     def __repr__(self):
         return f"<Challenge(id={self.id}, title={self.title})>"
@@ -247,14 +263,7 @@ class Achievement(db.Model, SerializerMixin):
 
     users = db.relationship("UserAchievement", back_populates="achievement")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "description": self.description,
-            "icon_url": self.icon_url,
-            "points_required": self.points_required
-        }
+    to_dict = compile_serializer("id", "name", "description", "icon_url", "points_required")
 
     def __repr__(self):
         return f"<Achievement(id={self.id}, name={self.name})>"
@@ -269,18 +278,16 @@ class Leaderboard(db.Model, SerializerMixin):
 
     user = db.relationship("User", back_populates="leaderboard_entry")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "score": self.score
-        }
+    to_dict = compile_serializer("id", "user_id", "score")
 
     def __repr__(self):
         return f"<Leaderboard(id={self.id}, score={self.score})>"
 
 class ModuleResource(db.Model, SerializerMixin):
     __tablename__ = 'module_resources'
+    __table_args__ = (
+        db.Index('ix_module_resources_module_id_resource_id', 'module_id', 'resource_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     module_id = db.Column(db.Integer, db.ForeignKey('modules.id'), nullable=False)
@@ -290,13 +297,7 @@ class ModuleResource(db.Model, SerializerMixin):
     module = db.relationship("Module", back_populates="resources")
     resource = db.relationship("Resource", back_populates="modules")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "module_id": self.module_id,
-            "resource_id": self.resource_id,
-            "added_at": self.added_at.isoformat()
-        }
+    to_dict = compile_serializer("id", "module_id", "resource_id", dates=("added_at",))
 
     def __repr__(self):
         return f"<ModuleResource(id={self.id})>"
@@ -304,6 +305,9 @@ class ModuleResource(db.Model, SerializerMixin):
 
 class UserAchievement(db.Model, SerializerMixin):
     __tablename__ = 'user_achievements'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'achievement_id', name='uq_user_achievements_user_id_achievement_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -313,13 +317,7 @@ class UserAchievement(db.Model, SerializerMixin):
     user = db.relationship("User", back_populates="achievements")
     achievement = db.relationship("Achievement", back_populates="users")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user.id,
-            "achievement_id": self.achievement.id,
-            "earned_at": self.earned_at.isoformat()
-        }
+    to_dict = compile_serializer("id", "user_id", "achievement_id", dates=("earned_at",))
 
     def __repr__(self):
         return f"<UserAchievement(id={self.id})>"
@@ -327,11 +325,16 @@ class UserAchievement(db.Model, SerializerMixin):
 
 class UserLearningPath(db.Model, SerializerMixin):
     __tablename__ = 'user_learning_paths'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'learning_path_id', name='uq_user_learning_paths_user_id_learning_path_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     learning_path_id = db.Column(db.Integer, db.ForeignKey('learning_paths.id'))
     progress_percentage = db.Column(db.Integer)
+    completed_modules = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    completed_quizzes = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     last_accessed = db.Column(db.DateTime, default=datetime.utcnow)
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
@@ -339,21 +342,55 @@ class UserLearningPath(db.Model, SerializerMixin):
     user = db.relationship("User", back_populates="enrolled_paths")
     learning_path = db.relationship("LearningPath", back_populates="enrolled_users")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user.id,
-            "learning_path_id": self.learning_path.id,
-            "progress_percentage": self.progress_percentage,
-            "last_accessed": self.last_accessed.isoformat(),
-            "started_at": self.started_at.isoformat(),
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None
-        }
+    to_dict = compile_serializer(
+        "id", "user_id", "learning_path_id", "progress_percentage",
+        "completed_modules", "completed_quizzes",
+        dates=("last_accessed", "started_at", "completed_at"),
+    )
 
     def __repr__(self):
         return f"<UserLearningPath(id={self.id})>"
 
 
+class ModuleCompletion(db.Model, SerializerMixin):
+    __tablename__ = 'module_completions'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'module_id', name='uq_module_completions_user_id_module_id'),
+        db.Index('ix_module_completions_user_id_learning_path_id', 'user_id', 'learning_path_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    module_id = db.Column(db.Integer, db.ForeignKey('modules.id'), nullable=False)
+    learning_path_id = db.Column(db.Integer, db.ForeignKey('learning_paths.id'))
+    completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    to_dict = compile_serializer("id", "user_id", "module_id", "learning_path_id", dates=("completed_at",))
+
+    def __repr__(self):
+        return f"<ModuleCompletion(user_id={self.user_id}, module_id={self.module_id})>"
+
+
+class QuizCompletion(db.Model, SerializerMixin):
+    """First correct answer of a user to a quiz."""
+    __tablename__ = 'quiz_completions'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'quiz_id', name='uq_quiz_completions_user_id_quiz_id'),
+        db.Index('ix_quiz_completions_user_id_learning_path_id', 'user_id', 'learning_path_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz_content.id'), nullable=False)
+    learning_path_id = db.Column(db.Integer, db.ForeignKey('learning_paths.id'))
+    completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    to_dict = compile_serializer("id", "user_id", "quiz_id", "learning_path_id", dates=("completed_at",))
+
+    def __repr__(self):
+        return f"<QuizCompletion(user_id={self.user_id}, quiz_id={self.quiz_id})>"
+
+
 class UserChallenge(db.Model, SerializerMixin):
     __tablename__ = 'user_challenges'
 
@@ -365,13 +402,7 @@ class UserChallenge(db.Model, SerializerMixin):
     user = db.relationship("User", back_populates="challenges")
     challenge = db.relationship("Challenge", back_populates="users")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user.id,
-            "challenge_id": self.challenge.id,
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None
-        }
+    to_dict = compile_serializer("id", "user_id", "challenge_id", dates=("completed_at",))
 
     def __repr__(self):
         return f"<UserChallenge(id={self.id})>"
@@ -379,6 +410,9 @@ class UserChallenge(db.Model, SerializerMixin):
 
 class QuizContent(db.Model, SerializerMixin):
     __tablename__ = 'quiz_content'
+    __table_args__ = (
+        db.Index('ix_quiz_content_module_id_id', 'module_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     module_id = db.Column(db.Integer, db.ForeignKey('modules.id'))
@@ -393,16 +427,9 @@ class QuizContent(db.Model, SerializerMixin):
     parent = db.relationship("QuizContent", remote_side=[id], back_populates="children")
     children = db.relationship("QuizContent", back_populates="parent")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "module_id": self.module_id,
-            "parent_id": self.parent_id,
-            "question": self.question,
-            "options": self.options,
-            "correct_option": self.correct_option,
-            "points": self.points
-        }
+    to_dict = compile_serializer(
+        "id", "module_id", "parent_id", "question", "options", "correct_option", "points"
+    )
 
     def __repr__(self):
         return f"<QuizContent(id={self.id}, question={self.question[:20]}...)>"
@@ -417,19 +444,15 @@ class QuizSubmission(db.Model, SerializerMixin):
     selected_option = db.Column(db.String, nullable=False)
     score = db.Column(db.Integer)
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set on the first submission of an attempt sent with an Idempotency-Key
+    idempotency_key = db.Column(db.String(200), unique=True)
 
     user = db.relationship("User", back_populates="quiz_submissions")
     quiz = db.relationship("QuizContent")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user.id,
-            "quiz_id": self.quiz.id,
-            "selected_option": self.selected_option,
-            "score": self.score,
-            "submitted_at": self.submitted_at.isoformat()
-        }
+    to_dict = compile_serializer(
+        "id", "user_id", "quiz_id", "selected_option", "score", dates=("submitted_at",)
+    )
 
     def __repr__(self):
         return f"<QuizSubmission(id={self.id}, selected_option={self.selected_option})>"
@@ -439,3 +462,45 @@ class QuizSubmission(db.Model, SerializerMixin):
         if self.score is not None:
             self.user.add_points(self.score)  
             db.session.commit()  
+
+
+class OutboxEvent(db.Model, SerializerMixin):
+    __tablename__ = 'outbox_events'
+    __table_args__ = (
+        db.Index(
+            'ix_outbox_events_pending', 'available_at', 'id',
+            postgresql_where=db.text('processed_at IS NULL'),
+            sqlite_where=db.text('processed_at IS NULL'),
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+
+    to_dict = compile_serializer(
+        "id", "kind", "payload", "idempotency_key", "attempts", "last_error",
+        dates=("created_at", "available_at", "processed_at"),
+    )
+
+    def __repr__(self):
+        return f"<OutboxEvent(id={self.id}, kind={self.kind})>"
+
+
+class EntityVersion(db.Model, SerializerMixin):
+    """Content version counter for a cacheable entity such as ``module:5``."""
+    __tablename__ = 'entity_versions'
+
+    key = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, default=1, nullable=False)
+
+    to_dict = compile_serializer("key", "version")
+
+    def __repr__(self):
+        return f"<EntityVersion(key={self.key}, version={self.version})>"
@@ -0,0 +1,68 @@
+"""Everything a learner needs to open a module, loaded in a fixed number of queries."""
+from datetime import datetime
+
+from sqlalchemy import or_
+
+from db import db
+from models import Challenge, Module, ModuleResource, QuizContent, Resource, ResourceRating
+from ratings import rating_payload
+
+
+def quiz_tree(quizzes):
+    """Nest quizzes under their ``parent_id``; orphans become roots."""
+    nodes = {quiz.id: {**quiz.to_dict(), "children": []} for quiz in quizzes}
+    roots = []
+    for quiz in quizzes:
+        parent = nodes.get(quiz.parent_id)
+        (parent["children"] if parent else roots).append(nodes[quiz.id])
+    return roots
+
+
+def load_module_bundle(module_id, now=None):
+    """Return the module bundle dict, or ``None`` if the module does not exist.
+
+    Issues four queries: the module, its resources (joined through
+    module_resources, with their rating aggregates), its quizzes and its currently active challenges.
+    """
+    module = db.session.get(Module, module_id)
+    if module is None:
+        return None
+    now = now or datetime.utcnow()
+
+    resources = (
+        db.session.query(Resource, ResourceRating)
+        .join(ModuleResource, ModuleResource.resource_id == Resource.id)
+        .outerjoin(ResourceRating, ResourceRating.resource_id == Resource.id)
+        .filter(ModuleResource.module_id == module_id)
+        .order_by(ModuleResource.id)
+        .all()
+    )
+    quizzes = QuizContent.query.filter_by(module_id=module_id).order_by(QuizContent.id).all()
+    challenges = (
+        Challenge.query.filter(Challenge.module_id == module_id)
+        .filter(or_(Challenge.start_date.is_(None), Challenge.start_date <= now))
+        .filter(or_(Challenge.end_date.is_(None), Challenge.end_date >= now))
+        .order_by(Challenge.id)
+        .all()
+    )
+
+    return {
+        "module": module.to_dict(),
+        "resources": [
+            {**resource.to_dict(), "rating": rating_payload(summary)}
+            for resource, summary in resources
+        ],
+        "quizzes": quiz_tree(quizzes),
+        "challenges": [
+            {
+                "id": challenge.id,
+                "title": challenge.title,
+                "description": challenge.description,
+                "points_reward": challenge.points_reward,
+                "start_date": challenge.start_date.isoformat() if challenge.start_date else None,
+                "end_date": challenge.end_date.isoformat() if challenge.end_date else None,
+                "module_id": challenge.module_id,
+            }
+            for challenge in challenges
+        ],
+    }
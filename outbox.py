@@ -0,0 +1,158 @@
+"""Database-backed outbox for write-behind side effects.
+
+Requests record an ``OutboxEvent`` in the same transaction as their primary
+write and return. ``flask outbox-worker`` processes pending events in
+batches. A batch is selected (with ``FOR UPDATE SKIP LOCKED`` on PostgreSQL,
+so concurrent workers pick different rows), then marked processed with
+``UPDATE ... WHERE processed_at IS NULL`` before its handler runs, in the
+same transaction as the handler's writes. If that update does not match
+every event, another worker got there first and the batch is rolled back.
+That check, not the row lock, is what makes an event's effects apply exactly
+once, including on SQLite, which ignores ``SKIP LOCKED``. Each event carries
+a unique ``idempotency_key``, so enqueuing the same logical event twice
+fails instead of duplicating work.
+
+A batch that fails is retried one event at a time; events that still fail
+are rescheduled with exponential backoff.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from db import db
+from models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF_SECONDS = 3600
+_handlers = {}
+
+
+def handler(kind):
+    """Register ``fn(events)`` as the batch handler for ``kind``.
+
+    The handler runs inside the claiming transaction and must not commit. It
+    may return a callable that is run after the commit succeeds (e.g. to
+    update in-memory caches).
+    """
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind, payload, idempotency_key):
+    """Add an event to the current transaction; the caller commits."""
+    event = OutboxEvent(kind=kind, payload=payload, idempotency_key=idempotency_key)
+    db.session.add(event)
+    return event
+
+
+def _claim(batch_size, event_ids=None):
+    query = OutboxEvent.query.filter(
+        OutboxEvent.processed_at.is_(None),
+        OutboxEvent.available_at <= datetime.utcnow(),
+    )
+    if event_ids is not None:
+        query = query.filter(OutboxEvent.id.in_(event_ids))
+    return query.order_by(OutboxEvent.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+
+class ClaimLost(Exception):
+    """Another worker processed some of the claimed events first."""
+
+
+def _mark_processed(events):
+    result = db.session.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_([event.id for event in events]), OutboxEvent.processed_at.is_(None))
+        .values(processed_at=datetime.utcnow(), attempts=OutboxEvent.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(events):
+        raise ClaimLost()
+
+
+def _apply(events):
+    _mark_processed(events)
+    after_commit = []
+    by_kind = {}
+    for event in events:
+        by_kind.setdefault(event.kind, []).append(event)
+    for kind, kind_events in by_kind.items():
+        if kind not in _handlers:
+            raise LookupError(f"No outbox handler registered for {kind!r}")
+        callback = _handlers[kind](kind_events)
+        if callback is not None:
+            after_commit.append(callback)
+    db.session.commit()
+    for callback in after_commit:
+        callback()
+
+
+def process_batch(batch_size=100):
+    """Process up to ``batch_size`` pending events.
+
+    Returns how many were claimed, not counting events another worker took first.
+    """
+    events = _claim(batch_size)
+    if not events:
+        db.session.rollback()
+        return 0
+    event_ids = [event.id for event in events]
+    try:
+        _apply(events)
+        return len(events)
+    except ClaimLost:
+        db.session.rollback()
+        logger.info("Outbox batch of %d events was partly taken by another worker; retrying individually",
+                    len(event_ids))
+    except Exception:
+        db.session.rollback()
+        logger.exception("Outbox batch of %d events failed; retrying individually", len(event_ids))
+
+    claimed = len(event_ids)
+    for event_id in event_ids:
+        events = _claim(1, [event_id])
+        if not events:
+            db.session.rollback()
+            claimed -= 1
+            continue
+        try:
+            _apply(events)
+        except ClaimLost:
+            db.session.rollback()
+            claimed -= 1
+        except Exception as e:
+            db.session.rollback()
+            _reschedule(event_id, e)
+    return claimed
+
+
+def _reschedule(event_id, error):
+    event = db.session.get(OutboxEvent, event_id)
+    event.attempts += 1
+    event.last_error = repr(error)
+    delay = min(2 ** event.attempts, MAX_BACKOFF_SECONDS)
+    event.available_at = datetime.utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+    logger.error("Outbox event %s failed (attempt %s), retrying in %ss: %r", event_id, event.attempts, delay, error)
+
+
+def run_worker(batch_size=100, poll_interval=1.0, once=False):
+    """Process events until interrupted; with ``once`` stop when the queue is drained."""
+    processed = 0
+    while True:
+        count = process_batch(batch_size)
+        processed += count
+        if count:
+            continue
+        if once:
+            return processed
+        time.sleep(poll_interval)
+
+
+def pending_count():
+    return OutboxEvent.query.filter(OutboxEvent.processed_at.is_(None)).count()
@@ -0,0 +1,123 @@
+"""Keyset pagination shared by the list endpoints.
+
+A list is sorted on a ``Keyset``: indexed columns ending in a unique one, so
+the order is stable. A page is fetched with ``WHERE (keys) > (last keys)
+ORDER BY keys LIMIT limit + 1``. The extra row shows whether there is a next
+page. With OFFSET the database reads and discards every earlier row, so deep
+pages get slower. A keyset page costs the same at any depth.
+
+Cursors are opaque to clients. They hold the last row's key values as URL-safe
+base64 JSON, and a cursor that does not decode against the keyset is rejected
+with ``InvalidCursor``. ``limit`` is clamped to the endpoint's maximum. The
+response body is the page itself. When there is a next page, its cursor is
+sent in ``X-Next-Cursor`` and its URL in a ``Link: <...>; rel="next"`` header.
+"""
+import base64
+import json
+from bisect import bisect_right
+
+from flask import request, url_for
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """A ``cursor`` parameter that was not issued for this list."""
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, types):
+    """The key values in ``cursor``, checked against the Python ``types`` of the keyset."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise InvalidCursor("Invalid cursor") from None
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or any(isinstance(value, bool) or not isinstance(value, type_) for value, type_ in zip(values, types))
+    ):
+        raise InvalidCursor("Invalid cursor")
+    return tuple(values)
+
+
+def page_params(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """``(cursor, limit)`` from query ``args``, with ``limit`` clamped to 1..``maximum``."""
+    try:
+        limit = int(args.get('limit', default))
+    except ValueError:
+        limit = default
+    return args.get('cursor') or None, min(max(limit, 1), maximum)
+
+
+class Keyset:
+    """Sort order of a paginated list: ``columns`` ascending, or all descending.
+
+    The columns must be NOT NULL: a row-value comparison with NULL never
+    matches, so such rows would silently fall out of the pages.
+    """
+
+    def __init__(self, *columns, descending=False):
+        self.columns = columns
+        self.descending = descending
+        self.types = tuple(column.type.python_type for column in columns)
+
+    def order_by(self):
+        return [column.desc() for column in self.columns] if self.descending else list(self.columns)
+
+    def after(self, values):
+        """Filter for the rows that sort after ``values``."""
+        if len(self.columns) == 1:
+            left, right = self.columns[0], values[0]
+        else:
+            left, right = tuple_(*self.columns), tuple_(*values)
+        return left < right if self.descending else left > right
+
+    def page_query(self, query, cursor, limit):
+        """``query`` (a ``select`` or ``Query``) sorted, positioned after ``cursor``, fetching ``limit + 1`` rows.
+
+        Raises ``InvalidCursor`` for a malformed cursor.
+        """
+        if cursor:
+            query = query.filter(self.after(decode_cursor(cursor, self.types)))
+        return query.order_by(*self.order_by()).limit(limit + 1)
+
+    def page(self, rows, limit):
+        """``(rows, next_cursor)`` for the result of ``page_query``."""
+        rows = list(rows)
+        if len(rows) <= limit:
+            return rows, None
+        last = rows[limit - 1]
+        return rows[:limit], encode_cursor(getattr(last, column.key) for column in self.columns)
+
+
+def page_keys(keys, cursor, limit):
+    """Keyset page over ``keys``, a sorted sequence of unique integers held in memory.
+
+    Returns ``(keys, next_cursor)``; raises ``InvalidCursor`` for a malformed cursor.
+    """
+    start = 0
+    if cursor:
+        after, = decode_cursor(cursor, (int,))
+        start = bisect_right(keys, after)
+    page = keys[start:start + limit + 1]
+    if len(page) <= limit:
+        return list(page), None
+    return list(page[:limit]), encode_cursor([page[limit - 1]])
+
+
+def link_headers(next_cursor):
+    """``X-Next-Cursor`` and ``Link`` headers pointing at the next page of the current request."""
+    if next_cursor is None:
+        return {}
+    query = {**request.view_args, **request.args.to_dict(), "cursor": next_cursor}
+    return {
+        "X-Next-Cursor": next_cursor,
+        "Link": f'<{url_for(request.endpoint, _external=True, **query)}>; rel="next"',
+    }
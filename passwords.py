@@ -0,0 +1,90 @@
+"""Password hashing on a bounded process pool.
+
+scrypt/pbkdf2 are deliberately CPU-heavy. Running them on the request thread
+lets a burst of logins saturate every core a worker shares with other routes,
+so hashes are computed in a small process pool instead. ``max_pending`` caps
+queued hash jobs; beyond it, or when a job outlasts ``timeout``,
+``HashingBusy`` is raised so callers can shed load instead of queueing
+without bound.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the hashing pool is full or a hash job timed out."""
+
+
+def _full_method(method):
+    """``method`` with werkzeug's defaults filled in, as it is written into hashes."""
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2' and len(args) < 2:
+        hash_name = args[0] if args else 'sha256'
+        return f'pbkdf2:{hash_name}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+class PasswordHasher:
+
+    def __init__(self):
+        self.method = 'scrypt:32768:8:1'
+        self.workers = 0
+        self.max_pending = 64
+        self.timeout = 10
+        self._executor = None
+        self._executor_pid = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # Normalised so needs_rehash compares like with like ('scrypt' hashes say 'scrypt:32768:8:1')
+        self.method = _full_method(app.config.get('PASSWORD_HASH_METHOD', self.method))
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['password_hasher'] = self
+
+    def _pool(self):
+        # Pools do not survive fork(), so each gunicorn worker builds its own.
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Too many password hashes in flight")
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # A timed-out job keeps running in the pool, so its slot is freed only when it ends
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HashingBusy(f"Password hash took longer than {self.timeout}s") from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when ``pwhash`` was made with other parameters than ``method``."""
+        return pwhash.split('$', 1)[0] != self.method
+
+
+password_hasher = PasswordHasher()
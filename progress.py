@@ -0,0 +1,239 @@
+"""Learner progress, maintained incrementally from completion events.
+
+A module is completed explicitly (``complete_module``). A quiz is completed
+by the first correct answer to it (``record_quiz_completions``). Each event
+inserts one completion row. If the row is new, the event bumps the
+counters on the user's enrollment in that path. Progress is completed
+modules and quizzes over the path's cached ``module_count + quiz_count``, so
+an event costs a fixed number of statements, whatever the size of the path.
+
+Totals are refreshed when a path's modules or quizzes change
+(``refresh_path_totals``), which also rescales existing enrollments.
+``rebuild_progress`` recomputes everything from the completion tables.
+"""
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db import db
+from models import (
+    LearningPath, Module, ModuleCompletion, QuizCompletion, QuizContent, UserLearningPath,
+)
+
+
+def _percentage(completed, total):
+    return min(100, completed * 100 // total) if total else 0
+
+
+def _insert_new(model, rows, key):
+    """Insert ``rows`` skipping ones that already exist; return the ``key`` values inserted."""
+    if not rows:
+        return []
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_ = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert_(model).values(rows).on_conflict_do_nothing().returning(getattr(model, key))
+        return list(db.session.scalars(stmt))
+    user_id = rows[0]["user_id"]
+    existing = set(db.session.scalars(
+        select(getattr(model, key)).where(
+            model.user_id == user_id, getattr(model, key).in_([row[key] for row in rows])
+        )
+    ))
+    new_rows = [row for row in rows if row[key] not in existing]
+    if new_rows:
+        db.session.execute(insert(model), new_rows)
+    return [row[key] for row in new_rows]
+
+
+def _bump_enrollment(user_id, learning_path_id, modules=0, quizzes=0, now=None):
+    """Add completed modules/quizzes to an enrollment and recompute its progress."""
+    enrollment = (
+        UserLearningPath.query
+        .filter_by(user_id=user_id, learning_path_id=learning_path_id)
+        .with_for_update()
+        .first()
+    )
+    if enrollment is None:
+        return None
+    path = db.session.get(LearningPath, learning_path_id)
+    now = now or datetime.utcnow()
+    enrollment.completed_modules = (enrollment.completed_modules or 0) + modules
+    enrollment.completed_quizzes = (enrollment.completed_quizzes or 0) + quizzes
+    enrollment.progress_percentage = _percentage(
+        enrollment.completed_modules + enrollment.completed_quizzes,
+        (path.module_count or 0) + (path.quiz_count or 0),
+    )
+    enrollment.last_accessed = now
+    if enrollment.progress_percentage >= 100 and enrollment.completed_at is None:
+        enrollment.completed_at = now
+    return enrollment
+
+
+def complete_module(user_id, module_id):
+    """Record that ``user_id`` completed ``module_id``, without committing.
+
+    Returns ``(created, enrollment)``: ``created`` is False if the module was
+    already completed. ``enrollment`` is ``None`` when the user is not enrolled
+    in the module's path; the completion still counts once they enroll.
+    Raises ``LookupError`` if the module does not exist.
+    """
+    path_id = db.session.scalar(select(Module.learning_path_id).where(Module.id == module_id))
+    if path_id is None and db.session.get(Module, module_id) is None:
+        raise LookupError(f"Module {module_id} not found")
+    now = datetime.utcnow()
+    created = bool(_insert_new(ModuleCompletion, [{
+        "user_id": user_id, "module_id": module_id, "learning_path_id": path_id, "completed_at": now,
+    }], "module_id"))
+    enrollment = None
+    if path_id is not None:
+        if created:
+            enrollment = _bump_enrollment(user_id, path_id, modules=1, now=now)
+        else:
+            enrollment = UserLearningPath.query.filter_by(user_id=user_id, learning_path_id=path_id).first()
+    return created, enrollment
+
+
+def record_quiz_completions(user_id, quiz_ids):
+    """Mark ``quiz_ids`` completed for ``user_id`` and bump their enrollments, without committing."""
+    if not quiz_ids:
+        return
+    paths = dict(db.session.execute(
+        select(QuizContent.id, Module.learning_path_id)
+        .join(Module, Module.id == QuizContent.module_id)
+        .where(QuizContent.id.in_(set(quiz_ids)))
+    ).all())
+    now = datetime.utcnow()
+    new_ids = _insert_new(QuizCompletion, [
+        {"user_id": user_id, "quiz_id": quiz_id, "learning_path_id": path_id, "completed_at": now}
+        for quiz_id, path_id in sorted(paths.items())
+    ], "quiz_id")
+    for path_id, count in Counter(paths[quiz_id] for quiz_id in new_ids).items():
+        if path_id is not None:
+            _bump_enrollment(user_id, path_id, quizzes=count, now=now)
+
+
+def initialize_enrollment(enrollment):
+    """Seed a new enrollment's counters from completions made before enrolling."""
+    enrollment.completed_modules = db.session.scalar(
+        select(func.count()).select_from(ModuleCompletion).where(
+            ModuleCompletion.user_id == enrollment.user_id,
+            ModuleCompletion.learning_path_id == enrollment.learning_path_id,
+        )
+    )
+    enrollment.completed_quizzes = db.session.scalar(
+        select(func.count()).select_from(QuizCompletion).where(
+            QuizCompletion.user_id == enrollment.user_id,
+            QuizCompletion.learning_path_id == enrollment.learning_path_id,
+        )
+    )
+    path = db.session.get(LearningPath, enrollment.learning_path_id)
+    enrollment.progress_percentage = _percentage(
+        enrollment.completed_modules + enrollment.completed_quizzes,
+        (path.module_count or 0) + (path.quiz_count or 0),
+    )
+    if enrollment.progress_percentage >= 100:
+        enrollment.completed_at = datetime.utcnow()
+
+
+def refresh_path_totals(path_ids):
+    """Recount modules and quizzes of ``path_ids`` and rescale their enrollments, without committing."""
+    path_ids = [path_id for path_id in set(path_ids) if path_id is not None]
+    if not path_ids:
+        return
+    module_counts = dict(db.session.execute(
+        select(Module.learning_path_id, func.count(Module.id))
+        .where(Module.learning_path_id.in_(path_ids))
+        .group_by(Module.learning_path_id)
+    ).all())
+    quiz_counts = dict(db.session.execute(
+        select(Module.learning_path_id, func.count(QuizContent.id))
+        .join(QuizContent, QuizContent.module_id == Module.id)
+        .where(Module.learning_path_id.in_(path_ids))
+        .group_by(Module.learning_path_id)
+    ).all())
+    db.session.execute(update(LearningPath), [
+        {"id": path_id, "module_count": module_counts.get(path_id, 0), "quiz_count": quiz_counts.get(path_id, 0)}
+        for path_id in path_ids
+    ])
+    _rescale_enrollments(path_ids)
+
+
+def _rescale_enrollments(path_ids=None):
+    """Recompute progress_percentage/completed_at from stored counters and path totals."""
+    total = select(LearningPath.module_count + LearningPath.quiz_count).where(
+        LearningPath.id == UserLearningPath.learning_path_id
+    ).scalar_subquery()
+    completed = UserLearningPath.completed_modules + UserLearningPath.completed_quizzes
+    percentage = case(
+        (total == 0, 0),
+        (completed >= total, 100),
+        else_=completed * 100 // total,
+    )
+    stmt = update(UserLearningPath).values(
+        progress_percentage=percentage,
+        completed_at=case(
+            (percentage < 100, None),
+            else_=func.coalesce(UserLearningPath.completed_at, datetime.utcnow()),
+        ),
+    )
+    if path_ids is not None:
+        stmt = stmt.where(UserLearningPath.learning_path_id.in_(path_ids))
+    db.session.execute(stmt, execution_options={"synchronize_session": False})
+
+
+def recount_enrollments(path_ids=None):
+    """Recompute enrollment counters from the completion tables, without committing."""
+    for model, column in ((ModuleCompletion, "completed_modules"), (QuizCompletion, "completed_quizzes")):
+        completed = select(func.count(model.id)).where(
+            model.user_id == UserLearningPath.user_id,
+            model.learning_path_id == UserLearningPath.learning_path_id,
+        ).scalar_subquery()
+        stmt = update(UserLearningPath).values({column: completed})
+        if path_ids is not None:
+            stmt = stmt.where(UserLearningPath.learning_path_id.in_(path_ids))
+        db.session.execute(stmt, execution_options={"synchronize_session": False})
+    _rescale_enrollments(path_ids)
+
+
+def forget_modules(module_ids):
+    """Drop completions of modules about to be deleted, without committing.
+
+    Callers recount the affected paths with ``recount_enrollments``.
+    """
+    if module_ids:
+        db.session.execute(delete(ModuleCompletion).where(ModuleCompletion.module_id.in_(module_ids)))
+
+
+def rebuild_progress():
+    """Recompute path totals and every enrollment's counters from completions, and commit."""
+    refresh_path_totals(db.session.scalars(select(LearningPath.id)).all())
+    recount_enrollments()
+    db.session.commit()
+
+
+def enrollment_progress(user_id):
+    """Progress of every enrollment of ``user_id``, read from the counters in one query."""
+    rows = db.session.execute(
+        select(UserLearningPath, LearningPath.title, LearningPath.module_count, LearningPath.quiz_count)
+        .join(LearningPath, LearningPath.id == UserLearningPath.learning_path_id)
+        .where(UserLearningPath.user_id == user_id)
+        .order_by(UserLearningPath.learning_path_id)
+    ).all()
+    return [
+        {
+            "learning_path_id": enrollment.learning_path_id,
+            "title": title,
+            "progress_percentage": enrollment.progress_percentage or 0,
+            "completed_modules": enrollment.completed_modules,
+            "module_count": module_count,
+            "completed_quizzes": enrollment.completed_quizzes,
+            "quiz_count": quiz_count,
+            "started_at": enrollment.started_at.isoformat() if enrollment.started_at else None,
+            "last_accessed": enrollment.last_accessed.isoformat() if enrollment.last_accessed else None,
+            "completed_at": enrollment.completed_at.isoformat() if enrollment.completed_at else None,
+        }
+        for enrollment, title, module_count, quiz_count in rows
+    ]
@@ -0,0 +1,31 @@
+"""Per-key token buckets, kept in a bounded per-worker LRU."""
+import threading
+import time
+
+from cache import LRUCache
+
+
+class TokenBucketLimiter:
+    """Allow ``capacity`` immediate hits per key, refilled at ``rate`` tokens/second."""
+
+    def __init__(self, capacity, rate, maxsize=100_000):
+        self.capacity = capacity
+        self.rate = rate
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def consume(self, key, tokens=1):
+        """Take ``tokens`` from ``key``'s bucket.
+
+        Returns ``0`` on success, otherwise the seconds until enough tokens
+        will be available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            available, updated_at = self._buckets.get(key, (self.capacity, now))
+            available = min(self.capacity, available + (now - updated_at) * self.rate)
+            if available >= tokens:
+                self._buckets.set(key, (available - tokens, now))
+                return 0
+            self._buckets.set(key, (available, now))
+            return (tokens - available) / self.rate if self.rate else float('inf')
@@ -0,0 +1,183 @@
+"""Materialized rating aggregates for resources and learning paths.
+
+Each resource with ratings has a ``resource_ratings`` row holding the count,
+sum and 1-5 histogram of its feedback ratings. ``record_rating`` increments
+it with a single upsert when feedback is submitted and re-derives
+``LearningPath.rating``/``rating_count`` for the paths that include the
+resource (through modules and module_resources) from those aggregates, so
+neither reads nor writes scan the feedback table.
+``rebuild_ratings`` recomputes everything from scratch.
+"""
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db import db
+from models import Feedback, LearningPath, Module, ModuleResource, ResourceRating
+from pagination import Keyset
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+FEEDBACK_ORDER = Keyset(Feedback.id, descending=True)
+
+
+def validate_rating(rating):
+    """Return ``rating`` if it is ``None`` or an integer from 1 to 5, else raise ``ValueError``."""
+    if rating is None or (type(rating) is int and rating in RATING_VALUES):
+        return rating
+    raise ValueError("rating must be an integer from 1 to 5")
+
+
+def rating_payload(summary):
+    """Average, count and histogram for a ``ResourceRating`` (or ``None``)."""
+    if summary is None or not summary.rating_count:
+        return {"average": None, "count": 0, "histogram": {str(value): 0 for value in RATING_VALUES}}
+    return {
+        "average": round(summary.rating_sum / summary.rating_count, 2),
+        "count": summary.rating_count,
+        "histogram": {str(value): getattr(summary, f"rating_{value}") for value in RATING_VALUES},
+    }
+
+
+def record_rating(resource_id, rating):
+    """Add one rating to ``resource_id``'s aggregate and roll it up, without committing.
+
+    Returns the IDs of the learning paths whose rating changed.
+    """
+    bucket = f"rating_{rating}"
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_ = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert_(ResourceRating).values(
+            resource_id=resource_id, rating_count=1, rating_sum=rating,
+            updated_at=datetime.utcnow(), **{bucket: 1},
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ResourceRating.resource_id],
+            set_={
+                "rating_count": ResourceRating.rating_count + 1,
+                "rating_sum": ResourceRating.rating_sum + rating,
+                bucket: getattr(ResourceRating, bucket) + 1,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        db.session.execute(stmt)
+    else:
+        summary = db.session.get(ResourceRating, resource_id, with_for_update=True)
+        if summary is None:
+            summary = ResourceRating(
+                resource_id=resource_id, rating_count=0, rating_sum=0,
+                **{f"rating_{value}": 0 for value in RATING_VALUES},
+            )
+            db.session.add(summary)
+        summary.rating_count += 1
+        summary.rating_sum += rating
+        setattr(summary, bucket, getattr(summary, bucket) + 1)
+        summary.updated_at = datetime.utcnow()
+        db.session.flush()
+
+    path_ids = paths_for_resources([resource_id])
+    rollup_learning_paths(path_ids)
+    return path_ids
+
+
+def paths_for_resources(resource_ids):
+    """IDs of the learning paths that include any of ``resource_ids``."""
+    return sorted(db.session.scalars(
+        select(Module.learning_path_id)
+        .join(ModuleResource, ModuleResource.module_id == Module.id)
+        .where(ModuleResource.resource_id.in_(resource_ids), Module.learning_path_id.isnot(None))
+        .distinct()
+    ))
+
+
+def rollup_learning_paths(path_ids=None):
+    """Recompute ``LearningPath.rating`` from resource aggregates, without committing.
+
+    Each resource counts once per path even if several of its modules link it.
+    With ``path_ids=None`` every path is recomputed.
+    """
+    path_resources = (
+        select(Module.learning_path_id.label("learning_path_id"), ModuleResource.resource_id.label("resource_id"))
+        .join(ModuleResource, ModuleResource.module_id == Module.id)
+        .distinct()
+    )
+    if path_ids is not None:
+        if not path_ids:
+            return
+        path_resources = path_resources.where(Module.learning_path_id.in_(path_ids))
+    path_resources = path_resources.subquery()
+
+    totals = {
+        row.learning_path_id: row
+        for row in db.session.execute(
+            select(
+                path_resources.c.learning_path_id,
+                func.sum(ResourceRating.rating_count).label("count"),
+                func.sum(ResourceRating.rating_sum).label("total"),
+            )
+            .join(ResourceRating, ResourceRating.resource_id == path_resources.c.resource_id)
+            .group_by(path_resources.c.learning_path_id)
+        )
+    }
+    if path_ids is None:
+        path_ids = list(db.session.scalars(select(LearningPath.id)))
+
+    rows = []
+    for path_id in path_ids:
+        row = totals.get(path_id)
+        count = int(row.count or 0) if row else 0
+        rows.append({
+            "id": path_id,
+            "rating": round(row.total / count, 2) if count else None,
+            "rating_count": count,
+        })
+    if rows:
+        db.session.execute(update(LearningPath), rows)
+
+
+def rebuild_ratings():
+    """Recompute every resource and learning path aggregate from feedback, and commit."""
+    db.session.execute(delete(ResourceRating))
+    rated = Feedback.rating.in_(RATING_VALUES)
+    columns = {
+        "resource_id": Feedback.resource_id,
+        "rating_count": func.count(Feedback.id),
+        "rating_sum": func.sum(Feedback.rating),
+        **{
+            f"rating_{value}": func.sum(case((Feedback.rating == value, 1), else_=0))
+            for value in RATING_VALUES
+        },
+    }
+    db.session.execute(
+        insert(ResourceRating).from_select(
+            list(columns),
+            select(*columns.values())
+            .where(rated, Feedback.resource_id.isnot(None))
+            .group_by(Feedback.resource_id),
+        )
+    )
+    rollup_learning_paths()
+    db.session.commit()
+
+
+def feedback_payload(feedback):
+    return {
+        "feedback_id": feedback.id,
+        "user_id": feedback.user_id,
+        "comment": feedback.comment,
+        "rating": feedback.rating,
+        "created_at": feedback.created_at.isoformat() if feedback.created_at else None,
+    }
+
+
+def feedback_page(resource_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Newest-first page of feedback for a resource; returns ``(payloads, next_cursor)``.
+
+    Raises ``InvalidCursor`` for a malformed cursor.
+    """
+    query = Feedback.query.filter(Feedback.resource_id == resource_id)
+    feedbacks, next_cursor = FEEDBACK_ORDER.page(FEEDBACK_ORDER.page_query(query, cursor, limit).all(), limit)
+    return [feedback_payload(feedback) for feedback in feedbacks], next_cursor
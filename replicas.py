@@ -0,0 +1,241 @@
+"""Read-replica routing for ``db.session``.
+
+    SQLALCHEMY_REPLICA_URLS             comma-separated replica URLs; empty disables routing
+    REPLICA_READ_YOUR_WRITES_SECONDS    after a request that commits a write, the same
+                                        client reads from the primary for this long
+    REPLICA_HEALTH_INTERVAL             seconds between health checks of each replica
+    REPLICA_MAX_LAG_SECONDS             PostgreSQL replicas replaying further behind than
+                                        this are treated as down (0 disables the check)
+
+A GET or HEAD request is pinned to one healthy replica, picked round robin
+when the request starts. Every other request, CLI command and worker uses the
+primary. Inside a pinned request, flushes, Core INSERT/UPDATE/DELETE, text()
+statements and ``SELECT ... FOR UPDATE`` still go to the primary, and so does
+every statement after the session's first write. Reads inside ``use_primary()``
+also go to the primary; cache fills use it so a lagging replica's rows are
+not cached for every later reader.
+
+The read-your-writes deadline is kept in the Flask session (``_read_primary_until``).
+It is set whenever a request commits a write, so it follows the client to
+whichever worker serves the next request.
+
+A background thread per process checks each replica with ``SELECT 1``. On
+PostgreSQL it also checks the replay lag. A failed check, or a connection
+error while serving a request, marks the replica down until it passes a
+check again. Replicas start out down until their first check, and with no
+healthy replica reads fall back to the primary.
+"""
+import itertools
+import logging
+from contextlib import contextmanager
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.sql.dml import UpdateBase
+
+from engine import engine_options_from_env, init_engine_events
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def _is_write(clause):
+    if isinstance(clause, (UpdateBase, TextClause)):
+        return True
+    return isinstance(clause, Select) and clause._for_update_arg is not None
+
+
+class RoutingSession(Session):
+    """``db.session`` class that sends reads of pinned requests to their replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or _is_write(clause):
+                self.info['wrote'] = True
+            elif not self.info.get('wrote'):
+                replica = g.get('db_replica') if has_request_context() else None
+                if replica is not None:
+                    return replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def use_primary():
+    """Send the reads of a pinned request to the primary inside the block."""
+    replica = g.get('db_replica') if has_request_context() else None
+    if replica is None:
+        yield
+        return
+    g.db_replica = None
+    try:
+        yield
+    finally:
+        g.db_replica = replica
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _record_commit(session):
+    if session.info.get('wrote') and has_request_context():
+        g.db_wrote = True
+
+
+class Replica:
+
+    def __init__(self, engine):
+        self.engine = engine
+        # Unproven until the first health check passes
+        self.healthy = False
+        self.checked_at = None
+        self.error = None
+        self.lag = None
+        self.routed = 0
+
+    def stats(self):
+        return {
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "checked_at": self.checked_at,
+            "error": self.error,
+            "routed_requests": self.routed,
+        }
+
+
+class ReplicaRouter:
+
+    def __init__(self):
+        self.replicas = []
+        self._next = itertools.count()
+        self._monitor_pid = None
+        self._monitor_lock = threading.Lock()
+        self.primary_fallbacks = 0
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URLS', '')
+        app.config.setdefault('REPLICA_READ_YOUR_WRITES_SECONDS', 5)
+        app.config.setdefault('REPLICA_HEALTH_INTERVAL', 5)
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 0)
+        self.window = app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+        self.interval = app.config['REPLICA_HEALTH_INTERVAL']
+        self.max_lag = app.config['REPLICA_MAX_LAG_SECONDS']
+
+        urls = app.config['SQLALCHEMY_REPLICA_URLS']
+        if isinstance(urls, str):
+            urls = [url.strip() for url in urls.split(',') if url.strip()]
+        self.replicas = []
+        for url in urls:
+            engine = create_engine(url, **engine_options_from_env(url, os.environ))
+            init_engine_events(engine, os.environ)
+            replica = Replica(engine)
+            event.listen(engine, 'handle_error', self._error_listener(replica))
+            self.replicas.append(replica)
+
+        app.extensions['replica_router'] = self
+        if self.replicas:
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+
+    # -- routing --------------------------------------------------------
+
+    def _start_request(self):
+        g.db_replica = None
+        if request.method not in READ_METHODS:
+            return
+        if session.get('_read_primary_until', 0) > time.time():
+            return
+        self._ensure_monitor()
+        g.db_replica = self.pick()
+        if g.db_replica is None:
+            self.primary_fallbacks += 1
+
+    def _finish_request(self, response):
+        if g.pop('db_wrote', False) and self.window:
+            session['_read_primary_until'] = time.time() + self.window
+        return response
+
+    def pick(self):
+        """A healthy replica, round robin, or ``None`` to use the primary."""
+        count = len(self.replicas)
+        start = next(self._next)
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            if replica.healthy:
+                replica.routed += 1
+                return replica
+        return None
+
+    # -- health ---------------------------------------------------------
+
+    def _error_listener(self, replica):
+        def on_error(context):
+            if context.is_disconnect or context.connection is None:
+                self._mark_down(replica, str(context.original_exception))
+        return on_error
+
+    def _mark_down(self, replica, error):
+        if replica.healthy or replica.checked_at is None:
+            logger.warning("Replica %s marked down: %s", replica.stats()["url"], error)
+        replica.healthy = False
+        replica.error = error
+
+    def check(self, replica):
+        """Run one health check against ``replica`` and update its state."""
+        try:
+            with replica.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+                lag = None
+                if self.max_lag and replica.engine.dialect.name == 'postgresql':
+                    lag = connection.scalar(text(
+                        "SELECT CASE WHEN pg_is_in_recovery() "
+                        "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                        "ELSE 0 END"
+                    ))
+        except SQLAlchemyError as e:
+            self._mark_down(replica, str(e))
+        else:
+            replica.lag = float(lag) if lag is not None else None
+            if replica.lag is not None and replica.lag > self.max_lag:
+                self._mark_down(replica, f"replication lag {replica.lag:.1f}s")
+            else:
+                if not replica.healthy:
+                    logger.info("Replica %s is healthy again", replica.stats()["url"])
+                replica.healthy = True
+                replica.error = None
+        replica.checked_at = time.time()
+        return replica.healthy
+
+    def check_all(self):
+        return [self.check(replica) for replica in self.replicas]
+
+    def _ensure_monitor(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        if self._monitor_pid == os.getpid():
+            return
+        with self._monitor_lock:
+            if self._monitor_pid == os.getpid():
+                return
+            self._monitor_pid = os.getpid()
+            threading.Thread(target=self._monitor, name='replica-health', daemon=True).start()
+
+    def _monitor(self):
+        pid = os.getpid()
+        while self._monitor_pid == pid:
+            self.check_all()
+            time.sleep(self.interval)
+
+    def stats(self):
+        return {
+            "replicas": [replica.stats() for replica in self.replicas],
+            "primary_fallbacks": self.primary_fallbacks,
+        }
+
+
+replica_router = ReplicaRouter()
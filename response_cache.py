@@ -0,0 +1,169 @@
+"""HTTP response cache for read-mostly routes, with content-version ETags.
+
+``@response_cache.cached(...)`` wraps a view (below ``login_required``):
+
+    versions    ``fn(**view_args)`` returning entity keys such as
+                ``["module:5"]``. Their counters in ``entity_versions`` are
+                read in one query and hashed, with the URL and scope, into
+                the ETag. Writes call ``bump_versions`` in their own
+                transaction, so new content always gets a new ETag. Without
+                ``versions`` the ETag is a hash of the body.
+    ttl         seconds a rendered response stays in the per-worker LRU. For
+                versioned routes it also rotates the ETag, bounding how long
+                content that no counter tracks (e.g. time-windowed rows) can
+                be served stale.
+    scope       ``"shared"`` or ``"user"`` (the current user is part of the key)
+    max_age     ``Cache-Control`` max-age for clients; 0 means they revalidate
+                every time
+
+A matching ``If-None-Match`` on a versioned route gets a 304 without running
+the view. Otherwise a cached body is served as-is, or the view runs and its
+200 response is stored.
+"""
+import functools
+import hashlib
+import time
+
+from flask import current_app, request
+from flask_login import current_user
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from cache import LRUCache
+from db import db
+from models import EntityVersion, Module, ModuleResource
+
+# Headers that are recomputed per response rather than replayed from the cache
+_UNCACHED_HEADERS = {'content-length', 'content-type', 'set-cookie', 'etag', 'cache-control', 'vary'}
+
+
+def bump_versions(keys):
+    """Increment the version counters of ``keys``, without committing."""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert_ = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert_(EntityVersion).values([{"key": key, "version": 1} for key in keys])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EntityVersion.key],
+            set_={"version": EntityVersion.version + 1},
+        )
+        db.session.execute(stmt)
+        return
+    existing = {
+        row.key: row
+        for row in EntityVersion.query.filter(EntityVersion.key.in_(keys)).with_for_update()
+    }
+    for key in keys:
+        if key in existing:
+            existing[key].version += 1
+        else:
+            db.session.add(EntityVersion(key=key, version=1))
+    db.session.flush()
+
+
+def path_keys(path_id):
+    """Version keys of a learning path and each of its current modules."""
+    return [f"path:{path_id}"] + [
+        f"module:{module_id}"
+        for module_id in db.session.scalars(select(Module.id).where(Module.learning_path_id == path_id))
+    ]
+
+
+def resource_keys(resource_ids):
+    """Version keys of ``resource_ids`` and of the modules that link them."""
+    if not resource_ids:
+        return []
+    return [f"resource:{resource_id}" for resource_id in resource_ids] + [
+        f"module:{module_id}"
+        for module_id in db.session.scalars(
+            select(ModuleResource.module_id).where(ModuleResource.resource_id.in_(resource_ids)).distinct()
+        )
+    ]
+
+
+def _current_versions(keys):
+    found = dict(db.session.execute(
+        select(EntityVersion.key, EntityVersion.version).where(EntityVersion.key.in_(keys))
+    ).all())
+    return tuple(found.get(key, 0) for key in keys)
+
+
+def _digest(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+class ResponseCache:
+
+    def __init__(self):
+        self.store = LRUCache(maxsize=2048, ttl=300)
+        self.enabled = True
+        self.not_modified = 0
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_SIZE', 2048)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 300)
+        self.enabled = app.config['RESPONSE_CACHE_ENABLED']
+        self.store = LRUCache(maxsize=app.config['RESPONSE_CACHE_SIZE'], ttl=app.config['RESPONSE_CACHE_TTL'])
+        app.extensions['response_cache'] = self
+
+    def cached(self, versions=None, ttl=None, scope='shared', max_age=0):
+        if scope not in ('shared', 'user'):
+            raise ValueError(f"Unknown cache scope {scope!r}")
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**view_args):
+                if not self.enabled or request.method != 'GET':
+                    return view(**view_args)
+
+                key = (request.endpoint, request.full_path, current_user.get_id() if scope == 'user' else None)
+                if versions is not None:
+                    keys = list(versions(**view_args))
+                    epoch = int(time.time() // ttl) if ttl else None
+                    key = _digest(key, keys, _current_versions(keys), epoch)
+                    if key in request.if_none_match:
+                        self.not_modified += 1
+                        return self._finish(current_app.response_class(status=304), key, scope, max_age)
+
+                entry = self.store.get(key)
+                if entry is None:
+                    response = current_app.make_response(view(**view_args))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return response
+                    body = response.get_data()
+                    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _UNCACHED_HEADERS]
+                    entry = (key if versions is not None else _digest(body), body, response.mimetype, headers)
+                    self.store.set(key, entry, ttl)
+
+                etag, body, mimetype, headers = entry
+                response = current_app.response_class(body, mimetype=mimetype, headers=headers)
+                response = self._finish(response, etag, scope, max_age).make_conditional(request)
+                if response.status_code == 304:
+                    self.not_modified += 1
+                return response
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _finish(response, etag, scope, max_age):
+        response.set_etag(etag)
+        visibility = 'private' if scope == 'user' or current_user.is_authenticated else 'public'
+        response.headers['Cache-Control'] = (
+            f'{visibility}, max-age={max_age}' if max_age else f'{visibility}, no-cache'
+        )
+        if scope == 'user':
+            response.vary.add('Cookie')
+        return response
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self):
+        return {**self.store.stats(), "not_modified": self.not_modified}
+
+
+response_cache = ResponseCache()
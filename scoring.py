@@ -0,0 +1,162 @@
+"""Quiz scoring pipeline: one commit per attempt, however many answers it has.
+
+With ``POINTS_WRITE_BEHIND`` enabled an attempt only records its
+submissions and a ``quiz_scored`` outbox event; the points update, leaderboard
+upsert, achievement awards and quiz progress run later in ``flask outbox-worker``, batched
+across users, and nothing moves unless that worker runs. Otherwise (the default)
+they are applied inline in the same transaction.
+"""
+from collections import Counter
+
+from flask import current_app
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+import outbox
+from achievements import award_achievements
+from db import db
+from leaderboard import leaderboard_service
+from models import Leaderboard, QuizContent, QuizSubmission, User
+from progress import record_quiz_completions
+from utils import upsert_leaderboard
+
+
+class UnknownQuizError(LookupError):
+    """Raised when an attempt references quiz IDs that do not exist."""
+
+    def __init__(self, quiz_ids):
+        super().__init__(f"Quiz not found: {', '.join(map(str, sorted(quiz_ids)))}")
+        self.quiz_ids = quiz_ids
+
+
+class DuplicateAttemptError(Exception):
+    """Raised when an attempt's idempotency key has already been used."""
+
+
+def apply_points(deltas):
+    """Add ``{user_id: points}`` to users, their leaderboard rows and achievements.
+
+    Runs in the caller's transaction and returns ``{user_id: (points, username)}``
+    for the users that were updated; the caller commits and then refreshes
+    ``leaderboard_service``.
+    """
+    updated = {}
+    for user_id, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        row = db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(points=func.coalesce(User.points, 0) + delta)
+            .returning(User.points, User.username)
+        ).one_or_none()
+        if row is None:
+            continue
+        upsert_leaderboard(db, Leaderboard, user_id, row.points)
+        updated[user_id] = (row.points, row.username)
+    if updated:
+        award_achievements(list(updated))
+    return updated
+
+
+def _refresh_leaderboard(updated):
+    for user_id, (points, username) in updated.items():
+        leaderboard_service.update(user_id, points, username)
+
+
+@outbox.handler('quiz_scored')
+def apply_quiz_scores(events):
+    """Outbox handler: apply the points and quiz progress of a batch of scored attempts."""
+    deltas = Counter()
+    for event in events:
+        deltas[event.payload["user_id"]] += event.payload["score"]
+        record_quiz_completions(event.payload["user_id"], event.payload.get("completed_quiz_ids"))
+    updated = apply_points(deltas)
+    return lambda: _refresh_leaderboard(updated)
+
+
+def score_attempt(user_id, answers, idempotency_key=None):
+    """Score ``answers`` for ``user_id`` and persist them in a single transaction.
+
+    ``answers`` is a list of ``{"quiz_id": ..., "selected_option": ...}`` dicts.
+    All submissions are bulk inserted. Points are then either applied inline
+    or deferred to the outbox (``points`` is ``None`` in the result, and
+    ``pending`` is true when an outbox event was queued).
+    ``idempotency_key`` is a client-supplied key, stored on the attempt's
+    first submission. Reusing it raises ``DuplicateAttemptError`` instead of
+    scoring the attempt twice, whether points are applied inline or deferred.
+    """
+    quiz_ids = {answer.get("quiz_id") for answer in answers}
+    quizzes = {
+        row.id: row
+        for row in db.session.query(
+            QuizContent.id, QuizContent.correct_option, QuizContent.points
+        ).filter(QuizContent.id.in_(quiz_ids))
+    }
+    missing = quiz_ids - quizzes.keys()
+    if missing:
+        raise UnknownQuizError(missing)
+
+    submissions = []
+    completed_quiz_ids = set()
+    for answer in answers:
+        quiz = quizzes[answer["quiz_id"]]
+        selected_option = answer.get("selected_option")
+        # A correct answer completes the quiz even if it is worth no points
+        correct = selected_option == quiz.correct_option
+        if correct:
+            completed_quiz_ids.add(quiz.id)
+        submissions.append({
+            "user_id": user_id,
+            "quiz_id": quiz.id,
+            "selected_option": selected_option,
+            "score": (quiz.points or 0) if correct else 0,
+        })
+
+    attempt_key = f"quiz_attempt:{user_id}:{idempotency_key}" if idempotency_key else None
+    for position, submission in enumerate(submissions):
+        submission["idempotency_key"] = attempt_key if position == 0 else None
+
+    total = sum(submission["score"] for submission in submissions)
+    completed_quiz_ids = sorted(completed_quiz_ids)
+    write_behind = current_app.config.get('POINTS_WRITE_BEHIND', False)
+    updated = {}
+    queued = False
+    try:
+        submission_ids = list(db.session.scalars(
+            insert(QuizSubmission).returning(QuizSubmission.id), submissions
+        )) if submissions else []
+        if write_behind:
+            if total or completed_quiz_ids or idempotency_key:
+                key = attempt_key or f"quiz_submission:{min(submission_ids)}"
+                outbox.enqueue('quiz_scored', {
+                    "user_id": user_id,
+                    "score": total,
+                    "submission_ids": submission_ids,
+                    "completed_quiz_ids": completed_quiz_ids,
+                }, key)
+                queued = True
+        else:
+            updated = apply_points({user_id: total})
+            record_quiz_completions(user_id, completed_quiz_ids)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if idempotency_key and 'idempotency_key' in str(e.orig):
+            raise DuplicateAttemptError(idempotency_key) from e
+        raise
+    except Exception:
+        db.session.rollback()
+        raise
+
+    _refresh_leaderboard(updated)
+
+    return {
+        "total_score": total,
+        "points": updated[user_id][0] if user_id in updated else None,
+        "pending": queued,
+        "results": [
+            {"quiz_id": submission["quiz_id"], "score": submission["score"]}
+            for submission in submissions
+        ],
+    }
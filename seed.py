@@ -4,6 +4,9 @@ from datetime import datetime
 from models import (User, LearningPath, Module, Resource, Feedback, Comment, Reply, 
                     Challenge, Achievement, Leaderboard, ModuleResource, UserAchievement, 
                     UserLearningPath, UserChallenge, QuizContent, QuizSubmission)
+from ratings import rebuild_ratings
+from progress import rebuild_progress
+from counters import reconcile_all
 from faker import Faker
 import random
 
@@ -62,6 +65,7 @@ def seed_database():
 
     db.session.add_all(feedbacks)
     db.session.commit()
+    rebuild_ratings()
 
     achievement1 = Achievement(name="Python Novice", description="Complete the Python Basics path", points_required=100, icon_url="icon_url_1")
     achievement2 = Achievement(name="Data Scientist", description="Complete Data Science path", points_required=200, icon_url="icon_url_2")
@@ -143,6 +147,8 @@ def seed_database():
             db.session.add(reply)
 
     db.session.commit()
+    rebuild_progress()
+    reconcile_all()
 
     print("Database seeded successfully.")
 
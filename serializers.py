@@ -0,0 +1,71 @@
+"""Compiled, column-only model serializers and an orjson-backed JSON provider.
+
+``compile_serializer`` generates a plain ``to_dict`` function once, at import
+time, that reads only the named attributes. Foreign keys are read from their
+columns, so serializing a row never triggers a lazy load. Relationship data
+is opt-in through ``includes``; callers that use it should load those
+relationships eagerly with ``eager_options``.
+"""
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import joinedload
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def compile_serializer(*fields, dates=(), includes=None):
+    """Build a ``to_dict(self)`` function for the given attribute names.
+
+    ``dates`` are rendered with ``isoformat()`` (``None`` stays ``None``).
+    ``includes`` maps an output key to a dotted ``"relationship.attribute"``
+    path; the relationship may be ``None``.
+    """
+    includes = dict(includes or {})
+    items = [f"{name!r}: self.{name}" for name in fields]
+    items += [f"{name!r}: _iso(self.{name})" for name in dates]
+    for key, path in includes.items():
+        relationship, attribute = path.split('.', 1)
+        items.append(
+            f"{key!r}: (self.{relationship}.{attribute} "
+            f"if self.{relationship} is not None else None)"
+        )
+    source = "def to_dict(self):\n    return {" + ", ".join(items) + "}\n"
+    namespace = {"_iso": _iso}
+    exec(compile(source, f"<serializer {', '.join(fields)}>", "exec"), namespace)
+    to_dict = namespace["to_dict"]
+    to_dict.fields = fields + tuple(dates)
+    to_dict.includes = includes
+    return to_dict
+
+
+def eager_options(model):
+    """Loader options that join-load every relationship ``model.to_dict`` includes."""
+    relationships = {path.split('.', 1)[0] for path in model.to_dict.includes.values()}
+    return [joinedload(getattr(model, name)) for name in sorted(relationships)]
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson.
+
+    Datetimes are passed through to ``DefaultJSONProvider.default`` so the
+    wire format matches Flask's default provider.
+    """
+
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps_bytes(obj).decode()
+
+    def _dumps_bytes(self, obj):
+        option = self.option | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
@@ -1,4 +1,9 @@
-def update_leaderboard(db, Leaderboard, user_id, new_score):
+from sqlalchemy.dialects import postgresql, sqlite
+
+from leaderboard import leaderboard_service
+
+
+def update_leaderboard(db, Leaderboard, user_id, new_score, username=None):
     """Update the leaderboard score for the given user."""
     leaderboard_entry = Leaderboard.query.filter_by(user_id=user_id).first()
     if leaderboard_entry:
@@ -7,3 +12,23 @@ def update_leaderboard(db, Leaderboard, user_id, new_score):
         leaderboard_entry = Leaderboard(user_id=user_id, score=new_score)  # Create new entry if not exists
         db.session.add(leaderboard_entry)
     db.session.commit()
+    leaderboard_service.update(user_id, new_score, username)
+
+
+def upsert_leaderboard(db, Leaderboard, user_id, new_score):
+    """Insert or update a leaderboard row in one statement, without committing."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(Leaderboard).values(user_id=user_id, score=new_score)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Leaderboard.user_id],
+            set_={"score": stmt.excluded.score},
+        )
+        db.session.execute(stmt)
+        return
+    leaderboard_entry = Leaderboard.query.filter_by(user_id=user_id).first()
+    if leaderboard_entry:
+        leaderboard_entry.score = new_score
+    else:
+        db.session.add(Leaderboard(user_id=user_id, score=new_score))